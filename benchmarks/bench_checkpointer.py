@@ -0,0 +1,116 @@
+"""checkpointer 基准测试
+
+在不调用 LLM 的小型图（两个节点，每次运行追加两条消息）上反复执行，对比：
+- InMemorySaver：所有 checkpoint 保存在进程内存中
+- SQLiteSaver：批量写入 SQLite，每个线程只保留最近 keep_last 个 checkpoint
+
+输出每次 checkpoint 写入（put）的延迟分布、总吞吐以及运行结束后的常驻内存（RSS）。
+每种 checkpointer 在独立的子进程中运行，RSS 互不影响。
+
+用法：python benchmarks/bench_checkpointer.py [--runs 100000] [--threads 10000] [--keep-last 10]
+"""
+
+import argparse
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, StateGraph, MessagesState
+
+from sqlite_checkpointer import SQLiteSaver
+
+
+def agent(state: MessagesState):
+    return {"messages": [AIMessage(content="今天是星期三，随机数是42")]}
+
+
+def reply(state: MessagesState):
+    return {"messages": [AIMessage(content="已发送邮件")]}
+
+
+def build_app(checkpointer):
+    workflow = StateGraph(MessagesState)
+    workflow.add_node("agent", agent)
+    workflow.add_node("reply", reply)
+    workflow.set_entry_point("agent")
+    workflow.add_edge("agent", "reply")
+    workflow.add_edge("reply", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def rss_mb() -> float:
+    """当前常驻内存（MB）；无 /proc 时退回到峰值常驻内存"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_backend(backend: str, runs: int, threads: int, keep_last: int, path: str):
+    if backend == "memory":
+        saver = InMemorySaver()
+    else:
+        saver = SQLiteSaver(path, keep_last=keep_last)
+    put = saver.put
+    latencies = []
+
+    def timed_put(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return put(*args, **kwargs)
+        finally:
+            latencies.append(time.perf_counter() - start)
+
+    saver.put = timed_put
+    app = build_app(saver)
+    start = time.perf_counter()
+    for i in range(runs):
+        app.invoke({"messages": [HumanMessage(content=f"第{i}次运行")]},
+                   {"configurable": {"thread_id": i % threads}})
+    if backend == "sqlite":
+        saver.close()
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    pct = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))] * 1e6
+    size = f" | 数据库 {os.path.getsize(path) / 1024 / 1024:,.1f} MB" if backend == "sqlite" else ""
+    print(f"{backend:<7} {runs / elapsed:>8,.0f} runs/sec | put p50 {pct(0.5):>6,.0f}µs "
+          f"p99 {pct(0.99):>7,.0f}µs | RSS {rss_mb():>7,.1f} MB{size}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="checkpointer 基准测试")
+    parser.add_argument("--runs", type=int, default=100000)
+    parser.add_argument("--threads", type=int, default=10000, help="轮流使用的 thread_id 数量")
+    parser.add_argument("--keep-last", type=int, default=10, help="SQLiteSaver 每个线程保留的 checkpoint 数")
+    parser.add_argument("--backend", choices=["memory", "sqlite"], help="只运行一种 checkpointer（子进程内部使用）")
+    parser.add_argument("--db", help="SQLiteSaver 的数据库路径（子进程内部使用）")
+    args = parser.parse_args()
+
+    if args.backend:
+        run_backend(args.backend, args.runs, args.threads, args.keep_last, args.db)
+        return
+
+    print(f"{args.runs:,} 次运行，{args.threads:,} 个线程，SQLiteSaver 保留最近 {args.keep_last} 个checkpoint")
+    with tempfile.TemporaryDirectory() as tmp:
+        for backend in ("memory", "sqlite"):
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--backend", backend,
+                            "--runs", str(args.runs), "--threads", str(args.threads),
+                            "--keep-last", str(args.keep_last), "--db", os.path.join(tmp, "checkpoints.db")],
+                           check=True)
+
+
+if __name__ == "__main__":
+    main()
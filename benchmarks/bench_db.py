@@ -0,0 +1,73 @@
+"""SQLite 连接池基准测试
+
+对比两种查询方式的吞吐（queries/sec）：
+- 每次查询都 ``sqlite3.connect`` 打开新连接（email_workflow 原有写法）
+- 通过 db.ConnectionPool 复用线程内的只读连接
+
+用法：python benchmarks/bench_db.py [--queries 20000] [--users 1000]
+"""
+
+import argparse
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from db import ConnectionPool
+
+
+def create_user_db(path: str, users: int):
+    """创建一个包含指定数量用户的测试数据库"""
+    conn = sqlite3.connect(path)
+    conn.execute("create table users (id int primary key not null, name varchar not null, mail varchar not null)")
+    conn.executemany("insert into users (id, name, mail) values (?, ?, ?)",
+                     ((i, f"user{i}", f"user{i}@example.com") for i in range(users)))
+    conn.commit()
+    conn.close()
+
+
+def bench_connect_per_query(path: str, queries: int, users: int) -> float:
+    start = time.perf_counter()
+    for i in range(queries):
+        conn = sqlite3.connect(path)
+        c = conn.cursor()
+        c.execute("SELECT id, name, mail FROM users WHERE name = ?", (f"user{i % users}",))
+        c.fetchall()
+        conn.close()
+    return queries / (time.perf_counter() - start)
+
+
+def bench_pool(path: str, queries: int, users: int) -> float:
+    pool = ConnectionPool()
+    pool.query(path, "SELECT 1")  # 预热：建立连接
+    start = time.perf_counter()
+    for i in range(queries):
+        pool.query(path, "SELECT id, name, mail FROM users WHERE name = ?", (f"user{i % users}",))
+    qps = queries / (time.perf_counter() - start)
+    pool.close_all()
+    return qps
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite 连接池基准测试")
+    parser.add_argument("--queries", type=int, default=20000)
+    parser.add_argument("--users", type=int, default=1000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "user.db")
+        create_user_db(path, args.users)
+        before = bench_connect_per_query(path, args.queries, args.users)
+        after = bench_pool(path, args.queries, args.users)
+
+    print(f"每次新建连接: {before:,.0f} queries/sec")
+    print(f"连接池复用:   {after:,.0f} queries/sec")
+    print(f"提升: {after / before:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,77 @@
+"""入口模块导入耗时基准测试
+
+在全新的子进程中用 ``python -X importtime`` 导入各入口模块，统计导入总耗时与自身耗时最多的依赖，
+并检查应当延迟加载的依赖（如 langchain_ollama、dotenv）没有在导入时被加载。
+任一模块超出耗时预算或提前加载了延迟依赖时以非 0 状态码退出，可用于在 CI 中发现启动性能回退。
+
+用法：python benchmarks/bench_import_time.py [--repeat 3] [--budget email_workflow=1500] [--top 5]
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# 各模块导入耗时预算（毫秒）；email_workflow 的大部分耗时来自 langchain_core 与 langgraph 本身
+BUDGETS_MS = {
+    'order_flow': 50,
+    'email_workflow': 1500,
+}
+
+# 导入时不应加载的依赖：只在首次调用模型、执行图或运行 main() 时才需要
+LAZY_DEPENDENCIES = {
+    'order_flow': ('langgraph',),
+    'email_workflow': ('langchain_ollama', 'ollama', 'dotenv'),
+}
+
+
+def measure(module: str) -> tuple:
+    """导入一次模块，返回 (总耗时毫秒, [(自身耗时微秒, 模块名)], 已加载的模块名集合)"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    total, entries, loaded = None, [], set()
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        loaded.add(name)
+        entries.append((int(self_us), name))
+        if name == module:
+            total = int(cumulative_us) / 1000
+    entries.sort(reverse=True)
+    return total, entries, loaded
+
+
+def main():
+    parser = argparse.ArgumentParser(description="入口模块导入耗时基准测试")
+    parser.add_argument("--repeat", type=int, default=3, help="每个模块导入的次数，取最小值以降低噪声")
+    parser.add_argument("--budget", action="append", default=[], metavar="MODULE=MS", help="覆盖模块的耗时预算")
+    parser.add_argument("--top", type=int, default=5, help="列出自身耗时最多的依赖数量")
+    args = parser.parse_args()
+
+    budgets = dict(BUDGETS_MS)
+    for item in args.budget:
+        module, ms = item.split("=")
+        budgets[module] = float(ms)
+
+    failed = False
+    for module, budget in budgets.items():
+        runs = [measure(module) for _ in range(args.repeat)]
+        total, entries, loaded = min(runs, key=lambda run: run[0])
+        eager = sorted(dep for dep in LAZY_DEPENDENCIES.get(module, ())
+                       if any(name == dep or name.startswith(dep + ".") for name in loaded))
+        ok = total <= budget and not eager
+        failed = failed or not ok
+        print(f"{'✓' if ok else '✗'} {module:<16} {total:>8,.1f} ms（预算 {budget:,.0f} ms）")
+        for self_us, name in entries[:args.top]:
+            print(f"    {self_us / 1000:>8,.1f} ms  {name}")
+        if eager:
+            print(f"    导入时提前加载了应延迟加载的依赖：{', '.join(eager)}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""订单批量处理基准测试
+
+对比两种处理大量订单的方式：
+- 逐单调用：for 循环中对每个订单调用 graph.invoke
+- order_bulk.process_orders：按块交给 graph.batch，max_concurrency 取不同值
+
+订单的数量与商品随机分布，三个结束节点都会被覆盖。每轮使用一个临时库存，item_001 的库存足够整轮使用。
+报告 orders/sec 与各结束节点的订单数。
+
+用法：python benchmarks/bench_order_flow.py [--orders 20000] [--concurrency 1 8 32]
+"""
+
+import argparse
+import asyncio
+import os
+import random
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import inventory
+from inventory import InventoryStore, StockCache
+from order_bulk import aprocess_orders, process_orders
+from order_flow import get_graph, new_order_state
+
+
+def make_orders(n: int, seed: int = 0) -> list:
+    rng = random.Random(seed)
+    return [{"order_id": f"order_{i}", "product_id": rng.choice(("item_001", "item_002")),
+             "quantity": rng.randint(0, 12)} for i in range(n)]
+
+
+def fresh_inventory(stock: int):
+    path = os.path.join(tempfile.mkdtemp(), "inventory.db")
+    inventory.set_inventory(StockCache(InventoryStore(path, {"item_001": stock})))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="订单批量处理基准测试")
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32])
+    args = parser.parse_args()
+
+    orders = make_orders(args.orders)
+    graph = get_graph()
+
+    fresh_inventory(args.orders * 12)
+    start = time.perf_counter()
+    for order in orders:
+        graph.invoke(new_order_state(order))
+    rate = len(orders) / (time.perf_counter() - start)
+    print(f"{'逐单 graph.invoke':<32} {rate:>10,.0f} orders/sec")
+
+    for concurrency in args.concurrency:
+        fresh_inventory(args.orders * 12)
+        result = process_orders(orders, concurrency=concurrency, graph=graph)
+        print(f"{f'process_orders (并发 {concurrency})':<32} {result.throughput:>10,.0f} orders/sec | "
+              f"{dict(result.counts)}")
+        fresh_inventory(args.orders * 12)
+        result = asyncio.run(aprocess_orders(orders, concurrency=concurrency, graph=graph))
+        print(f"{f'aprocess_orders (并发 {concurrency})':<32} {result.throughput:>10,.0f} orders/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""订单状态内存基准测试
+
+模拟大量订单同时在途或排队：分别以 dict（OrderState）和 CompactOrderState 构造 N 个订单状态并全部保留，
+用 tracemalloc 统计每个订单占用的字节数。订单的 order_id 各不相同，product_id 从少量商品中选取
+（来自文件或网络的订单，每个 product_id 都是独立的字符串对象，与真实输入一致）。
+
+用法：python benchmarks/bench_order_state.py [--orders 1000000]
+"""
+
+import argparse
+import gc
+import os
+import sys
+import time
+import tracemalloc
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from order_flow import CompactOrderState, new_order_state
+
+
+def orders(n: int):
+    for i in range(n):
+        # "".join 生成新的字符串对象，模拟解析输入得到的 product_id
+        yield {"order_id": f"order_{i}", "product_id": "".join(("item_", f"{i % 50:03d}")), "quantity": i % 12}
+
+
+def bytes_per_order(build, n: int) -> tuple:
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    states = [build(order) for order in orders(n)]
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    # 减去保存状态的列表本身
+    per_order = (current - sys.getsizeof(states)) / n
+    del states
+    return per_order, n / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="订单状态内存基准测试")
+    parser.add_argument("--orders", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    for label, build in (("dict (OrderState)", new_order_state), ("CompactOrderState", CompactOrderState.from_order)):
+        per_order, rate = bytes_per_order(build, args.orders)
+        print(f"{label:<20} {per_order:>8,.0f} bytes/order | {args.orders * per_order / 2 ** 20:>8,.0f} MiB "
+              f"for {args.orders:,} orders | {rate:>12,.0f} states/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""订单列式快速路径基准测试
+
+对比处理同一批订单的三种方式：
+- 逐单调用 graph.invoke
+- order_bulk.process_orders（graph.batch）
+- order_vectorized.process_orders_vectorized（NumPy 列运算 + 一次批量预占）
+
+每种方式使用独立的临时库存，并核对列式路径与 graph.invoke 的结束节点分布相同。报告 orders/sec。
+
+用法：python benchmarks/bench_order_vectorized.py [--orders 20000]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import inventory
+from bench_order_flow import make_orders
+from inventory import InventoryStore, StockCache
+from order_bulk import BulkResult, process_orders
+from order_flow import get_graph, new_order_state, terminal_node
+from order_vectorized import process_orders_vectorized
+
+
+def fresh_inventory(stock: int):
+    path = os.path.join(tempfile.mkdtemp(), "inventory.db")
+    inventory.set_inventory(StockCache(InventoryStore(path, {"item_001": stock})))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="订单列式快速路径基准测试")
+    parser.add_argument("--orders", type=int, default=20000)
+    parser.add_argument("--stock", type=int, default=None, help="item_001 的初始库存，默认足够所有订单使用")
+    args = parser.parse_args()
+
+    orders = make_orders(args.orders)
+    stock = args.stock if args.stock is not None else args.orders * 12
+    graph = get_graph()
+
+    fresh_inventory(stock)
+    invoked = BulkResult()
+    start = time.perf_counter()
+    for order in orders:
+        state = graph.invoke(new_order_state(order))
+        invoked.states.append(state)
+        invoked.counts[terminal_node(state)] += 1
+    invoked.elapsed = time.perf_counter() - start
+    print(f"{'逐单 graph.invoke':<28} {invoked.throughput:>12,.0f} orders/sec | {dict(invoked.counts)}")
+
+    fresh_inventory(stock)
+    batched = process_orders(orders, concurrency=1, graph=graph)
+    print(f"{'process_orders':<28} {batched.throughput:>12,.0f} orders/sec")
+
+    fresh_inventory(stock)
+    vectorized = process_orders_vectorized(orders)
+    print(f"{'process_orders_vectorized':<28} {vectorized.throughput:>12,.0f} orders/sec | {dict(vectorized.counts)}")
+    assert vectorized.counts == invoked.counts, "列式路径与 graph 路径的结束节点分布不一致"
+
+
+if __name__ == "__main__":
+    main()
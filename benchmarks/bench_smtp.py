@@ -0,0 +1,76 @@
+"""SMTP 连接池基准测试
+
+在本地替身 SMTP 服务器上对比发送吞吐（messages/sec）：
+- 每封邮件都新建连接并 login（原有写法）
+- 通过 smtp_pool.SMTPPool 复用已登录的连接（单线程与多线程）
+
+用法：python benchmarks/bench_smtp.py [--messages 2000] [--threads 4]
+"""
+
+import argparse
+import os
+import smtplib
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.text import MIMEText
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fake_servers import FakeSMTPServer
+from smtp_pool import SMTPPool
+
+SENDER = "sender@example.com"
+PASSWORD = "secret"
+
+
+def make_message(i: int) -> MIMEText:
+    msg = MIMEText(f"第{i}封测试邮件", 'plain')
+    msg['From'] = SENDER
+    msg['To'] = f"user{i}@example.com"
+    msg['Subject'] = "基准测试"
+    return msg
+
+
+def bench_connect_per_message(server: FakeSMTPServer, messages: int) -> float:
+    start = time.perf_counter()
+    for i in range(messages):
+        with smtplib.SMTP(server.host, server.port) as smtp:
+            smtp.login(SENDER, PASSWORD)
+            smtp.send_message(make_message(i))
+    return messages / (time.perf_counter() - start)
+
+
+def bench_pool(server: FakeSMTPServer, messages: int, threads: int) -> float:
+    pool = SMTPPool(server.host, server.port, SENDER, PASSWORD, size=threads)
+    start = time.perf_counter()
+    if threads == 1:
+        for i in range(messages):
+            pool.send_message(make_message(i))
+    else:
+        with ThreadPoolExecutor(threads) as executor:
+            list(executor.map(lambda i: pool.send_message(make_message(i)), range(messages)))
+    rate = messages / (time.perf_counter() - start)
+    pool.close()
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SMTP 连接池基准测试")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=4)
+    args = parser.parse_args()
+
+    with FakeSMTPServer() as server:
+        before = bench_connect_per_message(server, args.messages)
+        single = bench_pool(server, args.messages, 1)
+        multi = bench_pool(server, args.messages, args.threads)
+
+    print(f"每封邮件新建连接:          {before:,.0f} messages/sec")
+    print(f"连接池（单线程）:          {single:,.0f} messages/sec（{single / before:.1f}x）")
+    print(f"连接池（{args.threads}线程）:           {multi:,.0f} messages/sec（{multi / before:.1f}x）")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""邮件模板渲染基准测试
+
+对比为大量收件人生成推荐邮件的两种方式：
+- 原有写法：每封邮件用 f-string += 拼接正文，再构建 MIMEMultipart 并序列化
+- mail_templates：推荐列表只渲染一次，正文用预编译模板 join 渲染，MIME 固定头部由 MessageFactory 共享
+
+报告 renders/sec 以及 tracemalloc 统计的每封邮件内存分配字节数。
+
+用法：python benchmarks/bench_templates.py [--recipients 5000] [--items 20]
+"""
+
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+from email.mime.multipart import MIMEMultipart
+from email.mime.text import MIMEText
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mail_templates import (RECOMMEND_EMAIL, RECOMMEND_ITEM, compile_template,
+                            get_message_factory, render_lines)
+
+SENDER = "sender@example.com"
+SUBJECT = "随机数与推荐信息"
+
+
+def legacy(recipients, recommend_data):
+    for i, (name, mail) in enumerate(recipients):
+        email_content = f"亲爱的{name}：\n\n您好！这是一封包含随机数和推荐信息的邮件。\n\n随机数：{i % 101}\n\n推荐信息：\n"
+        for item in recommend_data:
+            email_content += f"- {item[1]}: {item[2]}\n"
+        email_content += "\n如有任何问题，请随时联系我们。\n\n祝好！\n我们的团队"
+        msg = MIMEMultipart()
+        msg['From'] = SENDER
+        msg['To'] = mail
+        msg['Subject'] = SUBJECT
+        msg.attach(MIMEText(email_content, 'plain'))
+        yield msg.as_bytes()
+
+
+def templated(recipients, recommend_data):
+    template = compile_template(RECOMMEND_EMAIL)
+    factory = get_message_factory(SENDER, SUBJECT)
+    recommendations = render_lines(RECOMMEND_ITEM, ({'name': item[1], 'content': item[2]} for item in recommend_data))
+    for i, (name, mail) in enumerate(recipients):
+        body = template.render(name=name, random_number=i % 101, recommendations=recommendations)
+        yield factory.build(mail, body)
+
+
+def allocated_per_message(func, recipients, recommend_data) -> float:
+    """逐封统计生成一封邮件期间的内存分配峰值（字节），取平均值"""
+    tracemalloc.start()
+    total = 0
+    gen = func(recipients, recommend_data)
+    while True:
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        try:
+            # 峰值在生成期间记录，生成的邮件随即丢弃
+            next(gen)
+        except StopIteration:
+            break
+        _, peak = tracemalloc.get_traced_memory()
+        total += peak - before
+    tracemalloc.stop()
+    return total / len(recipients)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="邮件模板渲染基准测试")
+    parser.add_argument("--recipients", type=int, default=5000)
+    parser.add_argument("--items", type=int, default=20, help="推荐信息条数")
+    args = parser.parse_args()
+
+    recipients = [(f"user{i}", f"user{i}@example.com") for i in range(args.recipients)]
+    recommend_data = [(i, f"推荐你去尝试一下这个项目{i}", f"项目{i}的详细介绍" * 3) for i in range(args.items)]
+
+    for label, func in (("f-string += / MIMEMultipart", legacy), ("预编译模板 / MessageFactory", templated)):
+        start = time.perf_counter()
+        for _ in func(recipients, recommend_data):
+            pass
+        rate = len(recipients) / (time.perf_counter() - start)
+        per_message = allocated_per_message(func, recipients[:1000], recommend_data)
+        print(f"{label:<28} {rate:>10,.0f} renders/sec | 每封邮件峰值分配 {per_message:>8,.0f} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""用户批量导入与按姓名查询基准测试
+
+生成指定数量的用户 CSV，通过 user_import 导入临时数据库，
+报告导入吞吐（行/秒），并在不同数据量下测量按姓名查询的延迟，
+确认查询走 idx_users_name 索引、耗时不随表大小线性增长。
+
+用法：python benchmarks/bench_user_import.py [--users 1000000]
+"""
+
+import argparse
+import csv
+import os
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db
+from user_import import import_users, read_csv
+
+LOOKUP_SQL = "SELECT id, name, mail FROM users WHERE name = ?"
+
+
+def write_csv(path: str, start: int, count: int):
+    with open(path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['id', 'name', 'mail'])
+        for i in range(start, start + count):
+            writer.writerow([i, f"user{i}", f"user{i}@example.com"])
+
+
+def bench_lookup(path: str, total: int, lookups: int = 2000) -> float:
+    """返回单次按姓名查询的平均耗时（微秒）"""
+    start = time.perf_counter()
+    for i in range(lookups):
+        db.query(path, LOOKUP_SQL, (f"user{(i * 7919) % total}",))
+    return (time.perf_counter() - start) / lookups * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="用户批量导入与索引查询基准测试")
+    parser.add_argument("--users", type=int, default=1000000)
+    parser.add_argument("--steps", type=int, default=4, help="分几批导入，每批之后测一次查询延迟")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "user.db")
+        csv_path = os.path.join(tmp, "users.csv")
+        step = args.users // args.steps
+        total = 0
+        for _ in range(args.steps):
+            write_csv(csv_path, total, step)
+            start = time.perf_counter()
+            with open(csv_path, newline='', encoding='utf-8') as f:
+                total += import_users(read_csv(f), path)
+            elapsed = time.perf_counter() - start
+            latency = bench_lookup(path, total)
+            print(f"{total:>10,} 行 | 导入 {step / elapsed:>10,.0f} 行/秒 | 按姓名查询 {latency:6.1f} µs")
+
+        plan = db.query(path, "EXPLAIN QUERY PLAN " + LOOKUP_SQL, ("user1",))
+        print("查询计划:", plan[0][-1])
+        db.pool.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""按环境变量选择工作流使用的 checkpointer
+
+默认使用 InMemorySaver；CHECKPOINTER=sqlite 时才导入 sqlite_checkpointer 并创建 SQLiteSaver，
+使用内存 checkpointer 时不加载 SQLite 持久化的实现。
+"""
+
+import atexit
+import os
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def make_checkpointer():
+    """按环境变量创建工作流使用的 checkpointer
+
+    CHECKPOINTER=sqlite 时使用 SQLiteSaver（CHECKPOINT_DB、CHECKPOINT_KEEP_LAST、CHECKPOINT_MAX_IDLE
+    可调整数据库路径与保留策略），否则使用 InMemorySaver。
+    """
+    if os.getenv("CHECKPOINTER", "memory").lower() != "sqlite":
+        from langgraph.checkpoint.memory import InMemorySaver
+        return InMemorySaver()
+
+    from sqlite_checkpointer import CHECKPOINT_DB, CHECKPOINT_KEEP_LAST, CHECKPOINT_MAX_IDLE, SQLiteSaver
+    keep_last = os.getenv("CHECKPOINT_KEEP_LAST")
+    max_idle = os.getenv("CHECKPOINT_MAX_IDLE")
+    saver = SQLiteSaver(
+        os.getenv("CHECKPOINT_DB", CHECKPOINT_DB),
+        keep_last=int(keep_last) if keep_last else CHECKPOINT_KEEP_LAST,
+        max_idle=float(max_idle) if max_idle else CHECKPOINT_MAX_IDLE,
+    )
+    # 进程退出时提交缓冲中的写入
+    atexit.register(saver.close)
+    logger.info(f"使用SQLite checkpointer：{saver.path}（保留最近{saver.keep_last}个checkpoint）")
+    return saver
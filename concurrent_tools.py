@@ -0,0 +1,158 @@
+"""并发执行工具调用
+
+模型在一条 AIMessage 中可能同时请求多个工具（例如同时调用 get_current_weekday 与 get_random_number）。
+ConcurrentToolExecutor 并发执行这些调用：
+- 同步路径：在共享线程池中执行，适用于 app.stream / app.invoke
+- 异步路径：用 asyncio.gather 并发 await 每个工具的 ainvoke，适用于 app.astream / app.ainvoke
+- 每个调用有独立的超时，超时或出错时返回 status='error' 的 ToolMessage，而不是让整个节点失败
+- 返回的 ToolMessage 与 tool_calls 的顺序一一对应，tool_call_id 保持对齐
+- 传入 ToolResultCache 时，声明了缓存策略的工具命中缓存后不再执行（见 tool_cache）
+"""
+
+import asyncio
+import time
+import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Optional, Sequence
+
+from langchain_core.messages import AIMessage, ToolMessage
+from langchain_core.runnables import RunnableConfig
+
+from tool_cache import ToolResultCache
+
+logger = logging.getLogger(__name__)
+
+# 单个工具调用的默认超时时间（秒）
+TOOL_TIMEOUT = 30.0
+# 同步工具共享线程池的大小
+TOOL_THREADS = 8
+
+# 与 langgraph ToolNode 一致的错误提示格式，便于模型理解并修正
+TOOL_CALL_ERROR_TEMPLATE = "Error: {error}\n Please fix your mistakes."
+
+_executor = None
+
+
+def get_executor() -> ThreadPoolExecutor:
+    """返回执行同步工具的共享线程池"""
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=TOOL_THREADS, thread_name_prefix="tool")
+    return _executor
+
+
+def run_in_thread_pool(tool):
+    """为同步工具补充异步实现：await 时在共享线程池中执行原函数，避免阻塞事件循环
+
+    返回工具本身，便于在定义工具后直接包装。
+    """
+    func = tool.func
+
+    async def coroutine(*args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(get_executor(), lambda: func(*args, **kwargs))
+
+    tool.coroutine = coroutine
+    return tool
+
+
+def _error_message(call: dict, content: str) -> ToolMessage:
+    return ToolMessage(content=content, name=call['name'], tool_call_id=call['id'], status='error')
+
+
+class ConcurrentToolExecutor:
+    """并发执行一条 AIMessage 中的全部工具调用"""
+
+    def __init__(self, tools: Sequence, timeout: float = TOOL_TIMEOUT, cache: Optional[ToolResultCache] = None):
+        self.tools_by_name = {tool.name: tool for tool in tools}
+        self.timeout = timeout
+        self.cache = cache
+
+    def _tool_for(self, call: dict):
+        tool = self.tools_by_name.get(call['name'])
+        if tool is None:
+            names = ', '.join(self.tools_by_name)
+            raise ValueError(f"{call['name']} is not a valid tool, try one of [{names}].")
+        return tool
+
+    def _lookup(self, tool, call: dict):
+        if self.cache is None:
+            return None, None
+        return self.cache.lookup(tool, call)
+
+    def _run_one(self, call: dict, config: Optional[RunnableConfig]) -> ToolMessage:
+        try:
+            tool = self._tool_for(call)
+            cached, store = self._lookup(tool, call)
+            if cached is not None:
+                return cached
+            message = tool.invoke({**call, 'type': 'tool_call'}, config)
+            if store is not None:
+                store(message)
+            return message
+        except Exception as e:
+            logger.error(f"工具 {call['name']} 执行出错：{e!r}")
+            return _error_message(call, TOOL_CALL_ERROR_TEMPLATE.format(error=repr(e)))
+
+    async def _arun_one(self, call: dict, config: Optional[RunnableConfig]) -> ToolMessage:
+        try:
+            tool = self._tool_for(call)
+            cached, store = self._lookup(tool, call)
+            if cached is not None:
+                return cached
+            message = await asyncio.wait_for(tool.ainvoke({**call, 'type': 'tool_call'}, config), self.timeout)
+            if store is not None:
+                store(message)
+            return message
+        except asyncio.TimeoutError:
+            return self._timeout_message(call)
+        except Exception as e:
+            logger.error(f"工具 {call['name']} 执行出错：{e!r}")
+            return _error_message(call, TOOL_CALL_ERROR_TEMPLATE.format(error=repr(e)))
+
+    def _timeout_message(self, call: dict) -> ToolMessage:
+        logger.error(f"工具 {call['name']} 执行超时（{self.timeout}秒）")
+        return _error_message(call, TOOL_CALL_ERROR_TEMPLATE.format(error=f"工具调用超时（超过{self.timeout}秒）"))
+
+    def invoke(self, tool_calls: Sequence[dict], config: Optional[RunnableConfig] = None) -> list:
+        """在线程池中并发执行工具调用，按 tool_calls 的顺序返回 ToolMessage
+
+        每个调用从开始执行起单独计时；线程池繁忙时，排队超过 timeout 仍未开始的调用同样按超时处理。
+        """
+        submitted = time.monotonic()
+        started = {}
+
+        def run(index: int, call: dict) -> ToolMessage:
+            started[index] = time.monotonic()
+            return self._run_one(call, config)
+
+        futures = {get_executor().submit(run, i, call): i for i, call in enumerate(tool_calls)}
+        results = [None] * len(tool_calls)
+        pending = set(futures)
+        while pending:
+            now = time.monotonic()
+            for future in [f for f in pending if not f.done()]:
+                index = futures[future]
+                if now >= started.get(index, submitted) + self.timeout:
+                    # 线程无法被强制中断，超时的调用在后台结束后其结果会被丢弃
+                    future.cancel()
+                    pending.discard(future)
+                    results[index] = self._timeout_message(tool_calls[index])
+            if not pending:
+                break
+            deadline = min(started.get(futures[f], submitted) for f in pending) + self.timeout
+            done, pending = wait(pending, timeout=max(0.0, deadline - time.monotonic()), return_when=FIRST_COMPLETED)
+            for future in done:
+                results[futures[future]] = future.result()
+        return results
+
+    async def ainvoke(self, tool_calls: Sequence[dict], config: Optional[RunnableConfig] = None) -> list:
+        """用 asyncio 并发执行工具调用，按 tool_calls 的顺序返回 ToolMessage"""
+        return list(await asyncio.gather(*(self._arun_one(call, config) for call in tool_calls)))
+
+
+def last_tool_calls(messages: Sequence) -> list:
+    """返回最后一条 AIMessage 中的工具调用"""
+    for message in reversed(messages):
+        if isinstance(message, AIMessage):
+            return message.tool_calls
+    return []
@@ -0,0 +1,138 @@
+"""按 token 预算裁剪发送给模型的消息历史
+
+call_model 每一轮都把完整的 state['messages'] 发给 Ollama，prompt 越来越长，
+prompt_eval_duration 随之增长并成为延迟的主要部分。ContextWindow 在调用模型前裁剪消息历史：
+- 系统消息与用户指令（SystemMessage / HumanMessage）始终保留
+- 一次工具交互（带 tool_calls 的 AIMessage 及其对应的 ToolMessage）作为整体处理，不会拆开
+- 从最近的交互开始原样保留，直到用完预算；更早的交互把工具输出折叠为简短摘要，
+  折叠后仍超出预算的最早交互整体丢弃
+- 裁剪只影响发送给模型的消息，状态中的消息历史保持不变
+
+Ollama 没有提供分词接口，token 数按字符估算：CJK 字符约 1 个 token，其他字符约 4 个字符 1 个 token。
+"""
+
+import json
+import logging
+from dataclasses import dataclass
+from typing import List, Sequence, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+
+from plan_cache import tools_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# 默认的上下文 token 预算（Ollama 默认的 num_ctx）
+CONTEXT_MAX_TOKENS = 2048
+# 无论预算多少都原样保留的最近交互数
+KEEP_RECENT_EXCHANGES = 1
+# 折叠后的工具输出保留的字符数
+SUMMARY_CHARS = 60
+# 每条消息的角色标记等固定开销
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+def estimate_text_tokens(text: str) -> int:
+    """估算文本的 token 数"""
+    cjk = sum(1 for ch in text if ord(ch) >= 0x2E80)
+    return cjk + (len(text) - cjk + 3) // 4
+
+
+def estimate_tokens(message: BaseMessage) -> int:
+    """估算一条消息的 token 数，包括工具调用的名称与参数"""
+    content = message.content if isinstance(message.content, str) else json.dumps(message.content, ensure_ascii=False)
+    tokens = MESSAGE_OVERHEAD_TOKENS + estimate_text_tokens(content)
+    if isinstance(message, AIMessage) and message.tool_calls:
+        tokens += estimate_text_tokens(json.dumps([{'name': c['name'], 'args': c['args']} for c in message.tool_calls],
+                                                  ensure_ascii=False))
+    return tokens
+
+
+def summarize_tool_output(message: ToolMessage, summary_chars: int = SUMMARY_CHARS) -> ToolMessage:
+    """把工具输出折叠为前 summary_chars 个字符加省略说明"""
+    content = str(message.content)
+    if len(content) <= summary_chars:
+        return message
+    summary = f"{content[:summary_chars]}…（已折叠，原输出共{len(content)}字）"
+    return message.model_copy(update={'content': summary})
+
+
+@dataclass
+class WindowReport:
+    """一次裁剪的统计，token 数均为估算值"""
+    original_tokens: int
+    sent_tokens: int
+    collapsed: int
+    dropped: int
+
+    @property
+    def saved_tokens(self) -> int:
+        return self.original_tokens - self.sent_tokens
+
+    def __str__(self) -> str:
+        return (f"prompt约{self.sent_tokens} tokens（原{self.original_tokens}，节省{self.saved_tokens}），"
+                f"折叠{self.collapsed}条工具输出，丢弃{self.dropped}条消息")
+
+
+def _group_exchanges(messages: Sequence[BaseMessage]) -> Tuple[List[int], List[List[int]]]:
+    """返回 (指令消息下标, 交互列表)，每个交互是一组连续的消息下标"""
+    pinned, exchanges = [], []
+    for i, message in enumerate(messages):
+        if isinstance(message, (SystemMessage, HumanMessage)):
+            pinned.append(i)
+        elif isinstance(message, ToolMessage) and exchanges and isinstance(messages[exchanges[-1][0]], AIMessage) \
+                and messages[exchanges[-1][0]].tool_calls:
+            exchanges[-1].append(i)
+        else:
+            exchanges.append([i])
+    return pinned, exchanges
+
+
+class ContextWindow:
+    """在调用模型前把消息历史裁剪到 token 预算之内"""
+
+    def __init__(self, tools: Sequence = (), max_tokens: int = CONTEXT_MAX_TOKENS,
+                 keep_recent: int = KEEP_RECENT_EXCHANGES, summary_chars: int = SUMMARY_CHARS):
+        self.max_tokens = max_tokens
+        self.keep_recent = keep_recent
+        self.summary_chars = summary_chars
+        # 绑定的工具 schema 也会占用 prompt，从预算中预留
+        self.reserved_tokens = estimate_text_tokens(tools_fingerprint(tools)) if tools else 0
+        self.stats = {'calls': 0, 'trimmed_calls': 0, 'saved_tokens': 0}
+
+    def fit(self, messages: Sequence[BaseMessage]) -> Tuple[List[BaseMessage], WindowReport]:
+        """返回裁剪后的消息列表以及本次裁剪的统计"""
+        costs = [estimate_tokens(m) for m in messages]
+        original = sum(costs)
+        pinned, exchanges = _group_exchanges(messages)
+        budget = self.max_tokens - self.reserved_tokens - sum(costs[i] for i in pinned)
+
+        replacements = {}
+        dropped = set()
+        collapsed = 0
+        for rank, exchange in enumerate(reversed(exchanges)):
+            cost = sum(costs[i] for i in exchange)
+            if rank < self.keep_recent or cost <= budget:
+                budget -= cost
+                continue
+            # 预算不足以原样保留：折叠其中的工具输出
+            summaries = {i: summarize_tool_output(messages[i], self.summary_chars)
+                         for i in exchange if isinstance(messages[i], ToolMessage)}
+            summaries = {i: m for i, m in summaries.items() if m is not messages[i]}
+            cost = sum(estimate_tokens(summaries[i]) if i in summaries else costs[i] for i in exchange)
+            if cost <= budget:
+                budget -= cost
+                replacements.update(summaries)
+                collapsed += len(summaries)
+            else:
+                # 折叠后仍放不下，更早的交互也一并丢弃
+                budget = -1
+                dropped.update(exchange)
+
+        result = [replacements.get(i, m) for i, m in enumerate(messages) if i not in dropped]
+        report = WindowReport(original, sum(estimate_tokens(m) for m in result), collapsed, len(dropped))
+        self.stats['calls'] += 1
+        if report.saved_tokens:
+            self.stats['trimmed_calls'] += 1
+            self.stats['saved_tokens'] += report.saved_tokens
+        return result, report
@@ -0,0 +1,254 @@
+"""SQLite 数据访问层
+
+为 email_workflow 中的工具函数提供可复用的数据库连接：
+- 每个线程按 (数据库路径, 是否只读) 维护一条长连接，避免每次工具调用都重新打开文件、解析 schema
+- 读写连接启用 WAL 模式，读操作与写操作互不阻塞
+- 只读连接通过 URI ``mode=ro`` 打开，查询类工具不会意外写库
+- 使用 sqlite3 自带的预编译语句缓存（``cached_statements``）
+"""
+
+import os
+import sqlite3
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+USER_DB = 'user.db'
+RECOMMEND_DB = 'recommend.db'
+
+# 每条连接缓存的预编译语句数量
+STATEMENT_CACHE_SIZE = 128
+# 等待写锁的超时时间（秒）
+BUSY_TIMEOUT = 5.0
+# 推荐信息缓存的默认有效期（秒）
+RECOMMEND_CACHE_TTL = 300.0
+
+
+class ConnectionPool:
+    """按线程复用的 SQLite 连接池
+
+    sqlite3 连接默认不能跨线程使用，这里为每个线程各保留一组连接；
+    同一线程中的多个 asyncio 任务顺序执行 SQL，可以安全地共享同一条连接。
+    """
+
+    def __init__(self, cached_statements: int = STATEMENT_CACHE_SIZE, timeout: float = BUSY_TIMEOUT):
+        self.cached_statements = cached_statements
+        self.timeout = timeout
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._all_connections = []
+
+    def _connections(self) -> dict:
+        conns = getattr(self._local, 'conns', None)
+        if conns is None:
+            conns = self._local.conns = {}
+        return conns
+
+    def _open(self, path: str, readonly: bool) -> sqlite3.Connection:
+        if readonly:
+            uri = f"file:{os.path.abspath(path)}?mode=ro"
+            conn = sqlite3.connect(uri, uri=True, timeout=self.timeout,
+                                   cached_statements=self.cached_statements)
+        else:
+            conn = sqlite3.connect(path, timeout=self.timeout,
+                                   cached_statements=self.cached_statements)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+        with self._lock:
+            self._all_connections.append(conn)
+        logger.debug(f"打开数据库连接：{path}（只读={readonly}）")
+        return conn
+
+    def connection(self, path: str, readonly: bool = False) -> sqlite3.Connection:
+        """获取当前线程中指定数据库的连接，不存在时创建"""
+        key = (os.path.abspath(path), readonly)
+        conns = self._connections()
+        conn = conns.get(key)
+        if conn is None:
+            conn = conns[key] = self._open(path, readonly)
+        return conn
+
+    def query(self, path: str, sql: str, params=()) -> list:
+        """在只读连接上执行查询并返回全部结果"""
+        return self.connection(path, readonly=True).execute(sql, params).fetchall()
+
+    def query_one(self, path: str, sql: str, params=()):
+        """在只读连接上执行查询并返回第一行结果"""
+        return self.connection(path, readonly=True).execute(sql, params).fetchone()
+
+    def execute(self, path: str, sql: str, params=()) -> int:
+        """在读写连接上执行写操作并提交，返回受影响的行数"""
+        conn = self.connection(path)
+        with conn:
+            cur = conn.execute(sql, params)
+        return cur.rowcount
+
+    def close_all(self):
+        """关闭连接池打开过的所有连接"""
+        with self._lock:
+            conns, self._all_connections = self._all_connections, []
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.ProgrammingError:
+                # 连接属于其他线程时无法在此关闭，交给垃圾回收处理
+                pass
+        self._local = threading.local()
+
+
+class CachedQuery:
+    """带 TTL 与变更检测的查询结果缓存
+
+    适用于很少变化的小表（如推荐信息）：命中时直接返回内存中的结果。
+    每次命中都会用 ``PRAGMA data_version`` 检查数据库是否被其他连接修改过，
+    该检查只读取共享内存中的计数器，代价远小于重新查询。
+    data_version 的值只在同一条连接上可比较，因此缓存持有一条专用的只读连接。
+    """
+
+    def __init__(self, path: str, sql: str, params=(), ttl: float = RECOMMEND_CACHE_TTL):
+        self.path = path
+        self.sql = sql
+        self.params = params
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._rows = None
+        self._version = None
+        self._expires_at = 0.0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            uri = f"file:{os.path.abspath(self.path)}?mode=ro"
+            # 所有访问都在 self._lock 保护下进行，可以跨线程共享
+            self._conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        return self._conn
+
+    def data_version(self) -> int:
+        """返回数据库当前的 data_version，其他连接提交修改后该值会变化"""
+        with self._lock:
+            return self._connection().execute("PRAGMA data_version").fetchone()[0]
+
+    def get(self) -> list:
+        """返回查询结果，缓存过期或数据库已变更时重新查询"""
+        with self._lock:
+            conn = self._connection()
+            version = conn.execute("PRAGMA data_version").fetchone()[0]
+            if self._rows is not None and version == self._version and time.monotonic() < self._expires_at:
+                self.hits += 1
+                return list(self._rows)
+            self.misses += 1
+            self._rows = conn.execute(self.sql, self.params).fetchall()
+            self._version = version
+            self._expires_at = time.monotonic() + self.ttl
+            return list(self._rows)
+
+    def invalidate(self):
+        """丢弃缓存结果，下次读取时重新查询"""
+        with self._lock:
+            self._rows = None
+
+    def stats(self) -> dict:
+        """返回缓存命中统计"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / total if total else 0.0,
+        }
+
+    def close(self):
+        """关闭专用连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._rows = None
+
+
+class DataVersion:
+    """数据库的变更计数器，可作为缓存失效的检测函数
+
+    持有一条专用的只读连接，调用时返回 ``PRAGMA data_version``，其他连接提交修改后该值会变化。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def __call__(self) -> int:
+        with self._lock:
+            if self._conn is None:
+                uri = f"file:{os.path.abspath(self.path)}?mode=ro"
+                self._conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT, check_same_thread=False)
+            return self._conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def close(self):
+        """关闭专用连接"""
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+# user.db 的版本化 schema 迁移，下标 + 1 即迁移后的 schema 版本（记录在 PRAGMA user_version 中）
+USER_DB_MIGRATIONS = [
+    # v1: 用户表
+    """create table if not exists users
+             (id int primary key not null,
+             name varchar not null,
+             mail varchar not null);""",
+    # v2: 按姓名、邮箱查询的索引，保证查询随数据量增长保持 O(log n)
+    """create index if not exists idx_users_name on users (name);
+    create index if not exists idx_users_mail on users (mail);""",
+]
+
+
+def migrate(conn: sqlite3.Connection, migrations: list) -> int:
+    """将数据库升级到最新的 schema 版本，返回升级后的版本号"""
+    version = conn.execute("PRAGMA user_version").fetchone()[0]
+    for target, script in enumerate(migrations[version:], start=version + 1):
+        # executescript 会先提交未完成的事务，这里把版本号写入放进同一个脚本里保证原子性
+        try:
+            conn.executescript(f"BEGIN;\n{script}\nPRAGMA user_version = {target};\nCOMMIT;")
+        except sqlite3.Error:
+            # 脚本中途出错时事务仍处于打开状态，回滚后连接可以继续使用
+            if conn.in_transaction:
+                conn.rollback()
+            raise
+        logger.info(f"数据库 schema 已升级到 v{target}")
+    return max(version, len(migrations))
+
+
+# 进程内共享的默认连接池
+pool = ConnectionPool()
+
+# 推荐信息目录缓存，供 query_all_recommend 与邮件内容构建共用
+recommend_catalogue = CachedQuery(RECOMMEND_DB, "SELECT id, name, content FROM recommend")
+
+# 用户表的变更计数器，用户数据变化时使用户查询类工具的缓存结果失效
+user_data_version = DataVersion(USER_DB)
+
+
+def migrate_user_db(path: str = USER_DB) -> int:
+    """将用户数据库升级到最新的 schema 版本"""
+    return migrate(pool.connection(path), USER_DB_MIGRATIONS)
+
+
+def query(path: str, sql: str, params=()) -> list:
+    """使用默认连接池执行只读查询"""
+    return pool.query(path, sql, params)
+
+
+def query_one(path: str, sql: str, params=()):
+    """使用默认连接池执行只读查询，返回第一行"""
+    return pool.query_one(path, sql, params)
+
+
+def execute(path: str, sql: str, params=()) -> int:
+    """使用默认连接池执行写操作"""
+    return pool.execute(path, sql, params)
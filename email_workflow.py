@@ -1,102 +1,103 @@
 import os
-import sqlite3
+import argparse
+import asyncio
+import atexit
+import threading
 import logging
 import datetime
-from typing import Literal, Dict, Any
-from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
+import re
+from typing import Annotated, Literal, Dict, Any, Optional
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage, ToolMessage
 from langchain_core.tools import tool
-from langgraph.prebuilt import ToolNode
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from langgraph.graph import END, StateGraph, MessagesState
-from langgraph.checkpoint.memory import InMemorySaver
-from langchain_ollama import ChatOllama
-from email.mime.text import MIMEText
-from email.mime.multipart import MIMEMultipart
-import smtplib
-from dotenv import load_dotenv
 import random
+import db
+import llm_cache
+import llm_coalesce
+from ollama_warmup import OLLAMA_BASE_URL, OLLAMA_KEEP_ALIVE, prepare_model
+from context_window import ContextWindow
+from concurrent_tools import TOOL_TIMEOUT, ConcurrentToolExecutor, last_tool_calls, run_in_thread_pool
+import smtp_pool
+from db import USER_DB, RECOMMEND_DB, RECOMMEND_CACHE_TTL
+from plan_cache import PlanCache
+from checkpointers import make_checkpointer
+from token_stream import stream_tokens
+from tool_format import render_rows
+from tool_cache import ToolResultCache, cache_policy, side_effects
+from workflow_server import WORKFLOW_CONCURRENCY, WorkflowJob, run as run_workflows
+from mail_outbox import Outbox, OutboxWorker, make_idempotency_key
+from mail_templates import (RECOMMEND_EMAIL, RECOMMEND_ITEM, WELCOME_EMAIL, compile_template,
+                            get_message_factory, render_lines)
 
-# 配置日志
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-# 加载环境变量
-load_dotenv()
+# 查询类工具结果的列名
+USER_COLUMNS = ("id", "name", "mail")
+RECOMMEND_COLUMNS = ("id", "name", "content")
+
+# 用户查询类工具缓存结果的有效期（秒），用户表变化时立即失效
+USER_CACHE_TTL = 300.0
 
 def init_db():
     """初始化用户数据库信息"""
-    if not os.path.exists('user.db'):
-        conn = sqlite3.connect('user.db')
-        c = conn.cursor()
-        c.execute('''create table users
-                 (id int primary key not null,
-                 name varchar not null,
-                 mail varchar not null);''')
-        c.execute("insert into users (id, name, mail) " +
-                  "values (1, 'John', 'alphachenx@sina.com')")
-        c.execute("insert into users (id, name, mail) " +
-                  "values (2, 'Tom', 'alphachenx@sina.com')")
-        conn.commit()
-        conn.close()
+    created = not os.path.exists(USER_DB)
+    db.migrate_user_db(USER_DB)
+    if created:
+        conn = db.pool.connection(USER_DB)
+        with conn:
+            conn.executemany("insert into users (id, name, mail) values (?, ?, ?)",
+                             [(1, 'John', 'alphachenx@sina.com'),
+                              (2, 'Tom', 'alphachenx@sina.com')])
         logger.info("数据库初始化完成，创建了测试用户数据")
     else:
-        logger.info("数据库已存在，跳过初始化")
+        logger.info("数据库已存在，跳过测试数据初始化")
 
 
-@tool
+@tool(response_format="content_and_artifact")
 def query_all_users():
     """查询数据库中所有的用户信息，返回用户的id、姓名和邮箱地址"""
-    conn = sqlite3.connect('user.db')
-    c = conn.cursor()
-    c.execute("SELECT id, name, mail FROM users")
-    rows = c.fetchall()
-    conn.close()
+    rows = db.query(USER_DB, "SELECT id, name, mail FROM users")
     logger.info(f"查询到{len(rows)}个用户")
-    return str(rows)
+    return render_rows(USER_COLUMNS, rows), rows
 
-@tool
+@tool(response_format="content_and_artifact")
 def query_user_by_name(name: str):
     """查询数据库中所有的用户信息，返回用户的id、姓名和邮箱地址"""
-    conn = sqlite3.connect('user.db')
-    c = conn.cursor()
-    c.execute("SELECT id, name, mail FROM users WHERE name = ?", (name,))
-    rows = c.fetchall()
+    rows = db.query(USER_DB, "SELECT id, name, mail FROM users WHERE name = ?", (name,))
     if len(rows) == 0:
-        return "没有查询到用户"
+        return "没有查询到用户", rows
     else:
-        conn.close()
         logger.info(f"查询到{len(rows)}个用户")
-        return str(rows)
+        return render_rows(USER_COLUMNS, rows), rows
+
 def init_recomment_db():
     """初始化推荐数据库信息"""
-    if not os.path.exists('recommend.db'):
-        conn = sqlite3.connect('recommend.db')
-        c = conn.cursor()
-        c.execute('''create table recommend
-                 (id int primary key not null,
-                 name varchar not null,
-                 content varchar not null);''')
-        c.execute("insert into recommend (id, name, content) " +
-                  "values (1, '推荐你去尝试一下这个项目xxxx', '推荐你去尝试一下这个项目xxxxxxxxx')")
-        c.execute("insert into recommend (id, name, content) " +
-                  "values (2, '推荐你去尝试一下这个项目yyyy', '推荐你去尝试一下这个项目yyyyyyyyy')")
-        c.execute("insert into recommend (id, name, content) " +
-                  "values (3, '推荐你去尝试一下这个项目zzzz', '推荐你去尝试一下这个项目zzzzzzzzz')")
-        conn.commit()
-        conn.close()
+    if not os.path.exists(RECOMMEND_DB):
+        conn = db.pool.connection(RECOMMEND_DB)
+        with conn:
+            c = conn.cursor()
+            c.execute('''create table recommend
+                     (id int primary key not null,
+                     name varchar not null,
+                     content varchar not null);''')
+            c.execute("insert into recommend (id, name, content) " +
+                      "values (1, '推荐你去尝试一下这个项目xxxx', '推荐你去尝试一下这个项目xxxxxxxxx')")
+            c.execute("insert into recommend (id, name, content) " +
+                      "values (2, '推荐你去尝试一下这个项目yyyy', '推荐你去尝试一下这个项目yyyyyyyyy')")
+            c.execute("insert into recommend (id, name, content) " +
+                      "values (3, '推荐你去尝试一下这个项目zzzz', '推荐你去尝试一下这个项目zzzzzzzzz')")
         logger.info("数据库初始化完成，创建了测试推荐数据")
     else:
         logger.info("数据库已存在，跳过初始化")
 
-@tool
+@tool(response_format="content_and_artifact")
 def query_all_recommend():
     """查询数据库中所有的推荐信息，返回推荐的id、姓名和内容"""
-    conn = sqlite3.connect('recommend.db')
-    c = conn.cursor()
-    c.execute("SELECT id, name, content FROM recommend")
-    rows = c.fetchall()
-    conn.close()
+    rows = db.recommend_catalogue.get()
     logger.info(f"查询到{len(rows)}条推荐信息")
-    return str(rows)
+    logger.debug(f"推荐信息缓存统计：{db.recommend_catalogue.stats()}")
+    return render_rows(RECOMMEND_COLUMNS, rows), rows
 
 @tool
 def get_current_weekday():
@@ -109,11 +110,7 @@ def get_current_weekday():
 
 def _send_welcome_email_impl(mail: str, name: str):
     """邮件发送的核心实现逻辑"""
-    # 配置邮件服务器
-    smtp_server = "smtp.sina.com"
-    smtp_port = 587
-    
-    # 从环境变量中获取邮件发送者信息
+    # 从环境变量中获取邮件发送者信息（邮件服务器配置见 smtp_pool）
     sender_email = os.getenv("EMAIL_SENDER")
     sender_password = os.getenv("EMAIL_PASSWORD")
     
@@ -122,24 +119,15 @@ def _send_welcome_email_impl(mail: str, name: str):
         logger.error(error_msg)
         return error_msg
     
-    # 创建邮件对象
-    msg = MIMEMultipart()
-    msg['From'] = sender_email
-    msg['To'] = mail
-    msg['Subject'] = "欢迎加入我们的平台"
-    
-    # 添加邮件正文
-    body = f"亲爱的{name}：\n\n欢迎加入我们的平台！我们很高兴能有您这样的用户。\n\n如有任何问题，请随时联系我们。\n\n祝好！\n我们的团队"
-    msg.attach(MIMEText(body, 'plain'))
+    # 渲染预编译的邮件模板，固定的MIME头部由缓存的MessageFactory共享
+    body = compile_template(WELCOME_EMAIL).render(name=name)
+    raw = get_message_factory(sender_email, "欢迎加入我们的平台").build(mail, body)
     
     try:
-        # 连接到SMTP服务器并发送邮件
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            # server.starttls()  # 如果需要SSL/TLS加密连接，可以取消注释此行
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
-            logger.info(f"欢迎邮件已发送至 {mail}（{name}）")
-            return f"成功发送欢迎邮件至{name}（{mail}）"
+        # 通过共享的SMTP连接池发送邮件，复用已登录的连接
+        smtp_pool.get_pool().sendmail(sender_email, [mail], raw)
+        logger.info(f"欢迎邮件已发送至 {mail}（{name}）")
+        return f"成功发送欢迎邮件至{name}（{mail}）"
     except Exception as e:
         error_msg = f"发送邮件时出错：{str(e)}"
         logger.error(error_msg)
@@ -151,30 +139,122 @@ def send_welcome_email(mail: str, name: str):
     """给指定用户发送欢迎邮件"""
     return _send_welcome_email_impl(mail, name)
 
-@tool
+@tool(response_format="content_and_artifact")
 def get_random_number():
     """返回一个随机数，范围是0 到 100 """
-    return random.randint(0, 100)
+    number = random.randint(0, 100)
+    return str(number), number
 
 
 # 定义工具列表
 tools = [query_all_users, query_user_by_name,send_welcome_email, get_current_weekday, query_all_recommend, get_random_number]
-tool_node = ToolNode(tools)
 
-# 初始化Ollama模型
-model = ChatOllama(
-    model="qwen2:latest",
-    base_url="http://localhost:11434",
-    temperature=0
-)
+# 数据库与邮件类工具会阻塞，为它们提供在共享线程池中执行的异步版本，异步运行时互不阻塞
+for _blocking_tool in (query_all_users, query_user_by_name, query_all_recommend, send_welcome_email):
+    run_in_thread_pool(_blocking_tool)
+
+# 按时间窗口确定的工具缓存结果：星期几当天不变，用户与推荐信息在数据表变化前不变；发送邮件有副作用，永不缓存
+cache_policy(get_current_weekday, ttl=24 * 3600, version=datetime.date.today)
+cache_policy(query_all_users, ttl=USER_CACHE_TTL, version=db.user_data_version)
+cache_policy(query_user_by_name, ttl=USER_CACHE_TTL, key=lambda args: args['name'], version=db.user_data_version)
+cache_policy(query_all_recommend, ttl=RECOMMEND_CACHE_TTL, version=db.recommend_catalogue.data_version)
+side_effects(send_welcome_email)
+side_effects(get_random_number)
+
+# 同一条AIMessage中的多个工具调用并发执行，每个调用单独超时
+tool_result_cache = ToolResultCache()
+tool_executor = ConcurrentToolExecutor(tools, timeout=TOOL_TIMEOUT, cache=tool_result_cache)
+
+# Ollama模型配置
+MODEL_NAME = "qwen2:latest"
+MODEL_TEMPERATURE = 0
+
+# 模型与上下文窗口在第一次使用时才创建，导入本模块（测试、后台worker、LangGraph服务）时不加载langchain_ollama
+_model = None
+_context_window = None
+
+
+def get_model():
+    """返回绑定了工具的Ollama模型，首次调用时创建"""
+    global _model
+    if _model is None:
+        from langchain_ollama import ChatOllama
+        _model = ChatOllama(
+            model=MODEL_NAME,
+            base_url=OLLAMA_BASE_URL,
+            temperature=MODEL_TEMPERATURE,
+            # 每次调用都续期，模型在两次调用之间保持加载
+            keep_alive=OLLAMA_KEEP_ALIVE
+        ).bind_tools(tools)
+    return _model
+
+
+def get_context_window() -> ContextWindow:
+    """返回按token预算裁剪消息历史的上下文窗口，较早的工具输出折叠为摘要"""
+    global _context_window
+    if _context_window is None:
+        _context_window = ContextWindow(tools)
+    return _context_window
+
+
+def merge_tool_results(left: Optional[Dict[str, str]], right: Optional[Dict[str, str]]) -> Dict[str, str]:
+    '''tool_results 的 reducer：按工具名合并，新的结果覆盖旧的'''
+    return {**(left or {}), **(right or {})}
+
+
+class WorkflowState(MessagesState):
+    '''工作流状态：在消息历史之外，由 tools 节点增量维护工具结果，路由与处理节点直接读取，无需重新扫描消息'''
+    # 按工具名记录最近一次的工具返回内容
+    tool_results: Annotated[Dict[str, str], merge_tool_results]
+    # 解析后的星期几与随机数，尚未获取时为 None
+    weekday: Optional[str]
+    random_number: Optional[int]
 
-# 为Ollama模型配置工具调用功能
-model = model.bind_tools(tools)
 
-def check_weekday_and_random_number(state: MessagesState) -> Literal["tools", "process_random_number", END]:
+def parse_random_number(content: str) -> int:
+    '''将 get_random_number 的返回内容解析为整数，仅用于没有 artifact 的旧消息（例如从旧检查点恢复）'''
+    try:
+        return int(content)
+    except ValueError:
+        # 如果转换失败，检查内容中是否包含数字
+        numbers = re.findall(r'\d+', content)
+        return int(numbers[0]) if numbers else 0
+
+
+def extract_tool_fields(messages: list) -> Dict[str, Any]:
+    '''从本轮新增的工具消息中提取需要写入状态的字段'''
+    update = {}
+    tool_results = {}
+    for msg in messages:
+        if not isinstance(msg, ToolMessage):
+            continue
+        tool_results[msg.name] = msg.content
+        if msg.name == 'get_current_weekday':
+            update['weekday'] = msg.content
+        elif msg.name == 'get_random_number':
+            # 工具在 artifact 中直接给出整数，不再解析文本
+            update['random_number'] = (msg.artifact if isinstance(msg.artifact, int)
+                                       else parse_random_number(msg.content))
+    if tool_results:
+        update['tool_results'] = tool_results
+    return update
+
+
+def run_tools(state: WorkflowState, config: RunnableConfig) -> Dict[str, Any]:
+    '''并发执行工具调用，并把本轮工具结果写入状态字段'''
+    messages = tool_executor.invoke(last_tool_calls(state['messages']), config)
+    return {"messages": messages, **extract_tool_fields(messages)}
+
+
+async def arun_tools(state: WorkflowState, config: RunnableConfig) -> Dict[str, Any]:
+    '''run_tools 的异步版本，在事件循环中并发 await 各个工具'''
+    messages = await tool_executor.ainvoke(last_tool_calls(state['messages']), config)
+    return {"messages": messages, **extract_tool_fields(messages)}
+
+
+def check_weekday_and_random_number(state: WorkflowState) -> Literal["tools", "process_random_number", END]:
     '''根据工具调用请求或工具返回结果决定路由'''
-    messages = state['messages']
-    last_message = messages[-1]
+    last_message = state['messages'][-1]
     
     # 检查是否有工具调用请求
     if hasattr(last_message, 'tool_calls') and last_message.tool_calls:
@@ -183,16 +263,7 @@ def check_weekday_and_random_number(state: MessagesState) -> Literal["tools", "p
     # 检查是否是工具返回的结果
     if hasattr(last_message, 'name'):
         # 如果已经获取了星期几和随机数，处理随机数
-        weekday_found = False
-        random_number_found = False
-        for msg in messages:
-            if hasattr(msg, 'name'):
-                if msg.name == 'get_current_weekday':
-                    weekday_found = True
-                elif msg.name == 'get_random_number':
-                    random_number_found = True
-        
-        if weekday_found and random_number_found:
+        if state.get('weekday') is not None and state.get('random_number') is not None:
             return "process_random_number"
         
         # 如果还需要获取其他工具的结果，继续使用工具
@@ -202,143 +273,176 @@ def check_weekday_and_random_number(state: MessagesState) -> Literal["tools", "p
     return END
 
 
-def process_random_number(state: MessagesState) -> Dict[str, Any]:
+# 邮件发件箱：process_random_number 只负责入队，由后台的 OutboxWorker 发送
+_outbox = None
+_outbox_worker = None
+_outbox_lock = threading.Lock()
+# 进程退出时最多等待多久（秒）让发件箱中的邮件发送完成
+OUTBOX_DRAIN_TIMEOUT = 30.0
+
+
+def get_outbox() -> Outbox:
+    """返回进程内共享的发件箱，首次调用时创建"""
+    global _outbox
+    with _outbox_lock:
+        if _outbox is None:
+            _outbox = Outbox()
+        return _outbox
+
+
+def get_outbox_worker() -> OutboxWorker:
+    """返回发送共享发件箱的后台线程，首次调用时启动，并在进程退出时等待发件箱清空后停止"""
+    global _outbox_worker
+    outbox = get_outbox()
+    with _outbox_lock:
+        if _outbox_worker is None:
+            _outbox_worker = OutboxWorker(outbox).start()
+            # 停止后重新启动时不重复注册
+            atexit.unregister(stop_outbox_worker)
+            atexit.register(stop_outbox_worker)
+        return _outbox_worker
+
+
+def stop_outbox_worker(drain_timeout: float = OUTBOX_DRAIN_TIMEOUT):
+    """等待发件箱清空（最多 drain_timeout 秒）后停止后台线程；之后再入队会重新启动"""
+    global _outbox_worker
+    with _outbox_lock:
+        worker, _outbox_worker = _outbox_worker, None
+    if worker is not None:
+        worker.stop(drain_timeout=drain_timeout)
+
+
+def enqueue_email(state: WorkflowState, config: RunnableConfig, mail: str, content: str, subject: str) -> str:
+    '''将邮件加入发件箱并返回结果描述
+
+    幂等键由 thread_id 与触发本次发送的消息 id 组成，节点从检查点重放时不会重复入队。
+    首次入队时启动后台发送线程，无论图是由 main() 还是 init_workflow() 的其他调用方执行，邮件都会被发送。
+    '''
+    thread_id = config.get("configurable", {}).get("thread_id")
+    key = make_idempotency_key(thread_id, state['messages'][-1].id, mail, subject)
+    get_outbox_worker()
+    if get_outbox().enqueue(mail, subject, content, key):
+        return f"邮件已加入发件箱，收件人：{mail}"
+    return f"邮件已在发件箱中，跳过重复入队，收件人：{mail}"
+
+
+def render_recommend_email(name: str, random_number: int, recommend_data: list) -> str:
+    '''渲染包含随机数和推荐信息的邮件正文'''
+    recommendations = render_lines(RECOMMEND_ITEM, ({'name': item[1], 'content': item[2]} for item in recommend_data))
+    return compile_template(RECOMMEND_EMAIL).render(name=name, random_number=random_number,
+                                                    recommendations=recommendations)
+
+
+def process_random_number(state: WorkflowState, config: RunnableConfig) -> Dict[str, Any]:
     '''根据随机数处理邮件发送任务'''
-    # 从消息中提取星期几和随机数
-    weekday = None
-    random_number = None
-    
-    for msg in state['messages']:
-        if hasattr(msg, 'name'):
-            if msg.name == 'get_current_weekday':
-                weekday = msg.content
-            elif msg.name == 'get_random_number':
-                # 尝试将内容转换为整数
-                try:
-                    random_number = int(msg.content)
-                except ValueError:
-                    # 如果转换失败，检查内容中是否包含数字
-                    import re
-                    numbers = re.findall(r'\d+', msg.content)
-                    if numbers:
-                        random_number = int(numbers[0])
-                    else:
-                        random_number = 0
+    # 星期几和随机数由 tools 节点写入状态
+    weekday = state.get('weekday')
+    random_number = state.get('random_number')
     
     logger.info(f"获取到当前是{weekday}，随机数是{random_number}")
     
     # 根据随机数大小执行不同操作
     if random_number > 50:
         # 随机数大于50，获取John的邮箱并发送包含随机数和推荐信息的邮件
-        conn = sqlite3.connect('user.db')
-        c = conn.cursor()
-        c.execute("SELECT id, name, mail FROM users WHERE name = ?", ("John",))
-        john_user = c.fetchone()
-        conn.close()
+        john_user = db.query_one(USER_DB, "SELECT id, name, mail FROM users WHERE name = ?", ("John",))
         
         if john_user:
             _, name, mail = john_user
             # 获取推荐信息
-            recommend_conn = sqlite3.connect('recommend.db')
-            recommend_c = recommend_conn.cursor()
-            recommend_c.execute("SELECT id, name, content FROM recommend")
-            recommend_data = recommend_c.fetchall()
-            recommend_conn.close()
+            recommend_data = db.recommend_catalogue.get()
             
-            # 构建邮件内容
-            email_content = f"亲爱的{name}：\n\n您好！这是一封包含随机数和推荐信息的邮件。\n\n随机数：{random_number}\n\n推荐信息：\n"
-            for item in recommend_data:
-                email_content += f"- {item[1]}: {item[2]}\n"
-            email_content += "\n如有任何问题，请随时联系我们。\n\n祝好！\n我们的团队"
+            # 使用预编译模板构建邮件内容
+            email_content = render_recommend_email(name, random_number, recommend_data)
             
-            # 发送邮件
-            result = send_custom_email(mail, name, email_content, "随机数与推荐信息")
-            return {"messages": [AIMessage(content=f"任务已完成：随机数{random_number}大于50，已向John发送包含随机数和推荐信息的邮件\n{result}")]}
+            # 邮件加入发件箱，由后台线程发送
+            result = enqueue_email(state, config, mail, email_content, "随机数与推荐信息")
+            return {"messages": [AIMessage(content=f"任务已完成：随机数{random_number}大于50，已将发给John的包含随机数和推荐信息的邮件加入发件箱\n{result}")]}
         else:
             return {"messages": [AIMessage(content="任务执行失败：未找到名为John的用户")]}
     else:
         # 随机数小于等于50，获取Tom的邮箱并发送包含随机数和推荐信息的邮件
-        conn = sqlite3.connect('user.db')
-        c = conn.cursor()
-        c.execute("SELECT id, name, mail FROM users WHERE name = ?", ("Tom",))
-        tom_user = c.fetchone()
-        conn.close()
+        tom_user = db.query_one(USER_DB, "SELECT id, name, mail FROM users WHERE name = ?", ("Tom",))
         
         if tom_user:
             _, name, mail = tom_user
             # 获取推荐信息
-            recommend_conn = sqlite3.connect('recommend.db')
-            recommend_c = recommend_conn.cursor()
-            recommend_c.execute("SELECT id, name, content FROM recommend")
-            recommend_data = recommend_c.fetchall()
-            recommend_conn.close()
+            recommend_data = db.recommend_catalogue.get()
             
-            # 构建邮件内容
-            email_content = f"亲爱的{name}：\n\n您好！这是一封包含随机数和推荐信息的邮件。\n\n随机数：{random_number}\n\n推荐信息：\n"
-            for item in recommend_data:
-                email_content += f"- {item[1]}: {item[2]}\n"
-            email_content += "\n如有任何问题，请随时联系我们。\n\n祝好！\n我们的团队"
+            # 使用预编译模板构建邮件内容
+            email_content = render_recommend_email(name, random_number, recommend_data)
             
-            # 发送邮件
-            result = send_custom_email(mail, name, email_content, "随机数与推荐信息")
-            return {"messages": [AIMessage(content=f"任务已完成：随机数{random_number}小于等于50，已向Tom发送包含随机数和推荐信息的邮件\n{result}")]}
+            # 邮件加入发件箱，由后台线程发送
+            result = enqueue_email(state, config, mail, email_content, "随机数与推荐信息")
+            return {"messages": [AIMessage(content=f"任务已完成：随机数{random_number}小于等于50，已将发给Tom的包含随机数和推荐信息的邮件加入发件箱\n{result}")]}
         else:
             return {"messages": [AIMessage(content="任务执行失败：未找到名为Tom的用户")]}
 
 
-def send_custom_email(mail: str, name: str, content: str, subject: str = "自定义邮件"):
-    '''发送自定义内容的邮件'''
-    # 配置邮件服务器
-    smtp_server = "smtp.sina.com"
-    smtp_port = 587
-    
-    # 从环境变量中获取邮件发送者信息
-    sender_email = os.getenv("EMAIL_SENDER")
-    sender_password = os.getenv("EMAIL_PASSWORD")
-    
-    if not sender_email or not sender_password:
-        error_msg = "未配置邮件发送者信息，请检查.env文件"
-        logger.error(error_msg)
-        return error_msg
-    
-    # 创建邮件对象
-    msg = MIMEMultipart()
-    msg['From'] = sender_email
-    msg['To'] = mail
-    msg['Subject'] = subject
-    
-    # 添加邮件正文
-    msg.attach(MIMEText(content, 'plain'))
-    
-    try:
-        # 连接到SMTP服务器并发送邮件
-        with smtplib.SMTP(smtp_server, smtp_port) as server:
-            # server.starttls()  # 如果需要SSL/TLS加密连接，可以取消注释此行
-            server.login(sender_email, sender_password)
-            server.send_message(msg)
-            logger.info(f"邮件已发送至 {mail}（{name}），主题：{subject}")
-            return f"成功发送邮件至{name}（{mail}）"
-    except Exception as e:
-        error_msg = f"发送邮件时出错：{str(e)}"
-        logger.error(error_msg)
-        return error_msg
+# 工具调用计划缓存：相同的任务指令直接回放上次的工具调用，跳过LLM
+_plan_cache = None
+_plan_cache_lock = threading.Lock()
 
 
-def call_model(state: MessagesState):
+def get_plan_cache() -> PlanCache:
+    """返回进程内共享的计划缓存，首次调用时创建"""
+    global _plan_cache
+    with _plan_cache_lock:
+        if _plan_cache is None:
+            _plan_cache = PlanCache()
+        return _plan_cache
+
+
+def replay_plan(messages: list) -> Optional[AIMessage]:
+    '''检查上一步回放的计划是否出错，并尝试从计划缓存回放本步的工具调用'''
+    plan_cache = get_plan_cache()
+    plan_cache.check_replay(messages)
+    return plan_cache.replay(messages, tools, MODEL_NAME)
+
+
+def call_model(state: WorkflowState):
     '''Agent调用LLM的方法'''    
     messages = state['messages']
-    response = model.invoke(messages)
+    plan_cache = get_plan_cache()
+    response = replay_plan(messages)
+    if response is None:
+        window, report = get_context_window().fit(messages)
+        logger.info(f"上下文窗口：{report}")
+        # temperature为0时使用LLM响应缓存，相同的消息历史直接返回缓存的回复
+        response = llm_cache.cached_invoke(get_model(), window, MODEL_NAME, MODEL_TEMPERATURE, tools)
+        plan_cache.record(messages, tools, MODEL_NAME, response)
+    return {"messages": [response]}
+
+
+async def acall_model(state: WorkflowState):
+    '''call_model 的异步版本，用 ainvoke 调用LLM，多个工作流实例可以在同一个事件循环中并发执行
+
+    计划缓存的 SQLite 读写放到线程中执行，不阻塞同一事件循环中的其他工作流。
+    '''
+    messages = state['messages']
+    plan_cache = get_plan_cache()
+    response = await asyncio.to_thread(replay_plan, messages)
+    if response is None:
+        window, report = get_context_window().fit(messages)
+        logger.info(f"上下文窗口：{report}")
+        response = await llm_cache.acached_invoke(get_model(), window, MODEL_NAME, MODEL_TEMPERATURE, tools)
+        await asyncio.to_thread(plan_cache.record, messages, tools, MODEL_NAME, response)
     return {"messages": [response]}
 
 
-def init_workflow():
-    """初始化工作流"""
+def init_workflow(checkpointer=None, warm_up=True):
+    """初始化工作流；未指定 checkpointer 时按环境变量 CHECKPOINTER 选择（默认保存在内存中）
+
+    warm_up 为 True 时预加载模型并在后台定期续期 keep_alive（预热失败时不续期），启动日志中分别给出加载与推理耗时。
+    """
+    if warm_up:
+        prepare_model(MODEL_NAME)
+    
     # 创建状态图以管理消息状态和流程控制
-    workflow = StateGraph(MessagesState)
+    workflow = StateGraph(WorkflowState)
     
     # 定义节点
-    workflow.add_node("agent", call_model)
-    workflow.add_node("tools", tool_node)
+    workflow.add_node("agent", RunnableLambda(call_model, afunc=acall_model))
+    workflow.add_node("tools", RunnableLambda(run_tools, afunc=arun_tools))
     workflow.add_node("process_random_number", process_random_number)
     
     # 定义工作流的入口点为agent节点
@@ -356,15 +460,32 @@ def init_workflow():
     # 添加处理随机数的边
     workflow.add_edge("process_random_number", END)
     
-    # 初始化内存以在状态图运行过程中保持状态
-    checkpointer = InMemorySaver()
+    # 在状态图运行过程中保持状态：CHECKPOINTER=sqlite 时持久化到 SQLite 并按保留策略清理
+    if checkpointer is None:
+        checkpointer = make_checkpointer()
     
     # 将工作流编译成一个可执行的App
     app = workflow.compile(checkpointer=checkpointer)
     return app
 
 
-if __name__ == "__main__":
+def main():
+    parser = argparse.ArgumentParser(description="定时邮件任务工作流")
+    parser.add_argument("--stream", choices=["updates", "tokens"], default="updates",
+                        help="updates：每个节点执行完后输出结果；tokens：实时输出模型生成的token，并统计首token耗时与生成速度")
+    parser.add_argument("--runs", type=int, default=1,
+                        help="同时执行的工作流实例数，大于1时每个实例使用独立的thread_id，由异步的WorkflowServer并发执行")
+    parser.add_argument("--concurrency", type=int, default=WORKFLOW_CONCURRENCY,
+                        help="--runs 大于1时同时执行的最大实例数")
+    args = parser.parse_args()
+    
+    # 配置日志
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    
+    # 加载环境变量
+    from dotenv import load_dotenv
+    load_dotenv()
+    
     # 初始化数据库
     init_db()
     
@@ -381,13 +502,35 @@ if __name__ == "__main__":
     
     logger.info("开始执行工作流：查询所有用户并发送欢迎邮件")
     
-    # 流式输出结果
-    i = 0
-    for output in app.stream(
-            inputs,
-            config={"configurable": {"thread_id": 42}}):
-        for key, value in output.items():
-            i += 1
-            print(f"\n==========={i}、从'{key}'输出:\n{value}")
+    config = {"configurable": {"thread_id": 42}}
+    if args.runs > 1:
+        # 并发执行多个工作流实例，输出吞吐量与延迟分位数
+        jobs = (WorkflowJob(thread_id=f"email-{i}", inputs={"messages": [HumanMessage(content=task_instruction)]})
+                for i in range(args.runs))
+        stats = run_workflows(app, jobs, concurrency=args.concurrency)
+        for thread_id, error in stats.failures:
+            logger.error(f"工作流 {thread_id} 失败：{error}")
+    elif args.stream == "tokens":
+        # 按token流式输出agent节点，其他节点执行完后输出结果
+        for timing in stream_tokens(app, inputs, config):
+            logger.info(str(timing))
+    else:
+        # 流式输出结果
+        i = 0
+        for output in app.stream(inputs, config=config):
+            for key, value in output.items():
+                i += 1
+                print(f"\n==========={i}、从'{key}'输出:\n{value}")
+    
+    logger.info("工作流执行完成")
+    logger.info(f"计划缓存统计：{get_plan_cache().stats()}")
+    logger.info(f"工具结果缓存统计：{tool_result_cache.stats()}")
+    logger.info(f"模型请求合并统计：{llm_coalesce.get_coalescer().stats()}")
     
-    logger.info("工作流执行完成")
\ No newline at end of file
+    # 等待发件箱中的邮件发送完成
+    stop_outbox_worker()
+    logger.info(f"发件箱状态：{get_outbox().status_counts()}")
+
+
+if __name__ == "__main__":
+    main()
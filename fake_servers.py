@@ -0,0 +1,270 @@
+"""本地替身服务器
+
+在本机随机端口上启动的轻量级服务器，用于在没有真实外部服务时测试与压测：
+- FakeSMTPServer：实现 EHLO/AUTH/MAIL/RCPT/DATA/NOOP/RSET/QUIT 的最小 SMTP 服务器，记录收到的邮件
+- FakeOllamaServer：实现 /api/generate 与 /api/chat 的最小 Ollama HTTP 服务，模拟模型加载耗时与 keep_alive 过期
+
+用法：
+    with FakeSMTPServer() as server:
+        pool = SMTPPool(server.host, server.port, "user", "pass")
+        ...
+        print(server.messages)
+"""
+
+import json
+import re
+import socketserver
+import threading
+import time
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class _SMTPHandler(socketserver.StreamRequestHandler):
+    """处理单条 SMTP 连接"""
+
+    def reply(self, line: str):
+        self.wfile.write(f"{line}\r\n".encode())
+
+    def handle(self):
+        smtp = self.server.owner
+        smtp._register(self.connection)
+        try:
+            self.reply("220 fake-smtp ready")
+            mail_from, rcpt_to = None, []
+            while True:
+                raw = self.rfile.readline()
+                if not raw:
+                    return
+                line = raw.decode('utf-8', 'replace').rstrip("\r\n")
+                command = line[:4].upper()
+                if command in ("EHLO", "HELO"):
+                    self.wfile.write(b"250-fake-smtp\r\n250-AUTH PLAIN LOGIN\r\n250 8BITMIME\r\n")
+                elif command == "AUTH":
+                    smtp._count('logins')
+                    self.reply("235 2.7.0 Authentication successful")
+                elif command == "MAIL":
+                    mail_from, rcpt_to = line[10:].strip(), []
+                    self.reply(smtp.next_mail_reply())
+                elif command == "RCPT":
+                    rcpt_to.append(line[8:].strip())
+                    self.reply("250 OK")
+                elif command == "DATA":
+                    self.reply("354 End data with <CR><LF>.<CR><LF>")
+                    data = []
+                    while True:
+                        chunk = self.rfile.readline()
+                        if not chunk or chunk == b".\r\n":
+                            break
+                        data.append(chunk)
+                    smtp._store(mail_from, rcpt_to, b"".join(data))
+                    self.reply("250 OK queued")
+                elif command == "NOOP":
+                    smtp._count('noops')
+                    self.reply("250 OK")
+                elif command == "RSET":
+                    mail_from, rcpt_to = None, []
+                    self.reply("250 OK")
+                elif command == "QUIT":
+                    self.reply("221 Bye")
+                    return
+                else:
+                    self.reply("502 Command not implemented")
+        except (ConnectionError, OSError):
+            return
+        finally:
+            smtp._unregister(self.connection)
+
+
+class _ThreadingTCPServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+class FakeSMTPServer:
+    """在后台线程中运行的本地 SMTP 替身服务器"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0):
+        self._server = _ThreadingTCPServer((host, port), _SMTPHandler)
+        self._server.owner = self
+        self.host, self.port = self._server.server_address
+        self._lock = threading.Lock()
+        self._sockets = set()
+        self._thread = None
+        self.messages = []
+        self.stats = {'connections': 0, 'logins': 0, 'noops': 0, 'messages': 0}
+        # 依次用于 MAIL FROM 命令的应答，为空时返回 250；可用来模拟临时性错误（如 421/451）
+        self.mail_replies = []
+
+    def _register(self, sock):
+        with self._lock:
+            self._sockets.add(sock)
+            self.stats['connections'] += 1
+
+    def _unregister(self, sock):
+        with self._lock:
+            self._sockets.discard(sock)
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _store(self, mail_from: str, rcpt_to: list, data: bytes):
+        with self._lock:
+            self.messages.append((mail_from, list(rcpt_to), data))
+            self.stats['messages'] += 1
+
+    def next_mail_reply(self) -> str:
+        with self._lock:
+            return self.mail_replies.pop(0) if self.mail_replies else "250 OK"
+
+    def drop_connections(self):
+        """强制断开所有客户端连接，模拟服务器端掉线"""
+        with self._lock:
+            sockets = list(self._sockets)
+        for sock in sockets:
+            try:
+                sock.shutdown(2)
+            except OSError:
+                pass
+
+    def start(self) -> "FakeSMTPServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        self.drop_connections()
+
+    def __enter__(self) -> "FakeSMTPServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def _keep_alive_seconds(value) -> float:
+    """把 Ollama 的 keep_alive 参数（秒数或 "30s"/"5m"/"1h" 形式的字符串）转换为秒，负数表示永不卸载"""
+    if value is None:
+        return 300.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    match = re.fullmatch(r"(-?\d+(?:\.\d+)?)([smh]?)", str(value).strip())
+    if not match:
+        return 300.0
+    number, unit = float(match.group(1)), match.group(2)
+    return number * {'': 1, 's': 1, 'm': 60, 'h': 3600}[unit]
+
+
+class _OllamaHandler(BaseHTTPRequestHandler):
+    """处理单个 Ollama API 请求"""
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        ollama = self.server.owner
+        request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path not in ("/api/generate", "/api/chat"):
+            self._send_json(404, {"error": f"unknown endpoint {self.path}"})
+            return
+        load_duration = ollama._load(request.get("model", ""), request.get("keep_alive"))
+        if self.path == "/api/generate":
+            prompt = request.get("prompt") or ""
+            payload = {"response": ollama.reply if prompt else "", "done_reason": "stop" if prompt else "load"}
+        else:
+            payload = {"message": {"role": "assistant", "content": ollama.reply}, "done_reason": "stop"}
+        inference = ollama.inference_delay if payload["done_reason"] == "stop" else 0.0
+        if inference:
+            time.sleep(inference)
+        self._send_json(200, {
+            "model": request.get("model", ""),
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "done": True,
+            "total_duration": int((load_duration + inference) * 1e9),
+            "load_duration": int(load_duration * 1e9),
+            "prompt_eval_count": 1 if inference else 0,
+            "prompt_eval_duration": int(inference / 2 * 1e9),
+            "eval_count": 1 if inference else 0,
+            "eval_duration": int(inference / 2 * 1e9),
+            **payload,
+        })
+
+
+class FakeOllamaServer:
+    """在后台线程中运行的本地 Ollama 替身服务
+
+    模型未加载（或 keep_alive 已过期）时，请求先等待 load_delay 秒模拟加载，
+    响应中的 load_duration 与真实服务一样以纳秒为单位返回。
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, load_delay: float = 0.2,
+                 inference_delay: float = 0.01, reply: str = "好的"):
+        self._server = ThreadingHTTPServer((host, port), _OllamaHandler)
+        self._server.daemon_threads = True
+        self._server.owner = self
+        self.host, self.port = self._server.server_address
+        self.base_url = f"http://{self.host}:{self.port}"
+        self.load_delay = load_delay
+        self.inference_delay = inference_delay
+        self.reply = reply
+        self._lock = threading.Lock()
+        self._thread = None
+        # 模型名 -> 卸载时间（time.monotonic()），None 表示永不卸载
+        self._loaded = {}
+        self.keep_alive_requests = []
+        self.stats = {'requests': 0, 'loads': 0}
+
+    def _load(self, model: str, keep_alive) -> float:
+        """确保模型已加载并刷新其卸载时间，返回本次请求的加载耗时（秒）"""
+        with self._lock:
+            self.stats['requests'] += 1
+            self.keep_alive_requests.append(keep_alive)
+            expires_at = self._loaded.get(model, 0.0)
+            needs_load = model not in self._loaded or (expires_at is not None and expires_at <= time.monotonic())
+            if needs_load:
+                self.stats['loads'] += 1
+        if needs_load:
+            time.sleep(self.load_delay)
+        seconds = _keep_alive_seconds(keep_alive)
+        with self._lock:
+            self._loaded[model] = None if seconds < 0 else time.monotonic() + seconds
+        return self.load_delay if needs_load else 0.0
+
+    def is_loaded(self, model: str) -> bool:
+        with self._lock:
+            expires_at = self._loaded.get(model, 0.0)
+            return model in self._loaded and (expires_at is None or expires_at > time.monotonic())
+
+    def evict(self, model: str = None):
+        """卸载指定模型（不传时卸载全部），模拟模型因空闲被换出"""
+        with self._lock:
+            if model is None:
+                self._loaded.clear()
+            else:
+                self._loaded.pop(model, None)
+
+    def start(self) -> "FakeOllamaServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self) -> "FakeOllamaServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
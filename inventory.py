@@ -0,0 +1,283 @@
+"""库存子系统
+
+check_inventory 原来只判断 product_id == "item_001" and quantity <= 10，从不扣减库存。这里提供真实的库存：
+- InventoryStore：SQLite 中的 stock 表，reserve 用一条带条件的 UPDATE（available >= 数量）原子扣减，
+  同时在 reservations 表中记录预占，release 删除预占并归还库存，commit 确认售出后删除预占（不归还库存）；
+  同一订单以相同的商品与数量重复预占或重复释放都是幂等的，以不同的商品或数量重复预占会抛出 ValueError
+- StockCache：放在 InventoryStore 前面的分片计数器，用于热门商品。每个分片一把锁，
+  分片按 lease_size 一次从数据库批量领取库存，之后的预占只在内存中扣减，避免所有订单争抢同一行的写锁；
+  某个分片不够时先从数据库补充，再合并所有分片的余量，因此只要总库存足够就不会误判为不足
+- 热门商品的预占只记录在所在分片的内存中，订单分配物流后由 commit() 删除；其他商品的预占记录由 commit()
+  从数据库删除，记录不会随订单数增长
+- 分片中已领取未售出的库存在 flush() 时归还数据库；进程异常退出时这部分库存会丢失（少卖），但不会超卖
+"""
+
+import os
+import threading
+import zlib
+import logging
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+import db
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_DB = os.getenv("INVENTORY_DB", "inventory.db")
+# 新建库存数据库时的初始库存
+DEFAULT_STOCK = {"item_001": 10}
+# 使用分片计数器的热门商品，逗号分隔
+HOT_PRODUCTS = tuple(p for p in os.getenv("INVENTORY_HOT_PRODUCTS", "").split(",") if p)
+# 分片数
+STOCK_SHARDS = 8
+# 分片每次从数据库领取的库存数
+LEASE_SIZE = 50
+
+INVENTORY_MIGRATIONS = [
+    # v1: 库存表与预占表
+    """create table if not exists stock
+             (product_id varchar primary key not null,
+             available int not null check (available >= 0));
+    create table if not exists reservations
+             (order_id varchar primary key not null,
+             product_id varchar not null,
+             quantity int not null);""",
+]
+
+
+class InventoryStore:
+    """SQLite 中的库存，预占与释放都在单个事务中完成"""
+
+    def __init__(self, path: str = INVENTORY_DB, initial_stock: Optional[Dict[str, int]] = None):
+        self.path = path
+        conn = db.pool.connection(path)
+        db.migrate(conn, INVENTORY_MIGRATIONS)
+        # 库存表为空时写入初始库存
+        if not conn.execute("SELECT 1 FROM stock LIMIT 1").fetchone():
+            self.restock((initial_stock if initial_stock is not None else DEFAULT_STOCK).items())
+
+    def restock(self, items: Iterable[Tuple[str, int]]):
+        """增加库存，商品不存在时创建"""
+        conn = db.pool.connection(self.path)
+        with conn:
+            conn.executemany("INSERT INTO stock (product_id, available) VALUES (?, ?) "
+                             "ON CONFLICT (product_id) DO UPDATE SET available = available + excluded.available",
+                             items)
+
+    def available(self, product_id: str) -> int:
+        row = db.pool.query_one(self.path, "SELECT available FROM stock WHERE product_id = ?", (product_id,))
+        return row[0] if row else 0
+
+    def reserve(self, order_id: str, product_id: str, quantity: int) -> bool:
+        """为订单预占库存，库存不足时返回 False；订单已以相同的商品与数量预占过时直接返回 True
+
+        订单已有不同商品或数量的预占时抛出 ValueError，重试不会掩盖另一笔订单。
+        """
+        conn = db.pool.connection(self.path)
+        with conn:
+            if not conn.execute("INSERT OR IGNORE INTO reservations (order_id, product_id, quantity) VALUES (?, ?, ?)",
+                                (order_id, product_id, quantity)).rowcount:
+                existing = conn.execute("SELECT product_id, quantity FROM reservations WHERE order_id = ?",
+                                        (order_id,)).fetchone()
+                _check_same(order_id, existing, product_id, quantity)
+                return True
+            # 条件扣减在一条语句内完成，并发订单不会超卖
+            if conn.execute("UPDATE stock SET available = available - ? WHERE product_id = ? AND available >= ?",
+                            (quantity, product_id, quantity)).rowcount:
+                return True
+            conn.rollback()
+            return False
+
+    def release(self, order_id: str) -> int:
+        """释放订单的预占并归还库存，返回归还的数量；订单没有预占时返回 0"""
+        conn = db.pool.connection(self.path)
+        with conn:
+            row = conn.execute("DELETE FROM reservations WHERE order_id = ? RETURNING product_id, quantity",
+                               (order_id,)).fetchone()
+            if row is None:
+                return 0
+            conn.execute("UPDATE stock SET available = available + ? WHERE product_id = ?", (row[1], row[0]))
+        return row[1]
+
+    def commit(self, order_id: str) -> bool:
+        """确认订单的预占（库存已售出）：删除预占记录，之后 release 不再归还库存；返回订单是否有预占"""
+        return bool(db.pool.execute(self.path, "DELETE FROM reservations WHERE order_id = ?", (order_id,)))
+
+    def reserve_many(self, reservations: Sequence[Tuple[str, str, int]]) -> bool:
+        """在一个事务中为一批订单预占库存，reservations 为 [(订单, 商品, 数量)]
+
+        任一商品的库存不足时整批回滚并返回 False。订单不能已有预占记录。
+        """
+        totals = {}
+        for _, product_id, quantity in reservations:
+            totals[product_id] = totals.get(product_id, 0) + quantity
+        conn = db.pool.connection(self.path)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for product_id, total in totals.items():
+                if not conn.execute("UPDATE stock SET available = available - ? WHERE product_id = ? AND available >= ?",
+                                    (total, product_id, total)).rowcount:
+                    conn.rollback()
+                    return False
+            conn.executemany("INSERT INTO reservations (order_id, product_id, quantity) VALUES (?, ?, ?)", reservations)
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return True
+
+    def lease(self, product_id: str, quantity: int) -> int:
+        """一次领取至多 quantity 件库存交给内存计数器，返回实际领取的数量"""
+        conn = db.pool.connection(self.path)
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT available FROM stock WHERE product_id = ?", (product_id,)).fetchone()
+            taken = min(quantity, row[0]) if row else 0
+            if taken:
+                conn.execute("UPDATE stock SET available = available - ? WHERE product_id = ?", (taken, product_id))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        return taken
+
+    def give_back(self, product_id: str, quantity: int):
+        """归还内存计数器中未售出的库存"""
+        if quantity:
+            db.pool.execute(self.path, "UPDATE stock SET available = available + ? WHERE product_id = ?",
+                            (quantity, product_id))
+
+
+def _check_same(order_id: str, existing: Optional[Tuple[str, int]], product_id: str, quantity: int):
+    """重复预占时检查商品与数量是否与已有的预占一致"""
+    if existing is not None and tuple(existing) != (product_id, quantity):
+        raise ValueError(f"订单 {order_id} 已预占 {existing[0]} × {existing[1]}，"
+                         f"不能再预占 {product_id} × {quantity}")
+
+
+class _Shard:
+    __slots__ = ('lock', 'units', 'held')
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.units: Dict[str, int] = {}
+        # 分片中尚未确认的预占：订单 -> (商品, 数量)
+        self.held: Dict[str, Tuple[str, int]] = {}
+
+
+class StockCache:
+    """热门商品的分片库存计数器，其他商品直接使用 InventoryStore"""
+
+    def __init__(self, store: InventoryStore, hot_products: Iterable[str] = HOT_PRODUCTS,
+                 shards: int = STOCK_SHARDS, lease_size: int = LEASE_SIZE):
+        self.store = store
+        self.hot_products = frozenset(hot_products)
+        self.lease_size = lease_size
+        self._shards = [_Shard() for _ in range(max(1, shards))]
+
+    def _shard_index(self, order_id: str) -> int:
+        return zlib.crc32(str(order_id).encode('utf-8')) % len(self._shards)
+
+    def available(self, product_id: str) -> int:
+        """数据库中的库存加上各分片中已领取未售出的库存"""
+        cached = 0
+        for shard in self._shards:
+            with shard.lock:
+                cached += shard.units.get(product_id, 0)
+        return self.store.available(product_id) + cached
+
+    def _take(self, order_id: str, product_id: str, quantity: int, index: int) -> bool:
+        # 订单固定落在同一个分片，幂等检查与记录预占都在该分片的锁内完成
+        shard = self._shards[index]
+        with shard.lock:
+            if order_id in shard.held:
+                _check_same(order_id, shard.held[order_id], product_id, quantity)
+                return True
+            units = shard.units.get(product_id, 0)
+            if units < quantity:
+                units += self.store.lease(product_id, max(self.lease_size, quantity - units))
+            if units >= quantity:
+                shard.units[product_id] = units - quantity
+                shard.held[order_id] = (product_id, quantity)
+                return True
+            shard.units[product_id] = units
+        # 数据库已经没有足够的库存：按顺序锁住所有分片，把余量合并到当前分片后再判断
+        for other in self._shards:
+            other.lock.acquire()
+        try:
+            if order_id in shard.held:
+                _check_same(order_id, shard.held[order_id], product_id, quantity)
+                return True
+            total = sum(other.units.pop(product_id, 0) for other in self._shards)
+            if total < quantity:
+                total += self.store.lease(product_id, quantity - total)
+            ok = total >= quantity
+            shard.units[product_id] = total - quantity if ok else total
+            if ok:
+                shard.held[order_id] = (product_id, quantity)
+            return ok
+        finally:
+            for other in self._shards:
+                other.lock.release()
+
+    def reserve(self, order_id: str, product_id: str, quantity: int) -> bool:
+        """为订单预占库存，库存不足时返回 False；订单已以相同的商品与数量预占过时直接返回 True，
+        商品或数量不同时抛出 ValueError"""
+        if product_id not in self.hot_products:
+            return self.store.reserve(order_id, product_id, quantity)
+        return self._take(order_id, product_id, quantity, self._shard_index(order_id))
+
+    def release(self, order_id: str) -> int:
+        """释放订单的预占，库存回到原分片；返回归还的数量"""
+        shard = self._shards[self._shard_index(order_id)]
+        with shard.lock:
+            held = shard.held.pop(order_id, None)
+            if held is not None:
+                product_id, quantity = held
+                shard.units[product_id] = shard.units.get(product_id, 0) + quantity
+                return quantity
+        return self.store.release(order_id)
+
+    def commit(self, order_id: str):
+        """确认订单的预占（库存已售出），之后不能再释放
+
+        热门商品的预占从分片内存中删除，其他商品的预占记录从数据库中删除，记录都不会随订单数无限增长。
+        """
+        shard = self._shards[self._shard_index(order_id)]
+        with shard.lock:
+            if shard.held.pop(order_id, None) is not None:
+                return
+        self.store.commit(order_id)
+
+    def reserve_many(self, reservations: Sequence[Tuple[str, str, int]]) -> bool:
+        """批量预占库存：先把分片中的余量归还数据库，再由 InventoryStore 在一个事务中完成"""
+        self.flush()
+        return self.store.reserve_many(reservations)
+
+    def flush(self):
+        """把各分片中未售出的库存归还数据库"""
+        for shard in self._shards:
+            with shard.lock:
+                units, shard.units = shard.units, {}
+            for product_id, quantity in units.items():
+                self.store.give_back(product_id, quantity)
+
+
+_default_inventory = None
+_default_inventory_lock = threading.Lock()
+
+
+def get_inventory() -> StockCache:
+    """返回进程内共享的库存，首次调用时创建"""
+    global _default_inventory
+    with _default_inventory_lock:
+        if _default_inventory is None:
+            _default_inventory = StockCache(InventoryStore())
+        return _default_inventory
+
+
+def set_inventory(inventory: Optional[StockCache]) -> Optional[StockCache]:
+    """替换进程内共享的库存（例如测试中使用临时数据库），返回原来的库存以便恢复"""
+    global _default_inventory
+    with _default_inventory_lock:
+        previous, _default_inventory = _default_inventory, inventory
+    return previous
@@ -5,8 +5,12 @@ from langchain_core.messages import HumanMessage
 from langchain_core.tools import tool
 from langgraph.prebuilt import ToolNode
 from langgraph.graph import END, StateGraph, MessagesState
-from langgraph.checkpoint.memory import InMemorySaver
 from langchain_ollama import ChatOllama
+import llm_cache
+from ollama_warmup import OLLAMA_BASE_URL, OLLAMA_KEEP_ALIVE, prepare_model
+from context_window import ContextWindow
+from checkpointers import make_checkpointer
+from tool_format import render_rows
 
 def init_db():
     """初始化数据库信息"""
@@ -31,27 +35,37 @@ def query_from_db(sql: str):
     c = conn.cursor()
     c.execute(sql)
     rows = c.fetchall()
+    columns = [column[0] for column in c.description or ()]
     conn.close()
-    return rows
+    return columns, rows
 
 
-@tool
+@tool(response_format="content_and_artifact")
 def search(query: str):
     """从数据库查询用户信息"""
-    return str(query_from_db(query))
+    # 模型看到紧凑的列式文本，原始行数据保存在 ToolMessage.artifact 中
+    columns, rows = query_from_db(query)
+    return render_rows(columns, rows), rows
 
 
 tools = [search]
 tool_node = ToolNode(tools)
+MODEL_NAME = "qwen2:latest"
+MODEL_TEMPERATURE = 0
 model = ChatOllama(
-    model="qwen2:latest",
-    base_url="http://localhost:11434",
-    temperature=0
+    model=MODEL_NAME,
+    base_url=OLLAMA_BASE_URL,
+    temperature=MODEL_TEMPERATURE,
+    # 每次调用都续期，模型在两次调用之间保持加载
+    keep_alive=OLLAMA_KEEP_ALIVE
 )
 
 # 为Ollama模型配置工具调用功能
 model = model.bind_tools(tools)
 
+# 发送给模型的消息历史按token预算裁剪，较早的工具输出折叠为摘要
+context_window = ContextWindow(tools)
+
 
 def should_continue(state: MessagesState) -> Literal["tools", END]:
     '''定义继续条件'''
@@ -66,12 +80,19 @@ def should_continue(state: MessagesState) -> Literal["tools", END]:
 
 def call_model(state: MessagesState):
     '''Agent调用LLM的方法'''
-    messages = state['messages']
-    response = model.invoke(messages)
+    messages, report = context_window.fit(state['messages'])
+    print(f"上下文窗口：{report}")
+    # temperature为0时使用LLM响应缓存，相同的消息历史直接返回缓存的回复
+    response = llm_cache.cached_invoke(model, messages, MODEL_NAME, MODEL_TEMPERATURE, tools)
     return {"messages": [response]}
 
 
-def init_workflow():
+def init_workflow(checkpointer=None, warm_up=True):
+    # 预加载模型并在后台定期续期keep_alive，第一次调用不再付出模型加载耗时；预热失败时不续期
+    if warm_up:
+        report = prepare_model(MODEL_NAME)
+        if report:
+            print(report)
     # 创建状态图以管理消息状态和流程控制
     workflow = StateGraph(MessagesState)
     # 定义将循环运行的两个节点
@@ -86,8 +107,9 @@ def init_workflow():
     )
     # 添加两个普通边，tools被调用完后，继续调用agent
     workflow.add_edge("tools", 'agent')
-    # 初始化内存以在状态图运行过程中保持状态
-    checkpointer = InMemorySaver()
+    # 初始化checkpointer以在状态图运行过程中保持状态（CHECKPOINTER=sqlite 时持久化到 SQLite）
+    if checkpointer is None:
+        checkpointer = make_checkpointer()
     # 将工作流编译成一个可执行的App
     app = workflow.compile(checkpointer=checkpointer)
     return app
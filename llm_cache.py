@@ -0,0 +1,199 @@
+"""LLM 响应缓存
+
+每天重复执行的定时任务会把完全相同的消息历史发给模型。temperature 为 0 时模型输出是确定的，
+ResponseCache 以“规范化的消息历史 + 模型名 + temperature + 绑定的工具集”的哈希为键缓存模型回复：
+- 第一层是进程内的 LRU（OrderedDict），第二层是 SQLite 持久化存储，两层都有条目数上限并按最近使用淘汰
+- 每个条目有独立的过期时间（TTL）
+- 消息 id、工具调用 id 等每次运行都会变化的字段不参与计算键，工具调用 id 按出现顺序编号
+- 只在 temperature == 0 时启用，其他情况直接调用模型
+- 未命中缓存时经 llm_coalesce 调用模型，同时到达的相同请求只调用一次，只由发起调用的请求写入缓存
+- 异步路径中缓存的读写（SQLite 查询、提交与淘汰）放到线程中执行，不阻塞事件循环
+"""
+
+import asyncio
+import hashlib
+import json
+import threading
+import time
+import uuid
+import logging
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, ToolMessage, message_to_dict, messages_from_dict
+
+import db
+from llm_coalesce import RequestCoalescer, get_coalescer
+from plan_cache import tools_fingerprint
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_DB = 'llm_cache.db'
+# 内存中最多保留的条目数
+MEMORY_CACHE_SIZE = 256
+# SQLite 中最多保留的条目数
+DISK_CACHE_SIZE = 10000
+# 条目的默认有效期（秒）
+LLM_CACHE_TTL = 24 * 3600.0
+
+LLM_CACHE_MIGRATIONS = [
+    # v1: 响应缓存表
+    """create table if not exists responses
+             (key varchar primary key not null,
+             response text not null,
+             expires_at real not null,
+             last_used_at real not null);
+    create index if not exists idx_responses_last_used on responses (last_used_at);""",
+]
+
+
+def canonical_messages(messages: Sequence[BaseMessage]) -> list:
+    """把消息历史转换为与运行无关的规范形式，用于计算缓存键"""
+    call_ids = {}
+
+    def canon_id(call_id):
+        return call_ids.setdefault(call_id, len(call_ids))
+
+    result = []
+    for message in messages:
+        item = {'type': message.type, 'content': message.content}
+        if getattr(message, 'name', None):
+            item['name'] = message.name
+        if isinstance(message, AIMessage) and message.tool_calls:
+            item['tool_calls'] = [{'name': c['name'], 'args': c['args'], 'id': canon_id(c['id'])}
+                                  for c in message.tool_calls]
+        if isinstance(message, ToolMessage):
+            item['tool_call_id'] = canon_id(message.tool_call_id)
+            item['status'] = message.status
+        result.append(item)
+    return result
+
+
+def make_key(messages: Sequence[BaseMessage], model_name: str, temperature: float, tools: Sequence = ()) -> str:
+    """计算缓存键"""
+    payload = json.dumps({
+        'messages': canonical_messages(messages),
+        'model': model_name,
+        'temperature': temperature,
+        'tools': tools_fingerprint(tools) if tools else '',
+    }, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _fresh_copy(message: AIMessage) -> AIMessage:
+    """命中缓存时返回带有新 id 的副本，避免同一线程中出现重复的消息或工具调用 id"""
+    tool_calls = [{**call, 'id': f"call_{uuid.uuid4().hex}"} for call in message.tool_calls]
+    return message.model_copy(update={'id': None, 'tool_calls': tool_calls})
+
+
+class ResponseCache:
+    """两层（内存 LRU + SQLite）的 LLM 响应缓存"""
+
+    def __init__(self, path: str = LLM_CACHE_DB, memory_size: int = MEMORY_CACHE_SIZE,
+                 disk_size: int = DISK_CACHE_SIZE, ttl: float = LLM_CACHE_TTL):
+        self.path = path
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.ttl = ttl
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+        db.migrate(db.pool.connection(path), LLM_CACHE_MIGRATIONS)
+
+    def _count(self, name: str):
+        with self._lock:
+            self.stats[name] += 1
+
+    def _remember(self, key: str, message: AIMessage, expires_at: float):
+        with self._lock:
+            self._memory[key] = (message, expires_at)
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_size:
+                self._memory.popitem(last=False)
+
+    def get(self, key: str) -> Optional[AIMessage]:
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                if entry[1] > now:
+                    self._memory.move_to_end(key)
+                    self.stats['memory_hits'] += 1
+                    return _fresh_copy(entry[0])
+                del self._memory[key]
+        row = db.pool.query_one(self.path, "SELECT response, expires_at FROM responses WHERE key = ?", (key,))
+        if row is None or row[1] <= now:
+            self._count('misses')
+            return None
+        db.pool.execute(self.path, "UPDATE responses SET last_used_at = ? WHERE key = ?", (now, key))
+        message = messages_from_dict([json.loads(row[0])])[0]
+        self._remember(key, message, row[1])
+        self._count('disk_hits')
+        return _fresh_copy(message)
+
+    def put(self, key: str, message: AIMessage, ttl: Optional[float] = None):
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        self._remember(key, message, expires_at)
+        conn = db.pool.connection(self.path)
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO responses (key, response, expires_at, last_used_at) VALUES (?, ?, ?, ?)",
+                         (key, json.dumps(message_to_dict(message), ensure_ascii=False), expires_at, now))
+            # 清理过期条目，并按最近使用时间淘汰超出上限的条目
+            conn.execute("DELETE FROM responses WHERE expires_at <= ?", (now,))
+            conn.execute("DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_used_at DESC "
+                         "LIMIT -1 OFFSET ?)", (self.disk_size,))
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        db.pool.execute(self.path, "DELETE FROM responses")
+
+
+_default_cache = None
+_default_cache_lock = threading.Lock()
+
+
+def get_cache() -> ResponseCache:
+    """返回进程内共享的默认响应缓存，首次调用时创建"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            _default_cache = ResponseCache()
+        return _default_cache
+
+
+def cached_invoke(model, messages: Sequence[BaseMessage], model_name: str, temperature: float,
+                  tools: Sequence = (), cache: Optional[ResponseCache] = None,
+                  coalescer: Optional[RequestCoalescer] = None):
+    """带缓存地调用模型；temperature 不为 0 时不使用缓存，也不合并请求"""
+    if temperature != 0:
+        return model.invoke(messages)
+    cache = cache or get_cache()
+    key = make_key(messages, model_name, temperature, tools)
+    response = cache.get(key)
+    if response is not None:
+        logger.info(f"命中LLM响应缓存，跳过模型调用（{cache.stats}）")
+        return response
+    response, leader = (coalescer or get_coalescer()).invoke(model, messages, key)
+    if leader:
+        cache.put(key, response)
+    return response
+
+
+async def acached_invoke(model, messages: Sequence[BaseMessage], model_name: str, temperature: float,
+                         tools: Sequence = (), cache: Optional[ResponseCache] = None,
+                         coalescer: Optional[RequestCoalescer] = None):
+    """cached_invoke 的异步版本，缓存读写在线程中执行，未命中缓存时 await model.ainvoke，不阻塞事件循环"""
+    if temperature != 0:
+        return await model.ainvoke(messages)
+    cache = cache or get_cache()
+    key = make_key(messages, model_name, temperature, tools)
+    response = await asyncio.to_thread(cache.get, key)
+    if response is not None:
+        logger.info(f"命中LLM响应缓存，跳过模型调用（{cache.stats}）")
+        return response
+    response, leader = await (coalescer or get_coalescer()).ainvoke(model, messages, key)
+    if leader:
+        await asyncio.to_thread(cache.put, key, response)
+    return response
@@ -0,0 +1,171 @@
+"""合并并发的相同 LLM 请求
+
+定时任务的多个工作流实例往往带着完全相同的消息历史同时到达 agent 节点，
+响应缓存只有在第一个请求返回后才能命中，之前到达的请求仍会各自调用一次 Ollama。
+RequestCoalescer 在模型调用外加一层 singleflight：
+- 键相同（与 llm_cache.make_key 一致）的并发请求只发出一次上游调用，所有等待者共享结果或异常
+- 可选的攒批：window > 0 时，异步路径中不同的请求在 window 秒的时间窗口内攒成一批，通过 model.abatch 一起发出。
+  只对提供真正批量接口的后端有意义；ChatOllama 的 abatch 只是并发调用 ainvoke，服务端没有批处理，
+  攒批只会给每个不同的请求增加等待时间，因此默认 window 为 0，不同的请求立即各自调用 ainvoke
+- 同步路径（多线程）只做 singleflight，不攒批
+- stats 记录被合并的请求数、上游调用次数、批次数以及攒批引入的排队延迟
+"""
+
+import asyncio
+import os
+import threading
+import time
+import weakref
+import logging
+from concurrent.futures import Future
+from typing import Any, Dict, List, Sequence, Tuple
+
+logger = logging.getLogger(__name__)
+
+# 攒批的时间窗口（秒），0 表示不攒批；只应对有真正批量接口的后端开启
+BATCH_WINDOW = float(os.getenv("LLM_BATCH_WINDOW_MS", "0")) / 1000
+# 开启攒批时每批最多的请求数
+MAX_BATCH_SIZE = int(os.getenv("OLLAMA_NUM_PARALLEL", "4"))
+
+
+class _LoopState:
+    """一个事件循环内的在途请求与待发批次"""
+
+    def __init__(self):
+        # 键 -> 共享结果的 asyncio.Future
+        self.inflight: Dict[str, asyncio.Future] = {}
+        # 模型 id -> 待发请求 [(键, 消息, 入队时间)]
+        self.pending: Dict[int, List[Tuple[str, Sequence, float]]] = {}
+        self.timers: Dict[int, asyncio.TimerHandle] = {}
+
+
+class RequestCoalescer:
+    """对相同的并发模型请求做 singleflight；window > 0 时把不同的请求按时间窗口攒批"""
+
+    def __init__(self, window: float = BATCH_WINDOW, max_batch: int = MAX_BATCH_SIZE):
+        self.window = window
+        self.max_batch = max(1, max_batch)
+        self._lock = threading.Lock()
+        self._inflight: Dict[str, Future] = {}
+        self._loops = weakref.WeakKeyDictionary()
+        self._stats = {'requests': 0, 'upstream_calls': 0, 'deduplicated': 0, 'batches': 0,
+                       'batched_requests': 0, 'queue_delay_ms_total': 0.0, 'queue_delay_ms_max': 0.0}
+
+    def _count(self, name: str, value=1):
+        with self._lock:
+            self._stats[name] += value
+
+    def _record_delay(self, delay: float):
+        delay_ms = delay * 1000
+        with self._lock:
+            self._stats['queue_delay_ms_total'] += delay_ms
+            self._stats['queue_delay_ms_max'] = max(self._stats['queue_delay_ms_max'], delay_ms)
+
+    def stats(self) -> dict:
+        """返回合并统计：deduplicated 为共享了其他请求结果、没有单独调用模型的请求数"""
+        with self._lock:
+            stats = dict(self._stats)
+        dispatched = stats['requests'] - stats['deduplicated']
+        stats['queue_delay_ms_avg'] = stats['queue_delay_ms_total'] / dispatched if dispatched else 0.0
+        return stats
+
+    def invoke(self, model, messages: Sequence, key: str) -> Tuple[Any, bool]:
+        """同步调用模型，返回 (回复, 是否为发起调用的请求)；相同键的并发请求等待同一次调用"""
+        self._count('requests')
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+        if not leader:
+            self._count('deduplicated')
+            logger.info("合并相同的模型请求，等待进行中的调用")
+            return future.result().model_copy(), False
+        try:
+            self._count('upstream_calls')
+            response = model.invoke(messages)
+            future.set_result(response)
+            return response, True
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                del self._inflight[key]
+
+    async def ainvoke(self, model, messages: Sequence, key: str) -> Tuple[Any, bool]:
+        """异步调用模型，返回 (回复, 是否为发起调用的请求)；window > 0 时不同的请求在时间窗口内攒批发出"""
+        self._count('requests')
+        loop = asyncio.get_running_loop()
+        state = self._loops.get(loop)
+        if state is None:
+            state = self._loops[loop] = _LoopState()
+        future = state.inflight.get(key)
+        if future is not None:
+            self._count('deduplicated')
+            logger.info("合并相同的模型请求，等待进行中的调用")
+            return (await asyncio.shield(future)).model_copy(), False
+        future = state.inflight[key] = loop.create_future()
+        if self.window <= 0:
+            # 不攒批：立即发出，不经过待发批次与定时器
+            loop.create_task(self._run_batch(state, model, [(key, messages, time.perf_counter())]))
+            return await asyncio.shield(future), True
+        pending = state.pending.setdefault(id(model), [])
+        pending.append((key, messages, time.perf_counter()))
+        if len(pending) >= self.max_batch:
+            self._flush(loop, state, model)
+        elif id(model) not in state.timers:
+            state.timers[id(model)] = loop.call_later(self.window, self._flush, loop, state, model)
+        return await asyncio.shield(future), True
+
+    def _flush(self, loop, state: _LoopState, model):
+        timer = state.timers.pop(id(model), None)
+        if timer is not None:
+            timer.cancel()
+        batch = state.pending.pop(id(model), [])
+        if batch:
+            loop.create_task(self._run_batch(state, model, batch))
+
+    async def _run_batch(self, state: _LoopState, model, batch: list):
+        now = time.perf_counter()
+        for _, _, enqueued in batch:
+            self._record_delay(now - enqueued)
+        self._count('upstream_calls', len(batch))
+        try:
+            if len(batch) == 1:
+                results = [await _capture(model.ainvoke(batch[0][1]))]
+            else:
+                self._count('batches')
+                self._count('batched_requests', len(batch))
+                results = await model.abatch([messages for _, messages, _ in batch], return_exceptions=True)
+        except Exception as e:
+            results = [e] * len(batch)
+        for (key, _, _), result in zip(batch, results):
+            future = state.inflight.pop(key)
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+
+async def _capture(coroutine):
+    """等待协程，把异常作为结果返回"""
+    try:
+        return await coroutine
+    except Exception as e:
+        return e
+
+
+_default_coalescer = None
+_default_coalescer_lock = threading.Lock()
+
+
+def get_coalescer() -> RequestCoalescer:
+    """返回进程内共享的请求合并器，首次调用时创建"""
+    global _default_coalescer
+    with _default_coalescer_lock:
+        if _default_coalescer is None:
+            _default_coalescer = RequestCoalescer()
+        return _default_coalescer
@@ -0,0 +1,210 @@
+"""批量邮件分发
+
+以有界并发发送大量邮件：
+- 接受普通可迭代对象或异步迭代器，元素为 (收件人, 主题, 正文)
+- 生产者与发送协程之间是有界队列，队列满时生产者等待，不会把所有邮件一次性读进内存
+- 按邮件服务器共享令牌桶限速，同一服务器上的多个分发器共用同一个令牌桶，速率不同时取最小值
+- 对临时性 SMTP 错误（4xx 应答、连接断开、超时）按带抖动的指数退避重试
+
+用法（向所有用户群发）：
+    conn = db.pool.connection(USER_DB, readonly=True)
+    jobs = ((mail, "主题", f"亲爱的{name}：...") for name, mail in conn.execute("SELECT name, mail FROM users"))
+    stats = asyncio.run(MailDispatcher(concurrency=8, rate_limit=20).dispatch(jobs))
+"""
+
+import asyncio
+import os
+import random
+import smtplib
+import threading
+import time
+import logging
+from dataclasses import dataclass, field
+from email.mime.text import MIMEText
+from typing import AsyncIterable, Iterable, List, Optional, Tuple, Union
+
+import smtp_pool
+from smtp_pool import SMTPPool
+
+logger = logging.getLogger(__name__)
+
+MailJob = Tuple[str, str, str]
+
+# 连接类异常都视为临时性错误
+TRANSIENT_ERRORS = smtp_pool.CONNECTION_ERRORS
+
+
+def is_transient(error: Exception) -> bool:
+    """判断发送错误是否值得重试：连接问题或 4xx 应答"""
+    if isinstance(error, TRANSIENT_ERRORS):
+        return True
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return all(400 <= code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return 400 <= error.smtp_code < 500
+    return False
+
+
+class RateLimiter:
+    """令牌桶限速器，rate 为每秒放行的邮件数，burst 为允许的突发量
+
+    可在多个事件循环与线程之间共享。
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _reserve(self) -> float:
+        """预留一个令牌，返回需要等待的秒数"""
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def tighten(self, rate: float, burst: int = 1):
+        """把速率与突发量降到不超过给定值"""
+        with self._lock:
+            self.rate = min(self.rate, rate)
+            self.burst = min(self.burst, max(1, burst))
+            self._tokens = min(self._tokens, self.burst)
+
+    async def acquire(self):
+        delay = self._reserve()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+# 按 (服务器, 端口) 共享的限速器
+_rate_limiters = {}
+_rate_limiters_lock = threading.Lock()
+
+
+def get_rate_limiter(host: str, port: int, rate: float, burst: int = 1) -> RateLimiter:
+    """返回指定邮件服务器的共享限速器
+
+    同一服务器上的所有分发器共用一个令牌桶，合计速率不会超过服务器的限制；
+    以不同速率请求时取最小的速率与突发量。
+    """
+    with _rate_limiters_lock:
+        limiter = _rate_limiters.get((host, port))
+        if limiter is None:
+            return _rate_limiters.setdefault((host, port), RateLimiter(rate, burst))
+    if rate < limiter.rate or max(1, burst) < limiter.burst:
+        logger.warning(f"邮件服务器 {host}:{port} 的限速从 {limiter.rate}/秒 调整为 {min(limiter.rate, rate)}/秒")
+        limiter.tighten(rate, burst)
+    return limiter
+
+
+@dataclass
+class DispatchStats:
+    """一次分发的统计结果，只在事件循环中更新"""
+    sent: int = 0
+    failed: int = 0
+    retries: int = 0
+    elapsed: float = 0.0
+    # 最终发送失败的邮件：[(收件人, 错误信息)]
+    failures: List[Tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def throughput(self) -> float:
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+
+
+class MailDispatcher:
+    """有界并发、限速、可重试的批量邮件分发器"""
+
+    def __init__(self, pool: Optional[SMTPPool] = None, sender: Optional[str] = None,
+                 concurrency: int = 8, queue_size: int = 100,
+                 rate_limit: Optional[float] = None, burst: int = 1,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 30.0):
+        self.pool = pool or smtp_pool.get_pool()
+        self.sender = sender or self.pool.username or os.getenv("EMAIL_SENDER")
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.limiter = (get_rate_limiter(self.pool.host, self.pool.port, rate_limit, burst)
+                        if rate_limit else None)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        if self.pool.size < concurrency:
+            logger.warning(f"SMTP连接池大小（{self.pool.size}）小于并发数（{concurrency}），多出的发送协程会等待空闲连接")
+
+    def _build_message(self, recipient: str, subject: str, body: str) -> MIMEText:
+        msg = MIMEText(body, 'plain')
+        msg['From'] = self.sender
+        msg['To'] = recipient
+        msg['Subject'] = subject
+        return msg
+
+    def _backoff(self, attempt: int) -> float:
+        """第 attempt 次重试前的等待时间（full jitter）"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def _send_with_retry(self, job: MailJob, stats: DispatchStats):
+        recipient, subject, body = job
+        msg = self._build_message(recipient, subject, body)
+        attempt = 0
+        while True:
+            if self.limiter:
+                await self.limiter.acquire()
+            try:
+                await asyncio.to_thread(self.pool.send_message, msg)
+                stats.sent += 1
+                return
+            except Exception as e:
+                if attempt >= self.max_retries or not is_transient(e):
+                    stats.failed += 1
+                    stats.failures.append((recipient, str(e)))
+                    logger.error(f"发送邮件至 {recipient} 失败：{e}")
+                    return
+                delay = self._backoff(attempt)
+                attempt += 1
+                stats.retries += 1
+                logger.warning(f"发送邮件至 {recipient} 遇到临时错误：{e}，{delay:.2f}秒后第{attempt}次重试")
+                await asyncio.sleep(delay)
+
+    async def _worker(self, queue: asyncio.Queue, stats: DispatchStats):
+        while True:
+            job = await queue.get()
+            try:
+                if job is None:
+                    return
+                await self._send_with_retry(job, stats)
+            finally:
+                queue.task_done()
+
+    async def dispatch(self, jobs: Union[Iterable[MailJob], AsyncIterable[MailJob]]) -> DispatchStats:
+        """发送所有邮件并返回统计结果"""
+        stats = DispatchStats()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        start = time.perf_counter()
+        workers = [asyncio.create_task(self._worker(queue, stats)) for _ in range(self.concurrency)]
+        try:
+            if hasattr(jobs, '__aiter__'):
+                async for job in jobs:
+                    await queue.put(job)
+            else:
+                for job in jobs:
+                    await queue.put(job)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+        stats.elapsed = time.perf_counter() - start
+        logger.info(f"邮件分发完成：成功{stats.sent}封，失败{stats.failed}封，重试{stats.retries}次，"
+                    f"耗时{stats.elapsed:.2f}秒（{stats.throughput:.1f}封/秒）")
+        return stats
+
+
+def dispatch(jobs: Iterable[MailJob], **kwargs) -> DispatchStats:
+    """同步调用入口：创建 MailDispatcher 并在新的事件循环中完成分发"""
+    return asyncio.run(MailDispatcher(**kwargs).dispatch(jobs))
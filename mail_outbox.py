@@ -0,0 +1,209 @@
+"""基于 SQLite 的邮件发件箱
+
+工作流节点只需把邮件写入 outbox 表即可立即返回，由后台线程 OutboxWorker 批量取出并发送，
+图的执行延迟因此与邮件服务器的延迟无关。
+- 每封邮件带有幂等键（idempotency_key），重复入队会被忽略
+- 发送前先以租约方式认领（status='sending'），进程在发送后、标记完成前崩溃时，
+  租约过期后邮件会被重新认领发送，即“至少一次”投递；Message-ID 由幂等键生成，便于收件端去重
+- 每封邮件的状态（pending/sending/sent/failed）、尝试次数与最后一次错误都记录在表中
+- 新邮件入队时唤醒已启动的 OutboxWorker，不必等到下一次轮询
+"""
+
+import hashlib
+import os
+import random
+import threading
+import time
+import logging
+from typing import Callable, Optional
+
+import db
+import smtp_pool
+from mail_dispatcher import is_transient
+from mail_templates import get_message_factory
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_DB = 'outbox.db'
+
+OUTBOX_MIGRATIONS = [
+    # v1: 发件箱表
+    """create table if not exists outbox
+             (id integer primary key autoincrement,
+             idempotency_key varchar not null unique,
+             recipient varchar not null,
+             subject varchar not null,
+             body text not null,
+             status varchar not null default 'pending',
+             attempts int not null default 0,
+             last_error text,
+             next_attempt_at real not null default 0,
+             lease_until real,
+             created_at real not null,
+             updated_at real not null,
+             sent_at real);
+    create index if not exists idx_outbox_status on outbox (status, next_attempt_at);""",
+]
+
+PENDING, SENDING, SENT, FAILED = 'pending', 'sending', 'sent', 'failed'
+
+
+def make_idempotency_key(*parts) -> str:
+    """由若干字段生成稳定的幂等键"""
+    return hashlib.sha256("\0".join(str(p) for p in parts).encode('utf-8')).hexdigest()
+
+
+class Outbox:
+    """发件箱表的读写操作"""
+
+    def __init__(self, path: str = OUTBOX_DB):
+        self.path = path
+        db.migrate(db.pool.connection(path), OUTBOX_MIGRATIONS)
+        # 新邮件入队后调用的回调（已启动的 OutboxWorker.notify）
+        self._listeners = []
+
+    def add_listener(self, callback: Callable[[], None]):
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback: Callable[[], None]):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def enqueue(self, recipient: str, subject: str, body: str, idempotency_key: Optional[str] = None) -> bool:
+        """邮件入队，返回是否为新邮件（幂等键已存在时返回 False）"""
+        key = idempotency_key or make_idempotency_key(recipient, subject, body)
+        now = time.time()
+        inserted = db.pool.execute(
+            self.path,
+            "INSERT OR IGNORE INTO outbox (idempotency_key, recipient, subject, body, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, recipient, subject, body, now, now),
+        )
+        if inserted:
+            logger.info(f"邮件已加入发件箱：{recipient}，主题：{subject}")
+            for callback in list(self._listeners):
+                callback()
+        else:
+            logger.info(f"发件箱中已有相同幂等键的邮件，跳过：{recipient}，主题：{subject}")
+        return bool(inserted)
+
+    def claim(self, batch_size: int, lease: float) -> list:
+        """认领一批待发送的邮件（包括租约已过期的发送中邮件）"""
+        now = time.time()
+        conn = db.pool.connection(self.path)
+        with conn:
+            return conn.execute(
+                "UPDATE outbox SET status = ?, lease_until = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE id IN (SELECT id FROM outbox "
+                "             WHERE (status = ? AND next_attempt_at <= ?) OR (status = ? AND lease_until < ?) "
+                "             ORDER BY id LIMIT ?) "
+                "RETURNING id, idempotency_key, recipient, subject, body, attempts",
+                (SENDING, now + lease, now, PENDING, now, SENDING, now, batch_size),
+            ).fetchall()
+
+    def mark_sent(self, message_id: int):
+        now = time.time()
+        db.pool.execute(self.path,
+                        "UPDATE outbox SET status = ?, sent_at = ?, updated_at = ?, lease_until = NULL WHERE id = ?",
+                        (SENT, now, now, message_id))
+
+    def mark_retry(self, message_id: int, error: str, delay: float):
+        now = time.time()
+        db.pool.execute(self.path,
+                        "UPDATE outbox SET status = ?, last_error = ?, next_attempt_at = ?, updated_at = ?, "
+                        "lease_until = NULL WHERE id = ?",
+                        (PENDING, error, now + delay, now, message_id))
+
+    def mark_failed(self, message_id: int, error: str):
+        db.pool.execute(self.path,
+                        "UPDATE outbox SET status = ?, last_error = ?, updated_at = ?, lease_until = NULL WHERE id = ?",
+                        (FAILED, error, time.time(), message_id))
+
+    def pending_count(self) -> int:
+        """尚未完成（待发送或发送中）的邮件数量"""
+        return db.pool.query(self.path, "SELECT count(*) FROM outbox WHERE status IN (?, ?)",
+                             (PENDING, SENDING))[0][0]
+
+    def status_counts(self) -> dict:
+        return dict(db.pool.query(self.path, "SELECT status, count(*) FROM outbox GROUP BY status"))
+
+
+def send_outbox_message(recipient: str, subject: str, body: str, idempotency_key: str):
+    """通过共享的SMTP连接池发送一封发件箱邮件，失败时抛出异常"""
+    sender_email = os.getenv("EMAIL_SENDER")
+    if not sender_email or not os.getenv("EMAIL_PASSWORD"):
+        raise RuntimeError("未配置邮件发送者信息，请检查.env文件")
+    raw = get_message_factory(sender_email, subject).build(recipient, body, f"<{idempotency_key[:32]}@outbox>")
+    smtp_pool.get_pool().sendmail(sender_email, [recipient], raw)
+
+
+class OutboxWorker:
+    """在后台线程中批量发送发件箱邮件"""
+
+    def __init__(self, outbox: Outbox, send: Callable = send_outbox_message,
+                 batch_size: int = 50, poll_interval: float = 1.0, lease: float = 60.0,
+                 max_attempts: int = 5, backoff_base: float = 2.0, backoff_max: float = 300.0):
+        self.outbox = outbox
+        self.send = send
+        self.batch_size = batch_size
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def process_batch(self) -> int:
+        """认领并发送一批邮件，返回本批处理的邮件数"""
+        batch = self.outbox.claim(self.batch_size, self.lease)
+        for message_id, key, recipient, subject, body, attempts in batch:
+            try:
+                self.send(recipient, subject, body, key)
+            except Exception as e:
+                if attempts < self.max_attempts and is_transient(e):
+                    delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempts))
+                    self.outbox.mark_retry(message_id, str(e), delay)
+                    logger.warning(f"发件箱邮件 {message_id} 发送失败（第{attempts}次）：{e}，{delay:.1f}秒后重试")
+                else:
+                    self.outbox.mark_failed(message_id, str(e))
+                    logger.error(f"发件箱邮件 {message_id} 发送失败：{e}")
+            else:
+                self.outbox.mark_sent(message_id)
+                logger.info(f"发件箱邮件 {message_id} 已发送至 {recipient}，主题：{subject}")
+        return len(batch)
+
+    def _run(self):
+        while not self._stop.is_set():
+            # 先清除唤醒标记再认领，认领之后入队的邮件会让下面的等待立即返回
+            self._wakeup.clear()
+            try:
+                processed = self.process_batch()
+            except Exception:
+                logger.exception("发件箱处理出错")
+                processed = 0
+            if not processed:
+                self._wakeup.wait(self.poll_interval)
+
+    def notify(self):
+        """有新邮件入队时唤醒工作线程，不必等到下一次轮询"""
+        self._wakeup.set()
+
+    def start(self) -> "OutboxWorker":
+        self.outbox.add_listener(self.notify)
+        self._thread = threading.Thread(target=self._run, name="outbox-worker", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self, drain_timeout: float = 0.0):
+        """停止工作线程；drain_timeout > 0 时先等待发件箱清空（最多等待该秒数）"""
+        deadline = time.monotonic() + drain_timeout
+        while drain_timeout > 0 and self.outbox.pending_count() and time.monotonic() < deadline:
+            self.notify()
+            time.sleep(0.05)
+        self.outbox.remove_listener(self.notify)
+        self._stop.set()
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,141 @@
+"""预编译邮件模板
+
+- 模板只在第一次使用时解析一次（compile_template 带缓存），渲染时按片段列表 join，不再逐段 += 拼接字符串
+- 同一批邮件共享的内容（如推荐信息列表）只渲染一次，作为参数传给每个收件人的模板
+- MessageFactory 预先生成发件人、主题、Content-Type 等固定的 MIME 头，
+  每封邮件只追加收件人并对正文做 base64 编码，直接得到可交给 SMTP 的字节串，
+  无需为每封邮件构建 MIMEMultipart 对象
+"""
+
+import base64
+import string
+from email.header import Header
+from email.utils import parseaddr
+from functools import lru_cache
+from typing import Iterable, Iterator, Mapping, Optional
+
+# 头部单行的最大长度（RFC 5322 建议不超过 78 个字符）
+MAX_HEADER_LINE = 78
+# 值为邮箱地址的头部
+ADDRESS_HEADERS = frozenset({"From", "To"})
+
+
+class Template:
+    """解析后的模板，占位符语法与 str.format 相同（如 ``{name}``）"""
+
+    def __init__(self, source: str):
+        self.source = source
+        # 片段列表：字面文本直接保存；占位符位置保存 None，渲染时填入
+        self._parts = []
+        # [(片段下标, 字段名, 格式说明)]
+        self._fields = []
+        for literal, field, spec, conversion in string.Formatter().parse(source):
+            if literal:
+                self._parts.append(literal)
+            if field is not None:
+                if conversion or '.' in field or '[' in field:
+                    raise ValueError(f"模板不支持的占位符：{{{field}}}")
+                self._fields.append((len(self._parts), field, spec))
+                self._parts.append(None)
+        self.field_names = frozenset(field for _, field, _ in self._fields)
+
+    def render(self, values: Mapping = None, **kwargs) -> str:
+        """渲染模板，返回完整字符串"""
+        values = {**values, **kwargs} if values else kwargs
+        parts = self._parts.copy()
+        for index, field, spec in self._fields:
+            value = values[field]
+            parts[index] = format(value, spec) if spec else str(value)
+        return ''.join(parts)
+
+    def render_to(self, write, values: Mapping = None, **kwargs):
+        """以流式方式渲染模板，逐个片段调用 write，适合直接写入文件或套接字"""
+        values = {**values, **kwargs} if values else kwargs
+        fields = iter(self._fields)
+        for part in self._parts:
+            if part is None:
+                _, field, spec = next(fields)
+                value = values[field]
+                write(format(value, spec) if spec else str(value))
+            else:
+                write(part)
+
+    def render_many(self, rows: Iterable[Mapping], shared: Optional[Mapping] = None) -> Iterator[str]:
+        """批量渲染：rows 中每一项是一个收件人的字段，shared 是所有收件人共用的字段"""
+        shared = shared or {}
+        for row in rows:
+            yield self.render({**shared, **row})
+
+
+@lru_cache(maxsize=128)
+def compile_template(source: str) -> Template:
+    """编译模板并缓存，相同的模板源码只解析一次"""
+    return Template(source)
+
+
+def render_lines(item_template: str, items: Iterable[Mapping]) -> str:
+    """用单行模板渲染列表中的每一项并拼接，用于生成推荐信息等共享片段"""
+    template = compile_template(item_template)
+    return ''.join(template.render(item) for item in items)
+
+
+class MessageFactory:
+    """为同一发件人、同一主题的邮件生成原始 MIME 字节串，固定的头部只编码一次"""
+
+    def __init__(self, sender: str, subject: str):
+        self.sender = sender
+        self.subject = subject
+        self._head = (
+            'Content-Type: text/plain; charset="utf-8"\r\n'
+            'MIME-Version: 1.0\r\n'
+            'Content-Transfer-Encoding: base64\r\n'
+            f'From: {_encode_header(sender, "From")}\r\n'
+            f'Subject: {_encode_header(subject, "Subject")}\r\n'
+        ).encode('ascii')
+
+    def build(self, recipient: str, body: str, message_id: Optional[str] = None) -> bytes:
+        """生成一封邮件的完整字节串"""
+        headers = f'To: {_encode_header(recipient, "To")}\r\n'
+        if message_id:
+            headers += f'Message-ID: {message_id}\r\n'
+        encoded = base64.encodebytes(body.encode('utf-8')).replace(b'\n', b'\r\n')
+        return b''.join((self._head, headers.encode('ascii'), b'\r\n', encoded))
+
+
+@lru_cache(maxsize=256)
+def get_message_factory(sender: str, subject: str) -> MessageFactory:
+    """返回缓存的 MessageFactory，同一发件人与主题共用一份固定头部"""
+    return MessageFactory(sender, subject)
+
+
+def _encode_header(value: str, name: str) -> str:
+    """按 RFC 2047 编码头部的值；过长时折行，续行以 CRLF 分隔，与 SMTP 报文的换行一致
+
+    地址类头部只编码显示名，尖括号中的邮箱地址保持原样。
+    """
+    if value.isascii():
+        if len(name) + len(value) + 2 <= MAX_HEADER_LINE:
+            return value
+        return Header(value, header_name=name).encode(linesep='\r\n')
+    if name in ADDRESS_HEADERS:
+        display_name, address = parseaddr(value)
+        if display_name and address and address.isascii():
+            encoded = Header(display_name, 'utf-8', header_name=name).encode(linesep='\r\n')
+            last_line = encoded.rsplit('\r\n', 1)[-1]
+            separator = ' ' if len(last_line) + len(address) + 3 <= MAX_HEADER_LINE else '\r\n '
+            return f"{encoded}{separator}<{address}>"
+    return Header(value, 'utf-8', header_name=name).encode(linesep='\r\n')
+
+
+# 工作流使用的邮件模板
+RECOMMEND_ITEM = "- {name}: {content}\n"
+
+RECOMMEND_EMAIL = (
+    "亲爱的{name}：\n\n您好！这是一封包含随机数和推荐信息的邮件。\n\n随机数：{random_number}\n\n"
+    "推荐信息：\n{recommendations}\n如有任何问题，请随时联系我们。\n\n祝好！\n我们的团队"
+)
+
+WELCOME_EMAIL = (
+    "亲爱的{name}：\n\n欢迎加入我们的平台！我们很高兴能有您这样的用户。\n\n"
+    "如有任何问题，请随时联系我们。\n\n祝好！\n我们的团队"
+)
@@ -0,0 +1,154 @@
+"""Ollama 模型预热与常驻
+
+Ollama 在模型第一次被请求时才把它加载进内存，空闲超过 keep_alive（默认 5 分钟）后又会卸载，
+因此定时任务的第一次模型调用总要额外付出一次加载耗时（日志中的 load_duration）。
+- 所有请求都带上 keep_alive，ChatOllama 也使用同一个值。keep_alive 由 Ollama 服务端计时，
+  进程退出后模型仍保持加载，默认的 24 小时覆盖每天执行一次的定时任务；
+  可用环境变量 OLLAMA_KEEP_ALIVE 调整（与 Ollama 服务端的同名设置含义相同，-1 表示永不卸载）
+- warm_up：启动时先发一个空 prompt 的请求加载模型，再发一个只生成 1 个 token 的请求，
+  分别统计加载耗时与推理耗时
+- KeepAlive：长时间运行的进程中，后台线程按固定间隔发送空 prompt 请求续期；
+  它随进程退出而停止，不能代替 keep_alive 让模型在两次运行之间保持加载。预热失败时不启动
+"""
+
+import os
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from typing import Optional, Union
+
+logger = logging.getLogger(__name__)
+
+OLLAMA_BASE_URL = "http://localhost:11434"
+# 模型在最后一次请求后保持加载的时长，由服务端计时，进程退出后依然有效
+OLLAMA_KEEP_ALIVE = os.getenv("OLLAMA_KEEP_ALIVE", "24h")
+# 后台续期间隔（秒），需小于 keep_alive
+KEEP_ALIVE_INTERVAL = 600.0
+# 预热请求的超时时间（秒），首次加载大模型可能较慢
+WARMUP_TIMEOUT = 120.0
+# 续期时 load_duration 超过该值（毫秒）说明模型已被卸载后重新加载
+RELOAD_THRESHOLD_MS = 50.0
+
+
+@dataclass
+class WarmupReport:
+    """预热耗时统计（毫秒）"""
+    model: str
+    load_ms: float
+    inference_ms: float
+    total_ms: float
+
+    def __str__(self) -> str:
+        return (f"模型{self.model}预热完成：加载耗时{self.load_ms:.0f}ms，推理耗时{self.inference_ms:.0f}ms，"
+                f"总耗时{self.total_ms:.0f}ms")
+
+
+def _client(base_url: str, timeout: float):
+    # ollama 客户端依赖 httpx，导入较慢，只在真正发请求时导入
+    import ollama
+    return ollama.Client(host=base_url, timeout=timeout)
+
+
+def _ms(nanoseconds: Optional[int]) -> float:
+    return (nanoseconds or 0) / 1e6
+
+
+def warm_up(model: str, base_url: str = OLLAMA_BASE_URL, keep_alive: Union[str, float] = OLLAMA_KEEP_ALIVE,
+            timeout: float = WARMUP_TIMEOUT) -> WarmupReport:
+    """加载模型并做一次最小推理，返回加载与推理各自的耗时"""
+    client = _client(base_url, timeout)
+    start = time.perf_counter()
+    # 空 prompt 只加载模型、不做推理
+    loaded = client.generate(model=model, prompt='', keep_alive=keep_alive)
+    probe = client.generate(model=model, prompt='你好', options={'num_predict': 1}, keep_alive=keep_alive)
+    return WarmupReport(
+        model=model,
+        load_ms=_ms(loaded.load_duration) + _ms(probe.load_duration),
+        inference_ms=_ms(probe.prompt_eval_duration) + _ms(probe.eval_duration),
+        total_ms=(time.perf_counter() - start) * 1000,
+    )
+
+
+class KeepAlive:
+    """在后台线程中定期续期模型的 keep_alive"""
+
+    def __init__(self, model: str, base_url: str = OLLAMA_BASE_URL,
+                 keep_alive: Union[str, float] = OLLAMA_KEEP_ALIVE, interval: float = KEEP_ALIVE_INTERVAL,
+                 timeout: float = WARMUP_TIMEOUT):
+        self.model = model
+        self.keep_alive = keep_alive
+        self.interval = interval
+        self._client = _client(base_url, timeout)
+        self._stop = threading.Event()
+        self._thread = None
+        self.stats = {'pings': 0, 'failures': 0, 'reloads': 0}
+
+    def ping(self):
+        """续期一次；模型已被卸载时会重新加载"""
+        try:
+            response = self._client.generate(model=self.model, prompt='', keep_alive=self.keep_alive)
+        except Exception as e:
+            self.stats['failures'] += 1
+            logger.warning(f"模型{self.model}续期失败：{e}")
+            return
+        self.stats['pings'] += 1
+        load_ms = _ms(response.load_duration)
+        if load_ms > RELOAD_THRESHOLD_MS:
+            self.stats['reloads'] += 1
+            logger.warning(f"模型{self.model}已被卸载，重新加载耗时{load_ms:.0f}ms")
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.ping()
+
+    def start(self) -> "KeepAlive":
+        self._thread = threading.Thread(target=self._run, name="ollama-keep-alive", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+
+
+_keep_alives = {}
+_keep_alives_lock = threading.Lock()
+
+
+def start_keep_alive(model: str, base_url: str = OLLAMA_BASE_URL,
+                     keep_alive: Union[str, float] = OLLAMA_KEEP_ALIVE,
+                     interval: float = KEEP_ALIVE_INTERVAL) -> KeepAlive:
+    """启动（或返回已启动的）指定模型的后台续期线程，同一模型只启动一个"""
+    with _keep_alives_lock:
+        key = (model, base_url)
+        if key not in _keep_alives:
+            _keep_alives[key] = KeepAlive(model, base_url, keep_alive, interval).start()
+        return _keep_alives[key]
+
+
+def stop_keep_alive():
+    """停止所有后台续期线程"""
+    with _keep_alives_lock:
+        keep_alives = list(_keep_alives.values())
+        _keep_alives.clear()
+    for keep_alive in keep_alives:
+        keep_alive.stop()
+
+
+def prepare_model(model: str, base_url: str = OLLAMA_BASE_URL, keep_alive: Union[str, float] = OLLAMA_KEEP_ALIVE,
+                  interval: Optional[float] = KEEP_ALIVE_INTERVAL) -> Optional[WarmupReport]:
+    """预热模型并启动后台续期，interval 为 None 时不启动续期线程
+
+    Ollama 不可用时只记录警告并返回 None，也不启动续期线程，首次调用模型时再加载。
+    """
+    try:
+        report = warm_up(model, base_url, keep_alive)
+    except Exception as e:
+        logger.warning(f"模型{model}预热失败，将在首次调用时加载：{e}")
+        return None
+    logger.info(str(report))
+    if interval is not None:
+        start_keep_alive(model, base_url, keep_alive, interval)
+    return report
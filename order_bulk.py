@@ -0,0 +1,117 @@
+"""批量处理订单
+
+order_flow 的入口一次只处理一个订单。process_orders / aprocess_orders 把大量订单交给同一张编译好的图：
+- 订单可以是列表或迭代器（包括异步迭代器），按 chunk_size 分块读取，不会一次性读进内存
+- 每块通过 graph.batch / graph.abatch 执行，max_concurrency 控制同时执行的订单数
+- 单个订单出错只记为失败，不影响同一块中的其他订单
+- 返回每个订单的最终状态，以及按结束节点（assign_logistics、inventory_alert、handle_payment_failure）汇总的数量
+
+用法：
+    result = process_orders({"order_id": f"o{i}", "product_id": "item_001", "quantity": i % 12} for i in range(10000))
+    print(result.counts, f"{result.throughput:.0f} 单/秒")
+"""
+
+import time
+import logging
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import islice
+from typing import AsyncIterable, Iterable, Iterator, List, Optional, Tuple, Union
+
+from order_flow import OrderState, get_graph, new_order_state, terminal_node
+
+logger = logging.getLogger(__name__)
+
+# 默认同时执行的订单数
+ORDER_CONCURRENCY = 16
+# 每次交给 batch 的订单数
+ORDER_CHUNK_SIZE = 1000
+
+
+@dataclass
+class BulkResult:
+    """一批订单的处理结果"""
+    # 与输入顺序一致的最终状态，处理失败的订单为 None
+    states: List[Optional[OrderState]] = field(default_factory=list)
+    # 结束节点 -> 订单数
+    counts: Counter = field(default_factory=Counter)
+    # 处理失败的订单：[(order_id, 错误信息)]
+    failures: List[Tuple[str, str]] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def processed(self) -> int:
+        return sum(self.counts.values())
+
+    @property
+    def throughput(self) -> float:
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+    def add(self, orders: List[dict], outputs: list):
+        for order, output in zip(orders, outputs):
+            if isinstance(output, Exception):
+                self.states.append(None)
+                self.failures.append((order.get("order_id"), repr(output)))
+                logger.error(f"订单 {order.get('order_id')} 处理出错：{output!r}")
+            else:
+                self.states.append(output)
+                self.counts[terminal_node(output)] += 1
+
+    def __str__(self) -> str:
+        counts = "，".join(f"{node}={count}" for node, count in sorted(self.counts.items()))
+        return (f"处理{self.processed}单（{counts}），失败{len(self.failures)}单，"
+                f"耗时{self.elapsed:.2f}秒（{self.throughput:.0f}单/秒）")
+
+
+def _chunks(orders: Iterable[dict], size: int) -> Iterator[List[dict]]:
+    iterator = iter(orders)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+async def _achunks(orders: AsyncIterable[dict], size: int):
+    chunk = []
+    async for order in orders:
+        chunk.append(order)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def process_orders(orders: Iterable[dict], concurrency: int = ORDER_CONCURRENCY,
+                   chunk_size: int = ORDER_CHUNK_SIZE, graph=None) -> BulkResult:
+    """用 graph.batch 处理所有订单并返回结果"""
+    graph = graph or get_graph()
+    config = {"max_concurrency": concurrency}
+    result = BulkResult()
+    start = time.perf_counter()
+    for chunk in _chunks(orders, chunk_size):
+        outputs = graph.batch([new_order_state(order) for order in chunk], config, return_exceptions=True)
+        result.add(chunk, outputs)
+    result.elapsed = time.perf_counter() - start
+    logger.info(f"订单批量处理完成：{result}")
+    return result
+
+
+async def aprocess_orders(orders: Union[Iterable[dict], AsyncIterable[dict]], concurrency: int = ORDER_CONCURRENCY,
+                          chunk_size: int = ORDER_CHUNK_SIZE, graph=None) -> BulkResult:
+    """process_orders 的异步版本，用 graph.abatch 处理，订单可以来自异步迭代器"""
+    graph = graph or get_graph()
+    config = {"max_concurrency": concurrency}
+    result = BulkResult()
+    start = time.perf_counter()
+    chunks = _achunks(orders, chunk_size) if hasattr(orders, '__aiter__') else _chunks(orders, chunk_size)
+    if hasattr(chunks, '__aiter__'):
+        async for chunk in chunks:
+            result.add(chunk, await graph.abatch([new_order_state(o) for o in chunk], config, return_exceptions=True))
+    else:
+        for chunk in chunks:
+            result.add(chunk, await graph.abatch([new_order_state(o) for o in chunk], config, return_exceptions=True))
+    result.elapsed = time.perf_counter() - start
+    logger.info(f"订单批量处理完成：{result}")
+    return result
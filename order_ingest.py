@@ -0,0 +1,208 @@
+"""从文件流式导入订单
+
+从 JSONL 或 CSV 文件（或标准输入）逐行读取订单，交给编译好的订单处理图，结果逐行写入 JSONL：
+- 订单按需读取，同时在途的订单数不超过 window，内存占用与输入大小无关
+- 订单在共享线程池中并发执行，结果按输入顺序写出，每行是订单的最终状态加上结束节点 terminal
+- 无法解析或处理出错的订单写出一行 {"line": 行号, "order_id": ..., "error": ...}，不中断导入
+- 每隔 progress_interval 秒输出一次进度与吞吐量
+
+用法：
+    python order_ingest.py orders.jsonl -o results.jsonl --window 512 --concurrency 16
+    cat orders.csv | python order_ingest.py - --format csv > results.jsonl
+"""
+
+import argparse
+import csv
+import json
+import re
+import sys
+import time
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import IO, Iterator, Optional, Tuple
+
+import inventory
+from order_flow import get_graph, new_order_state, terminal_node
+
+logger = logging.getLogger(__name__)
+
+# 同时在途（已读取、未写出）的最大订单数
+INGEST_WINDOW = 512
+# 执行订单的线程数
+INGEST_CONCURRENCY = 16
+# 进度输出间隔（秒）
+PROGRESS_INTERVAL = 5.0
+
+ORDER_FIELDS = ("order_id", "product_id", "quantity")
+# CSV 中数量字段允许的写法
+INTEGER_PATTERN = re.compile(r"[+-]?[0-9]+")
+
+
+class OrderParseError(ValueError):
+    """输入行无法解析为订单"""
+
+
+@dataclass
+class IngestStats:
+    """导入过程的统计"""
+    read: int = 0
+    processed: int = 0
+    failed: int = 0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def throughput(self) -> float:
+        return self.processed / self.elapsed if self.elapsed else 0.0
+
+    def __str__(self) -> str:
+        return (f"已读取{self.read}单，完成{self.processed}单，失败{self.failed}单，"
+                f"耗时{self.elapsed:.1f}秒（{self.throughput:.0f}单/秒）")
+
+
+def _quantity(value) -> int:
+    """JSONL 中的数量必须是 JSON 整数，CSV 中必须是整数字面量；2.9、true、"1e3" 等一律拒绝"""
+    if isinstance(value, bool):
+        raise OrderParseError(f"数量不是整数：{value!r}")
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and INTEGER_PATTERN.fullmatch(value.strip()):
+        return int(value)
+    raise OrderParseError(f"数量不是整数：{value!r}")
+
+
+def _order(record: dict, from_text: bool = False) -> dict:
+    """把一条记录转换为订单；from_text 表示字段都是字符串（CSV），否则数量必须是 JSON 整数"""
+    missing = [name for name in ORDER_FIELDS if record.get(name) in (None, "")]
+    if missing:
+        raise OrderParseError(f"缺少字段：{', '.join(missing)}")
+    quantity = record["quantity"]
+    if not from_text and isinstance(quantity, str):
+        raise OrderParseError(f"数量不是整数：{quantity!r}")
+    return {"order_id": str(record["order_id"]), "product_id": str(record["product_id"]),
+            "quantity": _quantity(quantity)}
+
+
+def read_orders(stream: IO[str], fmt: str = "jsonl") -> Iterator[Tuple[int, object]]:
+    """逐行读取订单，产出 (行号, 订单或 OrderParseError)"""
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        for record in reader:
+            try:
+                yield reader.line_num, _order(record, from_text=True)
+            except OrderParseError as e:
+                yield reader.line_num, e
+        return
+    for line_num, line in enumerate(stream, start=1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+            if not isinstance(record, dict):
+                raise OrderParseError("不是 JSON 对象")
+            yield line_num, _order(record)
+        except json.JSONDecodeError as e:
+            yield line_num, OrderParseError(f"JSON 解析失败：{e}")
+        except OrderParseError as e:
+            yield line_num, e
+
+
+def detect_format(path: str) -> str:
+    """按文件扩展名判断输入格式，标准输入默认为 JSONL"""
+    return "csv" if path.lower().endswith(".csv") else "jsonl"
+
+
+def _run(graph, order: dict) -> dict:
+    state = graph.invoke(new_order_state(order))
+    return {**state, "terminal": terminal_node(state)}
+
+
+def process_stream(records: Iterator[Tuple[int, object]], graph=None, window: int = INGEST_WINDOW,
+                   concurrency: int = INGEST_CONCURRENCY, stats: Optional[IngestStats] = None) -> Iterator[dict]:
+    """按输入顺序产出每个订单的结果，同时在途的订单不超过 window 个"""
+    graph = graph or get_graph()
+    stats = stats or IngestStats()
+    pending = deque()
+
+    def result_of(line_num: int, order, future) -> dict:
+        if future is None:
+            # 无法解析的行，order 是 OrderParseError
+            stats.failed += 1
+            return {"line": line_num, "order_id": None, "error": str(order)}
+        try:
+            result = future.result()
+        except Exception as e:
+            stats.failed += 1
+            logger.error(f"第{line_num}行订单 {order['order_id']} 处理出错：{e!r}")
+            return {"line": line_num, "order_id": order["order_id"], "error": repr(e)}
+        stats.processed += 1
+        return result
+
+    with ThreadPoolExecutor(max_workers=concurrency, thread_name_prefix="order") as executor:
+        for line_num, order in records:
+            stats.read += 1
+            if isinstance(order, Exception):
+                pending.append((line_num, order, None))
+            else:
+                pending.append((line_num, order, executor.submit(_run, graph, order)))
+            while len(pending) >= window:
+                yield result_of(*pending.popleft())
+        while pending:
+            yield result_of(*pending.popleft())
+
+
+@contextmanager
+def _open(path: str, mode: str, std: IO[str]):
+    if path == "-":
+        yield std
+    else:
+        with open(path, mode, encoding="utf-8", newline="" if path.lower().endswith(".csv") else None) as f:
+            yield f
+
+
+def ingest(input_path: str, output_path: str = "-", fmt: Optional[str] = None, window: int = INGEST_WINDOW,
+           concurrency: int = INGEST_CONCURRENCY, progress_interval: float = PROGRESS_INTERVAL,
+           graph=None) -> IngestStats:
+    """把输入文件中的订单全部处理完，结果逐行写入输出文件"""
+    fmt = fmt or detect_format(input_path)
+    stats = IngestStats()
+    next_report = time.perf_counter() + progress_interval
+    with _open(input_path, "r", sys.stdin) as source, _open(output_path, "w", sys.stdout) as sink:
+        for result in process_stream(read_orders(source, fmt), graph, window, concurrency, stats):
+            sink.write(json.dumps(result, ensure_ascii=False))
+            sink.write("\n")
+            if time.perf_counter() >= next_report:
+                sink.flush()
+                logger.info(f"导入进度：{stats}")
+                next_report = time.perf_counter() + progress_interval
+    logger.info(f"订单导入完成：{stats}")
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="从 JSONL/CSV 文件流式导入订单")
+    parser.add_argument("input", help="输入文件，- 表示标准输入")
+    parser.add_argument("-o", "--output", default="-", help="输出的 JSONL 文件，默认写到标准输出")
+    parser.add_argument("--format", choices=["jsonl", "csv"], default=None, help="输入格式，默认按扩展名判断")
+    parser.add_argument("--window", type=int, default=INGEST_WINDOW, help="同时在途的最大订单数")
+    parser.add_argument("--concurrency", type=int, default=INGEST_CONCURRENCY, help="执行订单的线程数")
+    parser.add_argument("--progress-interval", type=float, default=PROGRESS_INTERVAL, help="进度输出间隔（秒）")
+    args = parser.parse_args()
+
+    # 日志（包括进度）写到标准错误，标准输出留给结果
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s', stream=sys.stderr)
+    # 逐单的节点日志在大量导入时没有意义
+    logging.getLogger("order_flow").setLevel(logging.WARNING)
+    ingest(args.input, args.output, args.format, args.window, args.concurrency, args.progress_interval)
+    # 热门商品分片中未售出的库存归还数据库
+    inventory.get_inventory().flush()
+
+
+if __name__ == "__main__":
+    main()
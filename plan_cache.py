@@ -0,0 +1,142 @@
+"""工具调用计划缓存
+
+定时任务每次都用相同的指令启动工作流，模型第一步给出的工具调用计划也总是相同的
+（例如同时调用 get_current_weekday 与 get_random_number），却要付出一次完整的 LLM 往返。
+PlanCache 以“规范化后的指令 + 模型名 + 绑定的工具集”为键，记录模型第一次给出的工具调用，
+之后的运行直接回放这些调用交给 tools 节点执行，跳过 LLM。
+
+失效策略：
+- 条目超过 TTL 后失效，重新询问模型
+- 工具的名称、描述或参数 schema 发生变化，或更换模型时，键随之改变，旧计划自然不会命中
+- 回放的计划中有工具调用执行出错时，立即删除该条目
+"""
+
+import json
+import hashlib
+import threading
+import time
+import unicodedata
+import uuid
+import logging
+from typing import Optional, Sequence
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.utils.function_calling import convert_to_openai_tool
+
+import db
+
+logger = logging.getLogger(__name__)
+
+PLAN_CACHE_DB = 'plan_cache.db'
+# 计划的默认有效期（秒）
+PLAN_CACHE_TTL = 7 * 24 * 3600.0
+# 回放的 AIMessage 在 response_metadata 中带有该字段，值为计划的键
+PLAN_CACHE_METADATA_KEY = 'plan_cache_key'
+
+PLAN_CACHE_MIGRATIONS = [
+    # v1: 计划表
+    """create table if not exists plans
+             (key varchar primary key not null,
+             instruction text not null,
+             tool_calls text not null,
+             created_at real not null,
+             last_used_at real,
+             replays int not null default 0);""",
+]
+
+
+def normalize_instruction(messages: Sequence[BaseMessage]) -> str:
+    """把指令消息规范化为稳定的文本：统一全半角、折叠空白"""
+    parts = []
+    for message in messages:
+        text = unicodedata.normalize('NFKC', str(message.content))
+        parts.append(f"{message.type}:{' '.join(text.split())}")
+    return "\n".join(parts)
+
+
+def tools_fingerprint(tools: Sequence) -> str:
+    """工具集指纹：与发送给模型的工具 schema 一致，任何工具改动都会改变指纹"""
+    schemas = sorted((convert_to_openai_tool(t) for t in tools), key=lambda s: s['function']['name'])
+    return json.dumps(schemas, sort_keys=True, ensure_ascii=False)
+
+
+def is_plannable(messages: Sequence[BaseMessage]) -> bool:
+    """只有对话的第一步（只有系统/用户指令，模型尚未回复）才使用计划缓存"""
+    return bool(messages) and all(isinstance(m, (HumanMessage, SystemMessage)) for m in messages)
+
+
+class PlanCache:
+    """以 SQLite 持久化的工具调用计划缓存，跨进程、跨运行共享"""
+
+    def __init__(self, path: str = PLAN_CACHE_DB, ttl: float = PLAN_CACHE_TTL):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        # 异步工作流在线程中读写计划缓存，计数在锁内更新
+        self._lock = threading.Lock()
+        db.migrate(db.pool.connection(path), PLAN_CACHE_MIGRATIONS)
+
+    def key(self, messages: Sequence[BaseMessage], tools: Sequence, model_name: str) -> str:
+        payload = "\0".join((normalize_instruction(messages), model_name, tools_fingerprint(tools)))
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def replay(self, messages: Sequence[BaseMessage], tools: Sequence, model_name: str) -> Optional[AIMessage]:
+        """命中时返回带有相同工具调用的 AIMessage（工具调用 id 重新生成），否则返回 None"""
+        if not is_plannable(messages):
+            return None
+        key = self.key(messages, tools, model_name)
+        row = db.pool.query_one(self.path, "SELECT tool_calls, created_at FROM plans WHERE key = ?", (key,))
+        if row is None or time.time() - row[1] > self.ttl:
+            with self._lock:
+                self.misses += 1
+            return None
+        with self._lock:
+            self.hits += 1
+        db.pool.execute(self.path, "UPDATE plans SET replays = replays + 1, last_used_at = ? WHERE key = ?",
+                        (time.time(), key))
+        tool_calls = [{'name': call['name'], 'args': call['args'], 'id': f"call_{uuid.uuid4().hex}",
+                       'type': 'tool_call'} for call in json.loads(row[0])]
+        logger.info(f"命中工具调用计划缓存，跳过LLM调用（累计避免{self.hits}次）")
+        return AIMessage(content='', tool_calls=tool_calls, response_metadata={PLAN_CACHE_METADATA_KEY: key})
+
+    def record(self, messages: Sequence[BaseMessage], tools: Sequence, model_name: str, response: AIMessage):
+        """记录模型在第一步给出的工具调用计划"""
+        if not is_plannable(messages) or not getattr(response, 'tool_calls', None):
+            return
+        key = self.key(messages, tools, model_name)
+        tool_calls = json.dumps([{'name': c['name'], 'args': c['args']} for c in response.tool_calls],
+                                ensure_ascii=False)
+        db.pool.execute(self.path,
+                        "INSERT OR REPLACE INTO plans (key, instruction, tool_calls, created_at) VALUES (?, ?, ?, ?)",
+                        (key, normalize_instruction(messages), tool_calls, time.time()))
+        logger.info("已记录工具调用计划")
+
+    def check_replay(self, messages: Sequence[BaseMessage]):
+        """检查上一步回放的计划是否执行出错，出错则删除该计划"""
+        for i in range(len(messages) - 1, -1, -1):
+            if isinstance(messages[i], AIMessage):
+                break
+        else:
+            return
+        key = messages[i].response_metadata.get(PLAN_CACHE_METADATA_KEY)
+        if not key:
+            return
+        failed = [m for m in messages[i + 1:] if isinstance(m, ToolMessage) and m.status == 'error']
+        if failed:
+            self.invalidate(key)
+            logger.warning(f"回放的工具调用计划执行出错，已删除该计划：{failed[0].content}")
+
+    def invalidate(self, key: Optional[str] = None):
+        """删除指定计划；不传 key 时清空所有计划"""
+        if key is None:
+            db.pool.execute(self.path, "DELETE FROM plans")
+        else:
+            db.pool.execute(self.path, "DELETE FROM plans WHERE key = ?", (key,))
+
+    def stats(self) -> dict:
+        """返回命中统计：llm_calls_avoided 为本进程跳过的 LLM 调用次数，
+        total_llm_calls_avoided 为缓存中所有计划累计的回放次数"""
+        total = db.pool.query_one(self.path, "SELECT coalesce(sum(replays), 0) FROM plans")[0]
+        return {'hits': self.hits, 'misses': self.misses, 'llm_calls_avoided': self.hits,
+                'total_llm_calls_avoided': total}
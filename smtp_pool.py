@@ -0,0 +1,197 @@
+"""SMTP 连接池
+
+保持已登录的 SMTP 长连接并在多次发送之间复用，避免每封邮件都重新建立 TCP 连接并执行 login。
+- 取出空闲过久的连接时先发送 NOOP 检查连接是否仍然可用
+- 发送过程中连接被服务器断开时自动重连并重试一次
+- mail_outbox.send_outbox_message、_send_welcome_email_impl 与 email_tool.send_email 共用 get_pool() 返回的默认连接池
+"""
+
+import os
+import smtplib
+import threading
+import time
+import logging
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# 默认的邮件服务器配置，可通过环境变量覆盖
+SMTP_SERVER = "smtp.sina.com"
+SMTP_PORT = 587
+
+# 连接空闲超过该时长（秒）后，再次使用前先发送 NOOP 做健康检查
+HEALTH_CHECK_INTERVAL = 10.0
+# 连接空闲超过该时长（秒）后直接丢弃，大多数服务器会在几分钟后断开空闲连接
+MAX_IDLE_TIME = 120.0
+
+# 表示连接已不可用、需要丢弃的异常；其他 SMTPException（如收件人被拒绝）不影响连接本身
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class SMTPPool:
+    """线程安全的 SMTP 连接池"""
+
+    def __init__(self, host: str, port: int, username: str = None, password: str = None,
+                 size: int = 4, starttls: bool = False, timeout: float = 30.0,
+                 health_check_interval: float = HEALTH_CHECK_INTERVAL,
+                 max_idle_time: float = MAX_IDLE_TIME):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.size = size
+        self.starttls = starttls
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self.max_idle_time = max_idle_time
+        self._slots = threading.BoundedSemaphore(size)
+        self._lock = threading.Lock()
+        # 空闲连接栈：[(连接, 最后使用时间)]，后进先出以便优先复用最近活跃的连接
+        self._idle = []
+        self._closed = False
+        self.stats = {'connects': 0, 'reuses': 0, 'health_checks': 0, 'reconnects': 0, 'sent': 0}
+
+    def _count(self, key: str):
+        # 多个线程（如 asyncio.to_thread 中的发送）同时更新计数
+        with self._lock:
+            self.stats[key] += 1
+
+    def _connect(self) -> smtplib.SMTP:
+        server = smtplib.SMTP(self.host, self.port, timeout=self.timeout)
+        try:
+            if self.starttls:
+                server.starttls()
+            if self.username:
+                server.login(self.username, self.password)
+        except Exception:
+            _quietly_close(server)
+            raise
+        self._count('connects')
+        logger.debug(f"已建立SMTP连接：{self.host}:{self.port}")
+        return server
+
+    def _is_healthy(self, server: smtplib.SMTP, idle_for: float) -> bool:
+        if idle_for > self.max_idle_time:
+            return False
+        if idle_for < self.health_check_interval:
+            return True
+        self._count('health_checks')
+        try:
+            return server.noop()[0] == 250
+        except CONNECTION_ERRORS:
+            return False
+
+    def _checkout(self) -> smtplib.SMTP:
+        while True:
+            with self._lock:
+                if not self._idle:
+                    break
+                server, last_used = self._idle.pop()
+            if self._is_healthy(server, time.monotonic() - last_used):
+                self._count('reuses')
+                return server
+            logger.info("SMTP连接已失效，重新建立连接")
+            _quietly_close(server)
+        return self._connect()
+
+    def _checkin(self, server: smtplib.SMTP):
+        with self._lock:
+            if not self._closed:
+                self._idle.append((server, time.monotonic()))
+                return
+        _quietly_close(server)
+
+    @contextmanager
+    def connection(self):
+        """从连接池中借出一条可用连接，使用结束后自动归还
+
+        使用过程中抛出连接类异常时，该连接会被丢弃而不是归还。
+        """
+        if self._closed:
+            raise RuntimeError("SMTP连接池已关闭")
+        self._slots.acquire()
+        try:
+            server = self._checkout()
+            broken = False
+            try:
+                yield server
+            except CONNECTION_ERRORS:
+                broken = True
+                raise
+            finally:
+                if broken:
+                    _quietly_close(server)
+                else:
+                    self._checkin(server)
+        finally:
+            self._slots.release()
+
+    def _send(self, send):
+        """执行一次发送，连接被服务器断开时重连并重试一次"""
+        try:
+            with self.connection() as server:
+                result = send(server)
+        except CONNECTION_ERRORS:
+            self._count('reconnects')
+            logger.info("SMTP连接在发送过程中断开，重连后重试")
+            with self.connection() as server:
+                result = send(server)
+        self._count('sent')
+        return result
+
+    def send_message(self, msg, from_addr: str = None, to_addrs=None):
+        """发送 email.message.Message 对象"""
+        return self._send(lambda server: server.send_message(msg, from_addr, to_addrs))
+
+    def sendmail(self, from_addr: str, to_addrs, msg):
+        """发送已经序列化好的邮件内容（str 或 bytes）"""
+        return self._send(lambda server: server.sendmail(from_addr, to_addrs, msg))
+
+    def close(self):
+        """关闭连接池中的所有空闲连接，之后归还的连接也会被直接关闭"""
+        with self._lock:
+            self._closed = True
+            idle, self._idle = self._idle, []
+        for server, _ in idle:
+            try:
+                server.quit()
+            except (smtplib.SMTPException, OSError):
+                _quietly_close(server)
+
+
+def _quietly_close(server: smtplib.SMTP):
+    try:
+        server.close()
+    except OSError:
+        pass
+
+
+_default_pool = None
+_default_pool_lock = threading.Lock()
+
+
+def get_pool() -> SMTPPool:
+    """返回进程内共享的默认 SMTP 连接池
+
+    服务器与发件人信息从环境变量读取：SMTP_SERVER、SMTP_PORT、EMAIL_SENDER、EMAIL_PASSWORD。
+    """
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            _default_pool = SMTPPool(
+                os.getenv("SMTP_SERVER", SMTP_SERVER),
+                int(os.getenv("SMTP_PORT", SMTP_PORT)),
+                os.getenv("EMAIL_SENDER"),
+                os.getenv("EMAIL_PASSWORD"),
+                size=int(os.getenv("SMTP_POOL_SIZE", 4)),
+            )
+        return _default_pool
+
+
+def close_pool():
+    """关闭默认连接池，下次调用 get_pool() 时会重新创建"""
+    global _default_pool
+    with _default_pool_lock:
+        pool, _default_pool = _default_pool, None
+    if pool is not None:
+        pool.close()
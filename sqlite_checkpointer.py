@@ -0,0 +1,471 @@
+"""基于 SQLite 的持久化 checkpointer
+
+InMemorySaver 把每个 thread_id 的全部 checkpoint 永久保存在进程内存中，长期运行时内存只增不减，
+进程重启后状态也会丢失。SQLiteSaver 把 checkpoint 写入 SQLite 文件：
+- 批量写入：put / put_writes 先写入内存缓冲区，缓冲的操作数达到 batch_size 或距上次落盘超过
+  flush_interval 秒时在一个事务中提交；读取某个线程前会先提交该线程缓冲中的写入。
+  进程崩溃时最多丢失最近一个批次，需要逐步落盘时把 batch_size 设为 1
+- 紧凑序列化：沿用 serde.dumps_typed（msgpack），超过 compress_threshold 字节的数据再用 zlib 压缩
+- 保留策略：每个线程（及命名空间）只保留最近 keep_last 个 checkpoint，
+  超过 max_idle 秒没有写入的线程整体删除
+- channel 的值按版本单独存储，未变化的 channel 在多个 checkpoint 之间共享，不重复写入
+
+注意：保留策略会删除较早的 checkpoint，不适用于使用 DeltaChannel 的图（需要沿父链回溯重建状态），
+本项目的图只使用 MessagesState 与普通 reducer，不受影响。
+"""
+
+import asyncio
+import json
+import random
+import sqlite3
+import threading
+import time
+import zlib
+import logging
+from typing import Any, AsyncIterator, Dict, Iterator, Optional, Sequence
+
+from langchain_core.runnables import RunnableConfig
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    ChannelVersions,
+    Checkpoint,
+    CheckpointMetadata,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+)
+
+import db
+
+logger = logging.getLogger(__name__)
+
+CHECKPOINT_DB = 'checkpoints.db'
+# 缓冲多少个写操作后提交一次
+CHECKPOINT_BATCH_SIZE = 64
+# 缓冲的写入最多保留多久（秒）后提交
+CHECKPOINT_FLUSH_INTERVAL = 1.0
+# 每个线程保留的 checkpoint 数量，None 表示全部保留
+CHECKPOINT_KEEP_LAST = 10
+# 线程空闲多久（秒）后被删除，None 表示不删除
+CHECKPOINT_MAX_IDLE = 30 * 24 * 3600.0
+# 两次空闲线程清理之间的最小间隔（秒）
+CHECKPOINT_EVICT_INTERVAL = 60.0
+# 超过该字节数的序列化数据使用 zlib 压缩
+COMPRESS_THRESHOLD = 1024
+
+# 压缩后的数据在类型名后追加该后缀
+ZLIB_SUFFIX = '+zlib'
+
+CHECKPOINTER_MIGRATIONS = [
+    # v1: checkpoint、channel 值、待处理写入与线程活跃时间
+    """create table if not exists checkpoints
+             (thread_id varchar not null,
+             checkpoint_ns varchar not null,
+             checkpoint_id varchar not null,
+             parent_checkpoint_id varchar,
+             type varchar not null,
+             checkpoint blob not null,
+             metadata_type varchar not null,
+             metadata blob not null,
+             versions text not null,
+             primary key (thread_id, checkpoint_ns, checkpoint_id));
+    create table if not exists blobs
+             (thread_id varchar not null,
+             checkpoint_ns varchar not null,
+             channel varchar not null,
+             version varchar not null,
+             type varchar not null,
+             value blob,
+             primary key (thread_id, checkpoint_ns, channel, version));
+    create table if not exists writes
+             (thread_id varchar not null,
+             checkpoint_ns varchar not null,
+             checkpoint_id varchar not null,
+             task_id varchar not null,
+             idx int not null,
+             channel varchar not null,
+             type varchar not null,
+             value blob,
+             task_path varchar not null default '',
+             primary key (thread_id, checkpoint_ns, checkpoint_id, task_id, idx));
+    create table if not exists threads
+             (thread_id varchar primary key not null,
+             updated_at real not null);
+    create index if not exists idx_threads_updated_at on threads (updated_at);""",
+]
+
+
+class SQLiteSaver(BaseCheckpointSaver[str]):
+    """将 checkpoint 批量写入 SQLite 的 checkpointer，带保留策略"""
+
+    def __init__(self, path: str = CHECKPOINT_DB, *, batch_size: int = CHECKPOINT_BATCH_SIZE,
+                 flush_interval: float = CHECKPOINT_FLUSH_INTERVAL,
+                 keep_last: Optional[int] = CHECKPOINT_KEEP_LAST,
+                 max_idle: Optional[float] = CHECKPOINT_MAX_IDLE,
+                 evict_interval: float = CHECKPOINT_EVICT_INTERVAL,
+                 compress_threshold: int = COMPRESS_THRESHOLD, serde=None):
+        super().__init__(serde=serde)
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.keep_last = keep_last
+        self.max_idle = max_idle
+        self.evict_interval = evict_interval
+        self.compress_threshold = compress_threshold
+        # 所有访问都在 self._lock 保护下进行，连接可以跨线程共享
+        self._lock = threading.RLock()
+        self._conn = sqlite3.connect(path, timeout=db.BUSY_TIMEOUT, check_same_thread=False,
+                                     cached_statements=db.STATEMENT_CACHE_SIZE)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        db.migrate(self._conn, CHECKPOINTER_MIGRATIONS)
+        # 缓冲的写操作：[(sql, params)]；dirty 为缓冲中涉及的 (thread_id, checkpoint_ns)
+        self._buffer = []
+        self._dirty = set()
+        self._last_flush = time.monotonic()
+        self._last_evict = 0.0
+        self.stats = {'flushes': 0, 'checkpoints': 0, 'pruned_checkpoints': 0, 'evicted_threads': 0}
+
+    # ---- 序列化 ----
+
+    def _dumps(self, value) -> tuple:
+        type_, data = self.serde.dumps_typed(value)
+        if data is not None and len(data) > self.compress_threshold:
+            return type_ + ZLIB_SUFFIX, zlib.compress(data, 1)
+        return type_, data
+
+    def _loads(self, type_: str, data):
+        if type_.endswith(ZLIB_SUFFIX):
+            type_, data = type_[:-len(ZLIB_SUFFIX)], zlib.decompress(data)
+        return self.serde.loads_typed((type_, data))
+
+    # ---- 写入缓冲 ----
+
+    def _buffer_ops(self, thread_id: str, checkpoint_ns: str, ops: list, checkpoints: int = 0) -> bool:
+        """把一次 put / put_writes 的全部写操作作为整体加入缓冲，返回是否达到提交条件
+
+        提交由调用方在整体加入之后进行：若在 put 中途提交，channel 值已落盘而 checkpoint 行仍在缓冲中，
+        保留策略会把这些值当作不再被引用而删除。
+        """
+        with self._lock:
+            self.stats['checkpoints'] += checkpoints
+            self._buffer.extend(ops)
+            self._dirty.add((thread_id, checkpoint_ns))
+            return len(self._buffer) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_interval
+
+    async def _abuffer_ops(self, thread_id: str, checkpoint_ns: str, ops: list, checkpoints: int = 0):
+        """异步版本的加入缓冲：不在事件循环上等待锁或提交"""
+        if self._lock.acquire(blocking=False):
+            try:
+                due = self._buffer_ops(thread_id, checkpoint_ns, ops, checkpoints)
+            finally:
+                self._lock.release()
+        else:
+            # 其他线程正在提交，在线程中等待锁
+            due = await asyncio.to_thread(self._buffer_ops, thread_id, checkpoint_ns, ops, checkpoints)
+        if due:
+            await asyncio.to_thread(self.flush)
+
+    def _flush(self):
+        if not self._buffer:
+            self._last_flush = time.monotonic()
+            return
+        buffer, dirty = self._buffer, self._dirty
+        self._buffer, self._dirty = [], set()
+        now = time.time()
+        with self._conn:
+            for sql, params in buffer:
+                self._conn.execute(sql, params)
+            self._conn.executemany(
+                "INSERT INTO threads (thread_id, updated_at) VALUES (?, ?) "
+                "ON CONFLICT (thread_id) DO UPDATE SET updated_at = excluded.updated_at",
+                [(thread_id, now) for thread_id in {t for t, _ in dirty}])
+            if self.keep_last is not None:
+                for thread_id, checkpoint_ns in dirty:
+                    self._prune_namespace(thread_id, checkpoint_ns, self.keep_last)
+        self.stats['flushes'] += 1
+        self._last_flush = time.monotonic()
+        if self.max_idle is not None and self._last_flush - self._last_evict >= self.evict_interval:
+            self._last_evict = self._last_flush
+            self.evict_idle_threads(self.max_idle)
+
+    def flush(self):
+        """立即提交缓冲中的全部写入"""
+        with self._lock:
+            self._flush()
+
+    def _flush_thread(self, thread_id: Optional[str]):
+        """读取前提交缓冲中的写入；thread_id 为 None 时提交全部"""
+        if thread_id is None or any(t == thread_id for t, _ in self._dirty):
+            self._flush()
+
+    # ---- 保留策略 ----
+
+    def _prune_namespace(self, thread_id: str, checkpoint_ns: str, keep: int):
+        """只保留最近 keep 个 checkpoint，删除其余 checkpoint、它们的待处理写入以及不再被引用的 channel 值"""
+        rows = self._conn.execute(
+            "SELECT checkpoint_id, versions FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+            "ORDER BY checkpoint_id DESC", (thread_id, checkpoint_ns)).fetchall()
+        if len(rows) <= keep:
+            return
+        stale = [(thread_id, checkpoint_ns, checkpoint_id) for checkpoint_id, _ in rows[keep:]]
+        referenced = {(channel, version) for _, versions in rows[:keep]
+                      for channel, version in json.loads(versions).items()}
+        self._conn.executemany(
+            "DELETE FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", stale)
+        self._conn.executemany(
+            "DELETE FROM writes WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?", stale)
+        blobs = self._conn.execute("SELECT channel, version FROM blobs WHERE thread_id = ? AND checkpoint_ns = ?",
+                                   (thread_id, checkpoint_ns)).fetchall()
+        self._conn.executemany(
+            "DELETE FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? AND version = ?",
+            [(thread_id, checkpoint_ns, channel, version) for channel, version in blobs
+             if (channel, version) not in referenced])
+        self.stats['pruned_checkpoints'] += len(stale)
+
+    def _delete_threads(self, thread_ids: Sequence[str]):
+        params = [(thread_id,) for thread_id in thread_ids]
+        for table in ('checkpoints', 'blobs', 'writes', 'threads'):
+            self._conn.executemany(f"DELETE FROM {table} WHERE thread_id = ?", params)
+
+    def evict_idle_threads(self, max_idle: float) -> int:
+        """删除超过 max_idle 秒没有写入的线程，返回删除的线程数"""
+        with self._lock:
+            self._flush()
+            cutoff = time.time() - max_idle
+            with self._conn:
+                idle = [row[0] for row in self._conn.execute(
+                    "SELECT thread_id FROM threads WHERE updated_at < ?", (cutoff,))]
+                self._delete_threads(idle)
+        if idle:
+            self.stats['evicted_threads'] += len(idle)
+            logger.info(f"已删除{len(idle)}个空闲超过{max_idle:.0f}秒的线程的checkpoint")
+        return len(idle)
+
+    def prune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        """按策略清理指定线程：keep_latest 只保留每个命名空间最新的 checkpoint，delete 删除全部"""
+        thread_ids = [str(thread_id) for thread_id in thread_ids]
+        with self._lock:
+            self._flush()
+            with self._conn:
+                if strategy == "delete":
+                    self._delete_threads(thread_ids)
+                elif strategy == "keep_latest":
+                    for thread_id in thread_ids:
+                        for (checkpoint_ns,) in self._conn.execute(
+                                "SELECT DISTINCT checkpoint_ns FROM checkpoints WHERE thread_id = ?",
+                                (thread_id,)).fetchall():
+                            self._prune_namespace(thread_id, checkpoint_ns, 1)
+                else:
+                    raise ValueError(f"不支持的清理策略：{strategy}")
+
+    # ---- 读取 ----
+
+    def _load_blobs(self, thread_id: str, checkpoint_ns: str, versions: ChannelVersions) -> Dict[str, Any]:
+        result = {}
+        for channel, version in versions.items():
+            row = self._conn.execute(
+                "SELECT type, value FROM blobs WHERE thread_id = ? AND checkpoint_ns = ? AND channel = ? "
+                "AND version = ?", (thread_id, checkpoint_ns, channel, str(version))).fetchone()
+            if row is None or row[0] == "empty":
+                continue
+            result[channel] = self._loads(*row)
+        return result
+
+    def _load_writes(self, thread_id: str, checkpoint_ns: str, checkpoint_id: str) -> list:
+        rows = self._conn.execute(
+            "SELECT task_id, idx, channel, type, value, task_path FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id)).fetchall()
+        # 按 (task_path, task_id, idx) 排序，与执行时应用各任务写入的顺序一致
+        rows.sort(key=lambda r: (r[5], r[0], r[1]))
+        return [(task_id, channel, self._loads(type_, value)) for task_id, _, channel, type_, value, _ in rows]
+
+    def _make_tuple(self, row) -> CheckpointTuple:
+        thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, data, metadata_type, metadata = row
+        checkpoint = self._loads(type_, data)
+        return CheckpointTuple(
+            config={"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                     "checkpoint_id": checkpoint_id}},
+            checkpoint={**checkpoint,
+                        "channel_values": self._load_blobs(thread_id, checkpoint_ns,
+                                                           checkpoint["channel_versions"])},
+            metadata=self._loads(metadata_type, metadata),
+            pending_writes=self._load_writes(thread_id, checkpoint_ns, checkpoint_id),
+            parent_config=({"configurable": {"thread_id": thread_id, "checkpoint_ns": checkpoint_ns,
+                                             "checkpoint_id": parent_id}} if parent_id else None),
+        )
+
+    _SELECT = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, type, checkpoint, "
+               "metadata_type, metadata FROM checkpoints")
+
+    def get_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        with self._lock:
+            self._flush_thread(thread_id)
+            if checkpoint_id := get_checkpoint_id(config):
+                row = self._conn.execute(
+                    f"{self._SELECT} WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                    (thread_id, checkpoint_ns, checkpoint_id)).fetchone()
+            else:
+                row = self._conn.execute(
+                    f"{self._SELECT} WHERE thread_id = ? AND checkpoint_ns = ? "
+                    "ORDER BY checkpoint_id DESC LIMIT 1", (thread_id, checkpoint_ns)).fetchone()
+            if row is None:
+                return None
+            result = self._make_tuple(row)
+        if checkpoint_id:
+            # 与 InMemorySaver 一致：指定 checkpoint_id 时原样返回调用方的 config
+            result = result._replace(config=config)
+        return result
+
+    def list(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+             before: Optional[RunnableConfig] = None, limit: Optional[int] = None) -> Iterator[CheckpointTuple]:
+        where, params = [], []
+        if config:
+            where.append("thread_id = ?")
+            params.append(str(config["configurable"]["thread_id"]))
+            if (checkpoint_ns := config["configurable"].get("checkpoint_ns")) is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id < ?")
+            params.append(before_id)
+        sql = self._SELECT + (f" WHERE {' AND '.join(where)}" if where else "") + " ORDER BY checkpoint_id DESC"
+        with self._lock:
+            self._flush_thread(params[0] if config else None)
+            rows = self._conn.execute(sql, params).fetchall()
+        for row in rows:
+            if limit is not None and limit <= 0:
+                break
+            if filter:
+                metadata = self._loads(row[6], row[7])
+                if not all(value == metadata.get(key) for key, value in filter.items()):
+                    continue
+            with self._lock:
+                item = self._make_tuple(row)
+            if limit is not None:
+                limit -= 1
+            yield item
+
+    # ---- 写入 ----
+
+    def _checkpoint_ops(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                        new_versions: ChannelVersions) -> tuple:
+        """序列化一次 put 的 channel 值与 checkpoint 行，返回 (thread_id, checkpoint_ns, 写操作, 新的 config)"""
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        c = checkpoint.copy()
+        values = c.pop("channel_values")
+        ops = []
+        for channel, version in new_versions.items():
+            type_, data = self._dumps(values[channel]) if channel in values else ("empty", None)
+            ops.append(("INSERT OR REPLACE INTO blobs (thread_id, checkpoint_ns, channel, version, type, value) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        (thread_id, checkpoint_ns, channel, str(version), type_, data)))
+        type_, data = self._dumps(c)
+        metadata_type, metadata_data = self._dumps(get_checkpoint_metadata(config, metadata))
+        versions = json.dumps({k: str(v) for k, v in checkpoint["channel_versions"].items()})
+        ops.append(("INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, "
+                    "parent_checkpoint_id, type, checkpoint, metadata_type, metadata, versions) "
+                    "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                    (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+                     type_, data, metadata_type, metadata_data, versions)))
+        next_config = {"configurable": {"thread_id": config["configurable"]["thread_id"],
+                                        "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"]}}
+        return thread_id, checkpoint_ns, ops, next_config
+
+    def _writes_ops(self, config: RunnableConfig, writes: Sequence[tuple], task_id: str, task_path: str) -> tuple:
+        """序列化一次 put_writes 的写入，返回 (thread_id, checkpoint_ns, 写操作)"""
+        thread_id = str(config["configurable"]["thread_id"])
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        ops = []
+        for idx, (channel, value) in enumerate(writes):
+            idx = WRITES_IDX_MAP.get(channel, idx)
+            type_, data = self._dumps(value)
+            # 与 InMemorySaver 一致：普通写入重复时保留第一次的值，特殊 channel（idx < 0）以最新的值为准
+            verb = "INSERT OR REPLACE" if idx < 0 else "INSERT OR IGNORE"
+            ops.append((f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, "
+                        "channel, type, value, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                        (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, type_, data, task_path)))
+        return thread_id, checkpoint_ns, ops
+
+    def put(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+            new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id, checkpoint_ns, ops, next_config = self._checkpoint_ops(config, checkpoint, metadata, new_versions)
+        if self._buffer_ops(thread_id, checkpoint_ns, ops, checkpoints=1):
+            self.flush()
+        return next_config
+
+    def put_writes(self, config: RunnableConfig, writes: Sequence[tuple], task_id: str, task_path: str = "") -> None:
+        thread_id, checkpoint_ns, ops = self._writes_ops(config, writes, task_id, task_path)
+        if self._buffer_ops(thread_id, checkpoint_ns, ops):
+            self.flush()
+
+    def delete_thread(self, thread_id: str) -> None:
+        with self._lock:
+            self._flush()
+            with self._conn:
+                self._delete_threads([str(thread_id)])
+
+    def get_next_version(self, current: Optional[str], channel: None) -> str:
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # ---- 异步接口 ----
+    # 写入在事件循环上序列化并加入内存缓冲，达到提交条件时的提交与全部读取都可能触发磁盘 I/O，
+    # 放到线程中执行以免阻塞事件循环
+
+    async def aget_tuple(self, config: RunnableConfig) -> Optional[CheckpointTuple]:
+        return await asyncio.to_thread(self.get_tuple, config)
+
+    async def alist(self, config: Optional[RunnableConfig], *, filter: Optional[Dict[str, Any]] = None,
+                    before: Optional[RunnableConfig] = None,
+                    limit: Optional[int] = None) -> AsyncIterator[CheckpointTuple]:
+        items = await asyncio.to_thread(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config: RunnableConfig, checkpoint: Checkpoint, metadata: CheckpointMetadata,
+                   new_versions: ChannelVersions) -> RunnableConfig:
+        thread_id, checkpoint_ns, ops, next_config = self._checkpoint_ops(config, checkpoint, metadata, new_versions)
+        await self._abuffer_ops(thread_id, checkpoint_ns, ops, checkpoints=1)
+        return next_config
+
+    async def aput_writes(self, config: RunnableConfig, writes: Sequence[tuple], task_id: str,
+                          task_path: str = "") -> None:
+        thread_id, checkpoint_ns, ops = self._writes_ops(config, writes, task_id, task_path)
+        await self._abuffer_ops(thread_id, checkpoint_ns, ops)
+
+    async def adelete_thread(self, thread_id: str) -> None:
+        await asyncio.to_thread(self.delete_thread, thread_id)
+
+    async def aprune(self, thread_ids: Sequence[str], *, strategy: str = "keep_latest") -> None:
+        await asyncio.to_thread(self.prune, thread_ids, strategy=strategy)
+
+    def close(self):
+        """提交缓冲中的写入并关闭连接"""
+        with self._lock:
+            if self._conn is None:
+                return
+            self._flush()
+            self._conn.close()
+            self._conn = None
+
+    def __enter__(self) -> "SQLiteSaver":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
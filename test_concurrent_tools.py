@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""
+测试工具调用的并发执行
+
+验证 concurrent_tools.ConcurrentToolExecutor 的同步与异步路径：每个调用单独超时（包括只有一个调用时）、
+出错的调用返回 status='error' 的 ToolMessage，以及调用乱序完成时结果仍与 tool_calls 的顺序和 tool_call_id 对齐。
+可以直接运行，也可以用 pytest 执行。
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.tools import tool
+
+from concurrent_tools import ConcurrentToolExecutor, run_in_thread_pool
+
+
+@tool
+def sleepy(seconds: float):
+    """等待指定秒数后返回"""
+    time.sleep(seconds)
+    return f"slept {seconds}"
+
+
+@tool
+def broken(reason: str):
+    """总是出错"""
+    raise RuntimeError(reason)
+
+
+run_in_thread_pool(sleepy)
+run_in_thread_pool(broken)
+
+
+def _call(name: str, args: dict, call_id: str) -> dict:
+    return {'name': name, 'args': args, 'id': call_id}
+
+
+def _executor(timeout: float = 1.0) -> ConcurrentToolExecutor:
+    return ConcurrentToolExecutor([sleepy, broken], timeout=timeout)
+
+
+def test_single_call_times_out():
+    start = time.monotonic()
+    [message] = _executor(timeout=0.2).invoke([_call('sleepy', {'seconds': 2}, 'c1')])
+    assert time.monotonic() - start < 1.0
+    assert message.status == 'error' and message.tool_call_id == 'c1'
+    assert "超时" in message.content
+
+
+def test_timeout_is_per_call():
+    calls = [_call('sleepy', {'seconds': 2}, 'slow'), _call('sleepy', {'seconds': 0.05}, 'fast')]
+    for messages in (_executor(timeout=0.3).invoke(calls),
+                     asyncio.run(_executor(timeout=0.3).ainvoke(calls))):
+        assert [m.tool_call_id for m in messages] == ['slow', 'fast']
+        assert messages[0].status == 'error' and "超时" in messages[0].content
+        assert messages[1].status != 'error' and messages[1].content == "slept 0.05"
+
+
+def test_errors_become_error_messages():
+    calls = [_call('broken', {'reason': 'boom'}, 'c1'), _call('missing', {}, 'c2')]
+    for messages in (_executor().invoke(calls), asyncio.run(_executor().ainvoke(calls))):
+        assert [m.status for m in messages] == ['error', 'error']
+        assert "RuntimeError('boom')" in messages[0].content
+        assert "missing is not a valid tool" in messages[1].content
+        assert messages[1].content.endswith("Please fix your mistakes.")
+
+
+def test_results_follow_call_order_when_finishing_out_of_order():
+    delays = [0.3, 0.1, 0.2, 0.0]
+    calls = [_call('sleepy', {'seconds': d}, f"c{i}") for i, d in enumerate(delays)]
+    for messages in (_executor().invoke(calls), asyncio.run(_executor().ainvoke(calls))):
+        assert [m.tool_call_id for m in messages] == ['c0', 'c1', 'c2', 'c3']
+        assert [m.content for m in messages] == [f"slept {d}" for d in delays]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
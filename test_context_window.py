@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+测试上下文窗口裁剪
+
+验证 context_window.ContextWindow 始终保留指令与最近的工具交互，较早的工具输出被折叠，
+预算不足时整体丢弃最早的交互，且工具调用与工具结果不会被拆开。可以直接运行，也可以用 pytest 执行。
+"""
+
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+
+from context_window import ContextWindow, estimate_tokens
+
+
+def _exchange(i: int, output: str) -> list:
+    call_id = f"call_{i}"
+    return [AIMessage(content='', tool_calls=[{'name': 'search', 'args': {'query': f"q{i}"}, 'id': call_id}]),
+            ToolMessage(content=output, name='search', tool_call_id=call_id)]
+
+
+def _history(exchanges: int, output_chars: int = 400) -> list:
+    messages = [SystemMessage(content="你是一个助手"), HumanMessage(content="查询所有用户")]
+    for i in range(exchanges):
+        messages += _exchange(i, f"结果{i}:" + "x" * output_chars)
+    return messages
+
+
+def test_small_history_is_unchanged():
+    messages = _history(2)
+    window, report = ContextWindow(max_tokens=10000).fit(messages)
+    assert window == messages
+    assert report.saved_tokens == 0
+
+
+def test_old_tool_outputs_are_collapsed():
+    messages = _history(5, output_chars=2000)
+    recent = sum(estimate_tokens(m) for m in messages[:2] + messages[-2:])
+    window, report = ContextWindow(max_tokens=recent + 4 * 60).fit(messages)
+    assert len(window) == len(messages)
+    assert window[:2] == messages[:2]
+    assert window[-1] == messages[-1]
+    assert all("已折叠" in m.content for m in window[3:-2:2])
+    assert report.collapsed == 4 and report.saved_tokens > 0
+
+
+def test_oldest_exchanges_dropped_in_pairs():
+    messages = _history(10)
+    window, report = ContextWindow(max_tokens=300, keep_recent=1).fit(messages)
+    assert window[:2] == messages[:2]
+    assert window[-2:] == messages[-2:]
+    assert report.dropped % 2 == 0 and report.dropped > 0
+    # 每个保留的工具结果前面都有对应的工具调用
+    call_ids = set()
+    for message in window:
+        if isinstance(message, AIMessage):
+            call_ids.update(c['id'] for c in message.tool_calls)
+        if isinstance(message, ToolMessage):
+            assert message.tool_call_id in call_ids
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+测试 SQLite 数据访问层
+
+在临时数据库上验证 db.ConnectionPool 按线程复用连接、读写连接与只读连接分离（只读连接不能写库，读写连接启用 WAL），
+以及 CachedQuery 的 TTL 过期与其他连接提交修改后按 data_version 失效。
+可以直接运行，也可以用 pytest 执行。
+"""
+
+import os
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+import db
+from db import CachedQuery, ConnectionPool, DataVersion
+
+
+def _db_path() -> str:
+    path = os.path.join(tempfile.mkdtemp(), "test.db")
+    conn = sqlite3.connect(path)
+    conn.execute("create table items (id int primary key not null, name varchar not null)")
+    conn.execute("insert into items values (1, 'a')")
+    conn.commit()
+    conn.close()
+    return path
+
+
+def test_connection_reused_within_thread():
+    pool = ConnectionPool()
+    path = _db_path()
+    conn = pool.connection(path)
+    assert pool.connection(path) is conn
+    # 相对路径与绝对路径指向同一个文件时共用连接
+    assert pool.connection(os.path.relpath(path)) is conn
+    assert pool.connection(path, readonly=True) is not conn
+    assert pool.connection(path, readonly=True) is pool.connection(path, readonly=True)
+    pool.close_all()
+
+
+def test_each_thread_gets_its_own_connection():
+    pool = ConnectionPool()
+    path = _db_path()
+    main = pool.connection(path, readonly=True)
+    seen = []
+
+    def worker():
+        conn = pool.connection(path, readonly=True)
+        rows = conn.execute("select name from items").fetchall()
+        seen.append((conn, conn is pool.connection(path, readonly=True), rows))
+
+    threads = [threading.Thread(target=worker) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(reused and rows == [('a',)] for _, reused, rows in seen)
+    assert len({id(conn) for conn, _, _ in seen} | {id(main)}) == 4
+    pool.close_all()
+
+
+def test_readonly_and_readwrite_split():
+    pool = ConnectionPool()
+    path = _db_path()
+    assert pool.connection(path).execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    with pytest.raises(sqlite3.OperationalError):
+        pool.connection(path, readonly=True).execute("insert into items values (2, 'b')")
+    assert pool.execute(path, "insert into items values (?, ?)", (2, 'b')) == 1
+    # 读写连接提交后只读连接立即可见
+    assert pool.query(path, "select name from items order by id") == [('a',), ('b',)]
+    assert pool.query_one(path, "select count(*) from items") == (2,)
+    pool.close_all()
+
+
+def test_readonly_connection_requires_existing_database():
+    pool = ConnectionPool()
+    with pytest.raises(sqlite3.OperationalError):
+        pool.query(os.path.join(tempfile.mkdtemp(), "missing.db"), "select 1")
+    pool.close_all()
+
+
+def test_module_helpers_use_default_pool():
+    path = _db_path()
+    assert db.query(path, "select name from items") == [('a',)]
+    assert db.execute(path, "update items set name = ? where id = ?", ('z', 1)) == 1
+    assert db.query_one(path, "select name from items") == ('z',)
+    assert db.pool.connection(path) is db.pool.connection(path)
+
+
+def test_cached_query_hits_until_ttl_expires():
+    path = _db_path()
+    cache = CachedQuery(path, "select name from items", ttl=0.1)
+    assert cache.get() == [('a',)]
+    assert cache.get() == [('a',)]
+    assert cache.stats()['hits'] == 1 and cache.stats()['misses'] == 1
+    time.sleep(0.15)
+    assert cache.get() == [('a',)]
+    assert cache.stats()['misses'] == 2
+    cache.invalidate()
+    cache.get()
+    assert cache.stats()['misses'] == 3
+    cache.close()
+
+
+def test_cached_query_invalidated_by_other_connection():
+    path = _db_path()
+    cache = CachedQuery(path, "select name from items order by id", ttl=3600)
+    version = DataVersion(path)
+    assert cache.get() == [('a',)]
+    before = version()
+    # 另一条连接（另一个线程中的连接池连接）提交修改
+    writer = threading.Thread(target=db.pool.execute, args=(path, "insert into items values (2, 'b')"))
+    writer.start()
+    writer.join()
+    assert version() != before
+    assert cache.get() == [('a',), ('b',)]
+    assert cache.stats() == {'hits': 0, 'misses': 2, 'hit_rate': 0.0}
+    # 没有新的修改时再次命中
+    assert cache.get() == [('a',), ('b',)]
+    assert cache.stats()['hits'] == 1
+    cache.close()
+    version.close()
+
+
+def test_cached_query_returns_copies():
+    cache = CachedQuery(_db_path(), "select name from items")
+    cache.get().append(('x',))
+    assert cache.get() == [('a',)]
+    cache.close()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+测试入口模块的延迟初始化
+
+在全新的子进程中导入 email_workflow 与 order_flow，验证导入时没有副作用（不执行订单、不输出、
+不配置日志），也没有加载只在运行时才需要的依赖（包括默认不使用的 SQLite checkpointer）。可以直接运行，也可以用 pytest 执行。
+"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+
+CHECK = """
+import json, logging, sys
+import {module}
+print(json.dumps({{
+    'modules': sorted(m for m in sys.modules if m.split('.')[0] in {deps!r}),
+    'handlers': len(logging.getLogger().handlers),
+}}))
+"""
+
+
+def _import(module: str, deps: tuple) -> tuple:
+    result = subprocess.run([sys.executable, "-c", CHECK.format(module=module, deps=deps)],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    *output, report = result.stdout.strip().splitlines()
+    return output, json.loads(report)
+
+
+def test_email_workflow_import_is_lazy():
+    output, report = _import("email_workflow", ("langchain_ollama", "ollama", "dotenv", "sqlite_checkpointer"))
+    assert output == []
+    assert report['modules'] == []
+    assert report['handlers'] == 0
+
+
+def test_order_flow_import_is_lazy():
+    output, report = _import("order_flow", ("langgraph",))
+    assert output == []
+    assert report['modules'] == []
+
+
+def test_order_flow_graph_built_on_first_access():
+    import inventory
+    import order_flow
+    from inventory import InventoryStore, StockCache
+    assert order_flow.graph is order_flow.get_graph()
+    # 使用临时库存，不读写仓库目录下的 inventory.db，结果也不受之前运行剩余库存的影响
+    store = InventoryStore(os.path.join(tempfile.mkdtemp(), "inventory.db"), {"item_001": 10})
+    previous = inventory.set_inventory(StockCache(store, hot_products=[]))
+    try:
+        state = order_flow.graph.invoke({"order_id": "o1", "product_id": "item_001", "quantity": 2,
+                                         "is_valid": False, "inventory_sufficient": False, "payment_success": False,
+                                         "logistics_assigned": False, "message": ""})
+    finally:
+        inventory.set_inventory(previous)
+    assert state['logistics_assigned']
+    assert store.available("item_001") == 8
+
+
+if __name__ == "__main__":
+    sys.path.append(ROOT)
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
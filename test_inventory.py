@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+测试库存子系统
+
+在临时数据库上验证 inventory.InventoryStore 的原子预占、释放与幂等性，同一订单以不同商品或数量重复预占时报错，
+确认后的预占不能再释放，以及 StockCache 分片计数器在多线程争抢同一商品时不超卖、不误判库存不足。可以直接运行，也可以用 pytest 执行。
+"""
+
+import os
+import sys
+import tempfile
+import threading
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+import db
+from inventory import InventoryStore, StockCache
+
+
+def _store(stock: int) -> InventoryStore:
+    return InventoryStore(os.path.join(tempfile.mkdtemp(), "inventory.db"), {"item_001": stock})
+
+
+def _reservations(store: InventoryStore) -> list:
+    return db.pool.query(store.path, "SELECT order_id, product_id, quantity FROM reservations")
+
+
+def test_reserve_release_idempotent():
+    store = _store(10)
+    assert store.reserve("o1", "item_001", 4)
+    assert store.reserve("o1", "item_001", 4)
+    assert store.available("item_001") == 6
+    assert not store.reserve("o2", "item_001", 7)
+    assert not store.reserve("o3", "item_002", 1)
+    assert store.release("o1") == 4
+    assert store.release("o1") == 0
+    assert store.available("item_001") == 10
+    # 库存不足的订单没有留下预占记录，库存补充后可以重新预占
+    assert store.reserve("o2", "item_001", 7)
+
+
+def _contend(inventory, threads: int = 8, orders: int = 100) -> int:
+    sold = []
+    lock = threading.Lock()
+
+    def worker(t):
+        for i in range(orders):
+            quantity = 1 + (t + i) % 3
+            if inventory.reserve(f"{t}-{i}", "item_001", quantity):
+                with lock:
+                    sold.append(quantity)
+
+    workers = [threading.Thread(target=worker, args=(t,)) for t in range(threads)]
+    for worker_thread in workers:
+        worker_thread.start()
+    for worker_thread in workers:
+        worker_thread.join()
+    return sum(sold)
+
+
+def test_no_overselling_under_contention():
+    store = _store(500)
+    assert _contend(StockCache(store, hot_products=())) == 500
+    assert store.available("item_001") == 0
+
+
+def test_sharded_cache_no_overselling_and_flush():
+    store = _store(500)
+    cache = StockCache(store, hot_products=["item_001"], shards=4, lease_size=16)
+    assert _contend(cache) == 500
+    assert cache.available("item_001") == 0
+    cache.release("0-0")
+    assert cache.available("item_001") == 1
+    cache.flush()
+    assert store.available("item_001") == 1
+
+
+def test_sharded_cache_merges_fragmented_stock():
+    store = _store(6)
+    cache = StockCache(store, hot_products=["item_001"], shards=2, lease_size=3)
+    a, b = "a", "b"
+    while cache._shard_index(b) == cache._shard_index(a):
+        b += "b"
+    # 两个分片各领取 3 件后释放，余量分散在两个分片中
+    assert cache.reserve(a, "item_001", 3) and cache.reserve(b, "item_001", 3)
+    cache.release(a)
+    cache.release(b)
+    assert cache.reserve("c", "item_001", 5)
+    assert cache.available("item_001") == 1
+
+
+def test_duplicate_reserve_is_idempotent_under_contention():
+    store = _store(100)
+    cache = StockCache(store, hot_products=["item_001"], shards=4, lease_size=1)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(cache.reserve("dup", "item_001", 3)))
+               for _ in range(16)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert all(results)
+    assert cache.available("item_001") == 97
+
+
+def test_commit_drops_held_reservation():
+    cache = StockCache(_store(10), hot_products=["item_001"], shards=2)
+    assert cache.reserve("o1", "item_001", 4)
+    cache.commit("o1")
+    assert not any(shard.held for shard in cache._shards)
+    # 已确认的订单不能再释放
+    assert cache.release("o1") == 0
+    assert cache.available("item_001") == 6
+
+
+def test_commit_deletes_stored_reservation():
+    store = _store(10)
+    cache = StockCache(store, hot_products=[])
+    assert cache.reserve("o1", "item_001", 4)
+    cache.commit("o1")
+    assert _reservations(store) == []
+    # 已确认的订单不能再释放
+    assert cache.release("o1") == 0
+    assert store.available("item_001") == 6
+    assert not store.commit("o1")
+
+
+@pytest.mark.parametrize("hot", [False, True])
+def test_duplicate_reserve_must_match(hot):
+    cache = StockCache(_store(10), hot_products=["item_001"] if hot else [])
+    assert cache.reserve("o1", "item_001", 4)
+    assert cache.reserve("o1", "item_001", 4)
+    with pytest.raises(ValueError):
+        cache.reserve("o1", "item_001", 5)
+    with pytest.raises(ValueError):
+        cache.reserve("o1", "item_001", 3)
+    assert cache.available("item_001") == 6
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func) and not hasattr(func, "pytestmark"):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
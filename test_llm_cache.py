@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+"""
+测试 LLM 响应缓存
+
+在临时数据库上验证 llm_cache.ResponseCache 的内存 LRU 与 SQLite 两层按最近使用淘汰、条目过期，
+命中时返回带新 id 的副本，缓存键与消息及工具调用 id 无关，cached_invoke 在 temperature > 0 时绕过缓存，
+以及 acached_invoke 不在事件循环线程上读写缓存。
+可以直接运行，也可以用 pytest 执行。
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+
+import db
+from llm_cache import ResponseCache, acached_invoke, cached_invoke, make_key
+from llm_coalesce import RequestCoalescer
+
+MODEL = "qwen2.5:7b"
+
+
+class CountingModel:
+    """记录调用次数，返回带工具调用的固定回复"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return AIMessage(content=f"回复{self.calls}", id=f"run-{self.calls}",
+                         tool_calls=[{'name': 'get_weekday', 'args': {}, 'id': f"call_{self.calls}"}])
+
+    async def ainvoke(self, messages):
+        return self.invoke(messages)
+
+
+def _cache(**kwargs) -> ResponseCache:
+    return ResponseCache(os.path.join(tempfile.mkdtemp(), "llm_cache.db"), **kwargs)
+
+
+def _disk_keys(cache: ResponseCache) -> set:
+    return {row[0] for row in db.pool.query(cache.path, "SELECT key FROM responses")}
+
+
+def test_hit_returns_fresh_copy():
+    cache = _cache()
+    cache.put("k", CountingModel().invoke([]))
+    first, second = cache.get("k"), cache.get("k")
+    assert first.content == second.content == "回复1"
+    assert first.id is None
+    assert first.tool_calls[0]['id'] != second.tool_calls[0]['id']
+    assert cache.stats['memory_hits'] == 2
+
+
+def test_memory_lru_eviction_falls_back_to_disk():
+    cache = _cache(memory_size=2)
+    for key in "abc":
+        cache.put(key, AIMessage(content=key))
+    # a 已被挤出内存，从 SQLite 读取后重新放回内存
+    assert cache.get("a").content == "a"
+    assert cache.stats == {'memory_hits': 0, 'disk_hits': 1, 'misses': 0}
+    assert list(cache._memory) == ["c", "a"]
+    cache.get("c")
+    assert cache.stats['memory_hits'] == 1
+
+
+def test_disk_lru_eviction():
+    cache = _cache(memory_size=1, disk_size=2)
+    cache.put("a", AIMessage(content="a"))
+    time.sleep(0.01)
+    cache.put("b", AIMessage(content="b"))
+    time.sleep(0.01)
+    # 读取 a 更新其最近使用时间，写入 c 时淘汰 b
+    cache._memory.clear()
+    cache.get("a")
+    time.sleep(0.01)
+    cache.put("c", AIMessage(content="c"))
+    assert _disk_keys(cache) == {"a", "c"}
+
+
+def test_entries_expire():
+    cache = _cache(ttl=0.05)
+    cache.put("a", AIMessage(content="a"))
+    cache.put("b", AIMessage(content="b"), ttl=3600)
+    time.sleep(0.1)
+    assert cache.get("a") is None
+    assert cache.get("b").content == "b"
+    cache._memory.clear()
+    assert cache.get("a") is None and cache.stats['misses'] == 2
+    # 写入新条目时清理磁盘上的过期条目
+    cache.put("c", AIMessage(content="c"))
+    assert _disk_keys(cache) == {"b", "c"}
+
+
+def test_key_ignores_run_specific_ids():
+    def history(run: int):
+        return [HumanMessage(content="今天星期几？", id=f"h{run}"),
+                AIMessage(content="", id=f"a{run}", tool_calls=[{'name': 'get_weekday', 'args': {}, 'id': f"c{run}"}]),
+                ToolMessage(content="星期一", tool_call_id=f"c{run}", id=f"t{run}")]
+
+    assert make_key(history(1), MODEL, 0) == make_key(history(2), MODEL, 0)
+    assert make_key(history(1), MODEL, 0) != make_key(history(1), MODEL, 0.5)
+    assert make_key(history(1), MODEL, 0) != make_key(history(1), "llama3:8b", 0)
+
+
+def test_cached_invoke_bypasses_cache_when_temperature_positive():
+    cache, model, coalescer = _cache(), CountingModel(), RequestCoalescer()
+    messages = [HumanMessage(content="你好")]
+    for _ in range(2):
+        cached_invoke(model, messages, MODEL, 0.7, cache=cache, coalescer=coalescer)
+    assert model.calls == 2 and _disk_keys(cache) == set()
+
+    for _ in range(2):
+        cached_invoke(model, messages, MODEL, 0, cache=cache, coalescer=coalescer)
+    assert model.calls == 3
+    response = asyncio.run(acached_invoke(model, messages, MODEL, 0, cache=cache, coalescer=coalescer))
+    assert model.calls == 3 and response.content == "回复3"
+    asyncio.run(acached_invoke(model, messages, MODEL, 0.7, cache=cache, coalescer=coalescer))
+    assert model.calls == 4
+
+
+def test_async_cache_access_off_event_loop():
+    cache, model, coalescer = _cache(), CountingModel(), RequestCoalescer()
+    threads = []
+    for name in ("get", "put"):
+        method = getattr(cache, name)
+
+        def recording(*args, _method=method, **kwargs):
+            threads.append(threading.current_thread())
+            return _method(*args, **kwargs)
+
+        setattr(cache, name, recording)
+    messages = [HumanMessage(content="你好")]
+    for _ in range(2):
+        response = asyncio.run(acached_invoke(model, messages, MODEL, 0, cache=cache, coalescer=coalescer))
+    assert model.calls == 1 and response.content == "回复1"
+    # 未命中时 get + put，命中时 get
+    assert len(threads) == 3 and threading.main_thread() not in threads
+
+
+def test_clear():
+    cache = _cache()
+    cache.put("a", AIMessage(content="a"))
+    cache.clear()
+    assert cache.get("a") is None and _disk_keys(cache) == set()
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
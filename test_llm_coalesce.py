@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+测试相同 LLM 请求的合并
+
+用计数的替身模型验证 llm_coalesce.RequestCoalescer 把并发的相同请求合并为一次上游调用、
+window 为 0（默认）时不同请求立即各自发出、开启时间窗口后把不同请求攒成一批，并统计合并数与排队延迟。可以直接运行，也可以用 pytest 执行。
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from llm_coalesce import RequestCoalescer
+
+
+class Reply:
+    def __init__(self, content):
+        self.content = content
+
+    def model_copy(self):
+        return Reply(self.content)
+
+
+class CountingModel:
+    """记录上游调用；prompt 为 "fail" 时抛出异常"""
+
+    def __init__(self, delay: float = 0.05):
+        self.delay = delay
+        self.calls = []
+        self.batches = []
+
+    def _reply(self, messages):
+        self.calls.append(messages)
+        if messages == "fail":
+            raise RuntimeError("模型调用失败")
+        return Reply(f"回复：{messages}")
+
+    def invoke(self, messages):
+        time.sleep(self.delay)
+        return self._reply(messages)
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(self.delay)
+        return self._reply(messages)
+
+    async def abatch(self, inputs, return_exceptions=False):
+        self.batches.append(list(inputs))
+        await asyncio.sleep(self.delay)
+        results = []
+        for messages in inputs:
+            try:
+                results.append(self._reply(messages))
+            except Exception as e:
+                results.append(e)
+        return results
+
+
+def test_identical_async_requests_share_one_call():
+    model = CountingModel()
+    coalescer = RequestCoalescer(window=0.01, max_batch=4)
+
+    async def main():
+        return await asyncio.gather(*(coalescer.ainvoke(model, "今天星期几", "k") for _ in range(20)))
+
+    results = asyncio.run(main())
+    assert len(model.calls) == 1
+    assert {reply.content for reply, _ in results} == {"回复：今天星期几"}
+    assert sum(leader for _, leader in results) == 1
+    stats = coalescer.stats()
+    assert stats['requests'] == 20 and stats['deduplicated'] == 19 and stats['upstream_calls'] == 1
+
+
+def test_distinct_requests_not_batched_without_window():
+    model = CountingModel()
+    coalescer = RequestCoalescer(window=0)
+
+    async def main():
+        return await asyncio.gather(*(coalescer.ainvoke(model, f"p{i}", f"k{i}") for i in range(5)))
+
+    results = asyncio.run(main())
+    assert [reply.content for reply, _ in results] == [f"回复：p{i}" for i in range(5)]
+    assert model.batches == [] and sorted(model.calls) == [f"p{i}" for i in range(5)]
+    stats = coalescer.stats()
+    assert stats['batches'] == 0 and stats['upstream_calls'] == 5 and stats['queue_delay_ms_max'] < 5
+
+
+def test_distinct_requests_micro_batched():
+    model = CountingModel()
+    coalescer = RequestCoalescer(window=0.02, max_batch=3)
+
+    async def main():
+        return await asyncio.gather(*(coalescer.ainvoke(model, f"p{i}", f"k{i}") for i in range(5)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert [reply.content for reply, _ in results] == [f"回复：p{i}" for i in range(5)]
+    # 前 3 个达到批大小立即发出，剩余 2 个在时间窗口结束后发出
+    assert model.batches == [["p0", "p1", "p2"], ["p3", "p4"]]
+    stats = coalescer.stats()
+    assert stats['batches'] == 2 and stats['batched_requests'] == 5 and stats['deduplicated'] == 0
+    assert stats['queue_delay_ms_max'] >= 15
+
+
+def test_errors_propagate_to_all_waiters():
+    model = CountingModel()
+    coalescer = RequestCoalescer(window=0)
+
+    async def main():
+        return await asyncio.gather(*(coalescer.ainvoke(model, "fail", "k") for _ in range(3)),
+                                    return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert len(model.calls) == 1
+    assert all(isinstance(r, RuntimeError) for r in results)
+    # 失败后不保留在途请求，下一次请求重新调用模型
+    asyncio.run(main())
+    assert len(model.calls) == 2
+
+
+def test_identical_threaded_requests_share_one_call():
+    model = CountingModel(delay=0.1)
+    coalescer = RequestCoalescer()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(coalescer.invoke(model, "今天星期几", "k")))
+               for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(model.calls) == 1
+    assert len(results) == 8 and sum(leader for _, leader in results) == 1
+    assert coalescer.stats()['deduplicated'] == 7
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+测试批量邮件分发
+
+在本地替身 SMTP 服务器上验证 mail_dispatcher.MailDispatcher：临时错误（4xx）按退避重试、永久错误不重试，
+生产者与发送协程之间的队列有界，令牌桶限速生效，同一服务器上的分发器共用一个限速器并取最小速率，
+以及异步迭代器作为输入。可以直接运行，也可以用 pytest 执行。
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from fake_servers import FakeSMTPServer
+from mail_dispatcher import MailDispatcher, RateLimiter, get_rate_limiter
+from smtp_pool import SMTPPool
+
+
+def _jobs(n: int):
+    return [(f"user{i}@example.com", "主题", f"内容{i}") for i in range(n)]
+
+
+def _dispatcher(server: FakeSMTPServer, **kwargs) -> MailDispatcher:
+    pool = SMTPPool(server.host, server.port, "sender@example.com", "secret", size=kwargs.get("concurrency", 8))
+    return MailDispatcher(pool, backoff_base=0.01, backoff_max=0.05, **kwargs)
+
+
+def test_transient_errors_retried_with_backoff():
+    with FakeSMTPServer() as server:
+        server.mail_replies = ["451 try again later", "421 service not available"]
+        stats = asyncio.run(_dispatcher(server, concurrency=1).dispatch(_jobs(3)))
+    assert stats.sent == 3 and stats.failed == 0
+    assert stats.retries == 2
+    assert server.stats['messages'] == 3
+
+
+def test_permanent_errors_and_exhausted_retries_fail():
+    with FakeSMTPServer() as server:
+        server.mail_replies = ["550 mailbox unavailable"] + ["451 try again later"] * 3
+        stats = asyncio.run(_dispatcher(server, concurrency=1, max_retries=2).dispatch(_jobs(2)))
+    # 550 不重试；第二封遇到 3 次 451，重试 2 次后放弃
+    assert stats.sent == 0 and stats.failed == 2
+    assert stats.retries == 2
+    assert [recipient for recipient, _ in stats.failures] == ["user0@example.com", "user1@example.com"]
+
+
+def test_queue_is_bounded():
+    concurrency, queue_size = 2, 3
+    ahead = []
+
+    with FakeSMTPServer() as server:
+        def jobs():
+            for i, job in enumerate(_jobs(30)):
+                # 已读取但服务器尚未收到的邮件：队列中的加上正在发送的
+                ahead.append(i - server.stats['messages'])
+                yield job
+
+        stats = asyncio.run(_dispatcher(server, concurrency=concurrency, queue_size=queue_size).dispatch(jobs()))
+    assert stats.sent == 30
+    assert max(ahead) <= queue_size + concurrency + 1
+
+
+def test_rate_limit_applied():
+    with FakeSMTPServer() as server:
+        start = time.perf_counter()
+        stats = asyncio.run(_dispatcher(server, concurrency=4, rate_limit=50, burst=1).dispatch(_jobs(11)))
+        elapsed = time.perf_counter() - start
+    assert stats.sent == 11
+    # 第一封立即放行，之后每 20 毫秒一封
+    assert elapsed >= 0.18
+
+
+def test_rate_limiter_shared_per_server():
+    limiter = get_rate_limiter("mail.example.com", 25, 10, burst=5)
+    assert get_rate_limiter("mail.example.com", 25, 10, burst=5) is limiter
+    # 同一服务器上速率不同的分发器仍共用一个令牌桶，取较小的速率与突发量
+    assert get_rate_limiter("mail.example.com", 25, 100) is limiter
+    assert (limiter.rate, limiter.burst) == (10, 1)
+    assert get_rate_limiter("mail.example.com", 25, 2, burst=3) is limiter
+    assert (limiter.rate, limiter.burst) == (2, 1)
+    assert get_rate_limiter("mail.example.com", 587, 100).rate == 100
+
+
+def test_token_bucket_burst():
+    limiter = RateLimiter(rate=10, burst=3)
+    assert [limiter._reserve() for _ in range(3)] == [0.0, 0.0, 0.0]
+    assert 0.05 < limiter._reserve() <= 0.1
+
+
+def test_accepts_async_iterator():
+    async def jobs():
+        for job in _jobs(5):
+            await asyncio.sleep(0)
+            yield job
+
+    with FakeSMTPServer() as server:
+        stats = asyncio.run(_dispatcher(server, concurrency=2).dispatch(jobs()))
+    assert stats.sent == 5
+    assert sorted(rcpt[0] for _, rcpt, _ in server.messages) == [f"<user{i}@example.com>" for i in range(5)]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
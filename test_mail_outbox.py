@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+测试邮件发件箱
+
+在临时数据库上用替身 send 函数验证 mail_outbox：重复入队的幂等性、临时错误重试直到超过最大次数后标记为 failed、
+永久错误直接失败、租约过期的 sending 邮件被重新认领、入队时立即唤醒工作线程，以及 stop(drain_timeout) 先发完再停止。
+可以直接运行，也可以用 pytest 执行。
+"""
+
+import os
+import smtplib
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import db
+from mail_outbox import FAILED, PENDING, SENDING, SENT, Outbox, OutboxWorker
+
+
+def _outbox() -> Outbox:
+    return Outbox(os.path.join(tempfile.mkdtemp(), "outbox.db"))
+
+
+class FlakySender:
+    """前 failures 次调用抛出 exc，之后成功，记录每次调用的收件人"""
+
+    def __init__(self, failures: int = 0, exc: Exception = None):
+        self.failures = failures
+        self.exc = exc or smtplib.SMTPResponseException(451, b"try again later")
+        self.calls = []
+
+    def __call__(self, recipient, subject, body, key):
+        self.calls.append(recipient)
+        if len(self.calls) <= self.failures:
+            raise self.exc
+
+
+def _row(outbox: Outbox, column: str):
+    return db.pool.query_one(outbox.path, f"SELECT {column} FROM outbox")[0]
+
+
+def _make_due(outbox: Outbox):
+    """跳过退避等待"""
+    db.pool.execute(outbox.path, "UPDATE outbox SET next_attempt_at = 0")
+
+
+def test_enqueue_is_idempotent():
+    outbox = _outbox()
+    assert outbox.enqueue("a@example.com", "主题", "内容")
+    assert not outbox.enqueue("a@example.com", "主题", "内容")
+    assert outbox.enqueue("a@example.com", "主题", "内容", idempotency_key="welcome:a")
+    assert not outbox.enqueue("a@example.com", "另一个主题", "另一段内容", idempotency_key="welcome:a")
+    assert outbox.status_counts() == {PENDING: 2}
+
+
+def test_transient_failure_retried_then_sent():
+    outbox = _outbox()
+    outbox.enqueue("a@example.com", "主题", "内容")
+    send = FlakySender(failures=1)
+    worker = OutboxWorker(outbox, send=send, backoff_base=0.01, backoff_max=0.01)
+    assert worker.process_batch() == 1
+    assert outbox.status_counts() == {PENDING: 1}
+    assert "451" in _row(outbox, "last_error")
+    _make_due(outbox)
+    assert worker.process_batch() == 1
+    assert outbox.status_counts() == {SENT: 1}
+    assert _row(outbox, "attempts") == 2 and len(send.calls) == 2
+
+
+def test_retries_exhausted_marks_failed():
+    outbox = _outbox()
+    outbox.enqueue("a@example.com", "主题", "内容")
+    worker = OutboxWorker(outbox, send=FlakySender(failures=10), max_attempts=3, backoff_base=0.01, backoff_max=0.01)
+    for _ in range(3):
+        _make_due(outbox)
+        worker.process_batch()
+    assert outbox.status_counts() == {FAILED: 1}
+    assert _row(outbox, "attempts") == 3
+    # 已失败的邮件不会再被认领
+    _make_due(outbox)
+    assert worker.process_batch() == 0
+
+
+def test_permanent_failure_not_retried():
+    outbox = _outbox()
+    outbox.enqueue("a@example.com", "主题", "内容")
+    send = FlakySender(failures=1, exc=smtplib.SMTPResponseException(550, b"mailbox unavailable"))
+    OutboxWorker(outbox, send=send).process_batch()
+    assert outbox.status_counts() == {FAILED: 1}
+    assert len(send.calls) == 1
+
+
+def test_expired_lease_reclaimed():
+    outbox = _outbox()
+    outbox.enqueue("a@example.com", "主题", "内容")
+    # 模拟进程在认领后、标记完成前崩溃
+    assert len(outbox.claim(10, lease=0.05)) == 1
+    assert outbox.status_counts() == {SENDING: 1}
+    assert outbox.claim(10, lease=0.05) == []
+    time.sleep(0.1)
+    send = FlakySender()
+    assert OutboxWorker(outbox, send=send).process_batch() == 1
+    assert outbox.status_counts() == {SENT: 1}
+    assert _row(outbox, "attempts") == 2 and send.calls == ["a@example.com"]
+
+
+def test_enqueue_wakes_worker():
+    outbox = _outbox()
+    send = FlakySender()
+    worker = OutboxWorker(outbox, send=send, poll_interval=10).start()
+    try:
+        time.sleep(0.05)
+        outbox.enqueue("a@example.com", "主题", "内容")
+        deadline = time.monotonic() + 2
+        while outbox.pending_count() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        # 不必等到 10 秒后的下一次轮询
+        assert outbox.status_counts() == {SENT: 1}
+    finally:
+        worker.stop()
+    assert outbox._listeners == []
+
+
+def test_stop_drains_pending_mail():
+    outbox = _outbox()
+    for i in range(20):
+        outbox.enqueue(f"user{i}@example.com", "主题", "内容")
+    send = FlakySender()
+    worker = OutboxWorker(outbox, send=send, batch_size=5, poll_interval=10).start()
+    worker.stop(drain_timeout=5)
+    assert outbox.pending_count() == 0
+    assert outbox.status_counts() == {SENT: 20}
+    assert not worker._thread.is_alive()
+
+
+def test_stop_without_drain_leaves_mail_pending():
+    outbox = _outbox()
+    worker = OutboxWorker(outbox, send=FlakySender(), poll_interval=10).start()
+    worker.stop()
+    outbox.enqueue("a@example.com", "主题", "内容")
+    assert not worker._thread.is_alive()
+    assert outbox.status_counts() == {PENDING: 1}
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
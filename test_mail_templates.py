@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+测试预编译邮件模板
+
+验证 mail_templates 的模板渲染与原来的 f-string 拼接结果相同，MessageFactory 生成的邮件解析后
+（包括很长的中文主题、收件人姓名与 ASCII 主题）与原来用 MIMEText 构建的邮件一致，
+并且折行后的头部只使用 CRLF 换行、每行不超过 78 个字符。可以直接运行，也可以用 pytest 执行。
+"""
+
+import email
+import os
+import sys
+from email import policy
+from email.header import decode_header, make_header
+from email.mime.text import MIMEText
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+from mail_templates import (RECOMMEND_EMAIL, RECOMMEND_ITEM, WELCOME_EMAIL, MessageFactory, Template,
+                            compile_template, render_lines)
+
+SENDER = "sender@example.com"
+RECOMMEND_DATA = [(1, "推荐你去尝试一下这个项目", "项目的详细介绍"), (2, "Item|2", "多行\n内容")]
+
+
+def _legacy_body(name: str, random_number: int) -> str:
+    content = f"亲爱的{name}：\n\n您好！这是一封包含随机数和推荐信息的邮件。\n\n随机数：{random_number}\n\n推荐信息：\n"
+    for item in RECOMMEND_DATA:
+        content += f"- {item[1]}: {item[2]}\n"
+    content += "\n如有任何问题，请随时联系我们。\n\n祝好！\n我们的团队"
+    return content
+
+
+def _legacy_message(sender: str, recipient: str, subject: str, body: str) -> bytes:
+    msg = MIMEText(body, 'plain', 'utf-8')
+    msg['From'] = sender
+    msg['To'] = recipient
+    msg['Subject'] = subject
+    return msg.as_string().encode("ascii")
+
+
+def _parsed(raw: bytes) -> tuple:
+    """解码后的发件人、收件人、主题与正文"""
+    msg = email.message_from_bytes(raw)
+    # 先去掉折行的换行符（续行开头的空白保留），再解码 RFC 2047 编码
+    headers = tuple(str(make_header(decode_header(msg[name].replace('\r\n', '').replace('\n', ''))))
+                    for name in ('From', 'To', 'Subject'))
+    return headers + (msg.get_payload(decode=True).decode('utf-8'),)
+
+
+def test_recommend_email_matches_legacy_concatenation():
+    recommendations = render_lines(RECOMMEND_ITEM, ({'name': item[1], 'content': item[2]} for item in RECOMMEND_DATA))
+    body = compile_template(RECOMMEND_EMAIL).render(name="张三", random_number=42, recommendations=recommendations)
+    assert body == _legacy_body("张三", 42)
+    assert WELCOME_EMAIL.format(name="李四") == compile_template(WELCOME_EMAIL).render(name="李四")
+
+
+def test_template_render_variants():
+    template = Template("{name}：{score:.1f}")
+    assert template.render({'name': "a"}, score=1) == "a：1.0"
+    parts = []
+    template.render_to(parts.append, name="b", score=2.25)
+    assert "".join(parts) == "b：2.2"
+    assert list(template.render_many([{'name': "c"}, {'name': "d"}], shared={'score': 0})) == ["c：0.0", "d：0.0"]
+    assert compile_template("{x}") is compile_template("{x}")
+    with pytest.raises(ValueError):
+        Template("{user.name}")
+
+
+@pytest.mark.parametrize("recipient, subject", [
+    ("user@example.com", "欢迎加入我们的平台"),
+    ("user@example.com", "随机数与推荐信息" * 12),
+    ("张三丰" * 15 + " <zhang@example.com>", "DT: - 主题"),
+    ("user@example.com", "A plain ASCII subject that is long enough to need folding " * 3),
+])
+def test_message_matches_mimetext(recipient, subject):
+    body = _legacy_body("张三", 7)
+    raw = MessageFactory(SENDER, subject).build(recipient, body)
+    assert _parsed(raw) == _parsed(_legacy_message(SENDER, recipient, subject, body))
+    head = raw.split(b"\r\n\r\n", 1)[0]
+    # 折行只使用 CRLF，不会出现单独的 LF
+    assert b"\n" not in head.replace(b"\r\n", b"")
+    assert all(len(line) <= 78 for line in head.split(b"\r\n"))
+    # 收件人只编码显示名，邮箱地址仍可被解析
+    [address] = email.message_from_bytes(raw, policy=policy.default)['To'].addresses
+    assert address.addr_spec == recipient.rsplit("<", 1)[-1].rstrip(">")
+
+
+def test_message_id_header():
+    raw = MessageFactory(SENDER, "主题").build("a@example.com", "内容", "<abc@outbox>")
+    assert email.message_from_bytes(raw, policy=policy.default)['Message-ID'] == "<abc@outbox>"
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func) and not hasattr(func, "pytestmark"):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+"""
+测试 Ollama 模型预热与常驻
+
+在本地替身 Ollama 服务上验证 ollama_warmup 的预热报告区分加载与推理耗时，
+后台续期能阻止模型在空闲期间被卸载，prepare_model 在预热失败时不启动续期线程、
+预热请求的 keep_alive 在续期线程停止后仍让模型保持加载，以及 ChatOllama 的请求带上 keep_alive。可以直接运行，也可以用 pytest 执行。
+"""
+
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_ollama import ChatOllama
+
+from fake_servers import FakeOllamaServer
+import ollama_warmup
+from ollama_warmup import KeepAlive, prepare_model, stop_keep_alive, warm_up
+
+MODEL = "qwen2:latest"
+
+
+def test_warm_up_separates_load_and_inference():
+    with FakeOllamaServer(load_delay=0.2, inference_delay=0.02) as server:
+        cold = warm_up(MODEL, server.base_url)
+        warm = warm_up(MODEL, server.base_url)
+    assert cold.load_ms >= 150 and cold.inference_ms >= 15
+    assert warm.load_ms == 0
+    assert server.stats['loads'] == 1
+
+
+def test_keep_alive_prevents_eviction():
+    with FakeOllamaServer(load_delay=0.05) as server:
+        keep_alive = KeepAlive(MODEL, server.base_url, keep_alive=0.3, interval=0.1).start()
+        keep_alive.ping()
+        time.sleep(0.8)
+        assert server.is_loaded(MODEL)
+        keep_alive.stop()
+        time.sleep(0.4)
+        assert not server.is_loaded(MODEL)
+    assert server.stats['loads'] == 1
+    assert keep_alive.stats['pings'] >= 5 and keep_alive.stats['reloads'] == 0
+
+
+def test_keep_alive_reports_reload_after_eviction():
+    with FakeOllamaServer(load_delay=0.1) as server:
+        keep_alive = KeepAlive(MODEL, server.base_url)
+        keep_alive.ping()
+        server.evict()
+        keep_alive.ping()
+    assert keep_alive.stats['reloads'] == 2
+
+
+def test_prepare_model_skips_keep_alive_when_warm_up_fails():
+    with FakeOllamaServer() as server:
+        base_url = server.base_url
+    # 服务已关闭，预热失败时不启动续期线程
+    assert prepare_model(MODEL, base_url, interval=0.05) is None
+    assert ollama_warmup._keep_alives == {}
+
+
+def test_warm_up_keep_alive_outlives_thread():
+    with FakeOllamaServer(load_delay=0.0) as server:
+        report = prepare_model(MODEL, server.base_url, keep_alive=-1, interval=0.05)
+        assert report is not None and len(ollama_warmup._keep_alives) == 1
+        stop_keep_alive()
+        # 续期线程已停止（相当于进程退出），模型仍由服务端的 keep_alive 保持加载
+        time.sleep(0.1)
+        assert server.is_loaded(MODEL)
+        assert prepare_model(MODEL, server.base_url, keep_alive=-1, interval=None).load_ms == 0
+        assert ollama_warmup._keep_alives == {}
+    assert server.stats['loads'] == 1 and set(server.keep_alive_requests) == {-1}
+
+
+def test_chat_requests_pin_keep_alive():
+    with FakeOllamaServer(load_delay=0.0) as server:
+        model = ChatOllama(model=MODEL, base_url=server.base_url, keep_alive="30m", temperature=0)
+        assert model.invoke("你好").content == server.reply
+    assert server.keep_alive_requests == ["30m"]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+测试订单批量处理
+
+验证 order_bulk.process_orders / aprocess_orders 按输入顺序返回每个订单的最终状态，
+按结束节点汇总数量，并且单个订单出错不影响其他订单。可以直接运行，也可以用 pytest 执行。
+"""
+
+import asyncio
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import inventory
+from inventory import InventoryStore, StockCache
+from order_bulk import aprocess_orders, process_orders
+
+# 数量 2：物流分配；数量 3：支付失败；数量 11：库存不足
+ORDERS = [{"order_id": f"o{i}", "product_id": "item_001", "quantity": q} for i, q in enumerate([2, 3, 11, 4, 0])]
+EXPECTED = {"assign_logistics": 2, "handle_payment_failure": 1, "inventory_alert": 2}
+
+
+@contextmanager
+def _fresh_inventory(stock: int = 10):
+    """在临时库存中执行，item_001 初始库存为 stock，结束后恢复原来的库存"""
+    path = os.path.join(tempfile.mkdtemp(), "inventory.db")
+    previous = inventory.set_inventory(StockCache(InventoryStore(path, {"item_001": stock})))
+    try:
+        yield
+    finally:
+        inventory.set_inventory(previous)
+
+
+def test_process_orders_counts_terminal_nodes():
+    with _fresh_inventory():
+        result = process_orders(iter(ORDERS), concurrency=4, chunk_size=2)
+    assert dict(result.counts) == EXPECTED
+    assert [state['order_id'] for state in result.states] == [o['order_id'] for o in ORDERS]
+    assert result.states[0]['logistics_assigned'] and not result.states[1]['payment_success']
+    assert result.processed == 5 and result.failures == []
+
+
+def test_aprocess_orders_accepts_async_iterator():
+    async def source():
+        for order in ORDERS:
+            yield order
+
+    with _fresh_inventory():
+        result = asyncio.run(aprocess_orders(source(), concurrency=4, chunk_size=3))
+    assert dict(result.counts) == EXPECTED
+
+
+def test_failed_order_isolated():
+    orders = ORDERS + [{"order_id": "bad", "product_id": "item_001", "quantity": "x"}]
+    with _fresh_inventory():
+        result = process_orders(orders)
+    assert result.processed == 5
+    assert result.states[-1] is None
+    assert result.failures[0][0] == "bad"
+
+
+def test_stock_decremented_and_released():
+    with _fresh_inventory():
+        process_orders(ORDERS)
+        # 两个物流分配的订单共占用 6 件，支付失败的订单已释放
+        assert inventory.get_inventory().available("item_001") == 4
+        result = process_orders([{"order_id": "late", "product_id": "item_001", "quantity": 6}])
+    assert dict(result.counts) == {"inventory_alert": 1}
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+测试订单流式导入
+
+验证 order_ingest 逐行解析 JSONL/CSV、把坏行记为失败而不中断导入、结果按输入顺序写出，
+并且同时在途的订单数不超过 window。用替身图隔离 langgraph，可以直接运行，也可以用 pytest 执行。
+"""
+
+import io
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from order_ingest import OrderParseError, ingest, process_stream, read_orders
+
+
+class FakeGraph:
+    """按 order_flow 的规则给出最终状态（不检查库存），并记录同时执行的订单数"""
+
+    def __init__(self, delay: float = 0.001):
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def invoke(self, state):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+        if state['order_id'] == "boom":
+            raise RuntimeError("处理失败")
+        ok = state['quantity'] > 0
+        paid = ok and state['quantity'] % 2 == 0
+        return {**state, "is_valid": ok, "inventory_sufficient": ok, "payment_success": paid,
+                "logistics_assigned": paid, "message": "已分配物流。" if paid else "支付失败已处理。"}
+
+
+def test_read_jsonl_and_csv():
+    jsonl = io.StringIO('{"order_id": "a", "product_id": "item_001", "quantity": 2}\n\nnot json\n'
+                        '{"order_id": "b", "product_id": "item_001"}\n')
+    records = list(read_orders(jsonl, "jsonl"))
+    assert records[0] == (1, {"order_id": "a", "product_id": "item_001", "quantity": 2})
+    assert [line for line, _ in records] == [1, 3, 4]
+    assert all(isinstance(order, OrderParseError) for _, order in records[1:])
+
+    csv_text = io.StringIO("order_id,product_id,quantity\nc,item_001,3\nd,item_001,x\n")
+    records = list(read_orders(csv_text, "csv"))
+    assert records[0] == (2, {"order_id": "c", "product_id": "item_001", "quantity": 3})
+    assert isinstance(records[1][1], OrderParseError)
+
+
+def test_quantity_must_be_integer():
+    lines = [{"order_id": "a", "product_id": "item_001", "quantity": q} for q in (2.9, True, "3", 2.0, -1)]
+    records = list(read_orders(io.StringIO("".join(json.dumps(r) + "\n" for r in lines)), "jsonl"))
+    assert [isinstance(order, OrderParseError) for _, order in records] == [True, True, True, True, False]
+    assert records[-1][1]["quantity"] == -1
+
+    csv_text = io.StringIO("order_id,product_id,quantity\na,item_001,2.9\nb,item_001,true\nc,item_001,1e3\n"
+                           "d,item_001, 4 \n")
+    records = list(read_orders(csv_text, "csv"))
+    assert [isinstance(order, OrderParseError) for _, order in records] == [True, True, True, False]
+    assert records[-1][1]["quantity"] == 4
+
+
+def test_results_in_order_with_bounded_window():
+    graph = FakeGraph()
+    consumed = []
+
+    def source():
+        for i in range(200):
+            consumed.append(i)
+            yield i + 1, {"order_id": "boom" if i == 7 else f"o{i}", "product_id": "item_001", "quantity": i % 5}
+
+    results = []
+    for result in process_stream(source(), graph=graph, window=16, concurrency=4):
+        # 已读取但尚未写出的订单不超过 window
+        assert len(consumed) - len(results) <= 16
+        results.append(result)
+    assert [r.get("order_id") for r in results] == ["boom" if i == 7 else f"o{i}" for i in range(200)]
+    assert results[7]["error"].startswith("RuntimeError")
+    assert results[2]["terminal"] == "assign_logistics" and results[3]["terminal"] == "handle_payment_failure"
+    assert graph.max_active <= 4
+
+
+def test_ingest_file_to_jsonl():
+    tmp = tempfile.mkdtemp()
+    source, target = os.path.join(tmp, "orders.csv"), os.path.join(tmp, "results.jsonl")
+    with open(source, "w", encoding="utf-8") as f:
+        f.write("order_id,product_id,quantity\n")
+        for i in range(50):
+            f.write(f"o{i},item_001,{i % 4}\n")
+        f.write("bad,item_001,\n")
+    stats = ingest(source, target, graph=FakeGraph(delay=0), window=8, concurrency=2)
+    with open(target, encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    assert len(lines) == 51 and stats.processed == 50 and stats.failed == 1
+    assert lines[-1] == {"line": 52, "order_id": None, "error": "缺少字段：quantity"}
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+测试订单节点的增量返回与紧凑状态
+
+验证 order_flow 的各节点只返回自己修改的字段、不修改传入的状态，CompactOrderState 可以被同一组节点读取，
+并且以 CompactOrderState 为状态类型构建的图与 OrderState 的结果相同。可以直接运行，也可以用 pytest 执行。
+"""
+
+import os
+import sys
+import tempfile
+from contextlib import contextmanager
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import inventory
+import order_flow
+from inventory import InventoryStore, StockCache
+from order_flow import CompactOrderState, build_graph, new_order_state
+
+
+@contextmanager
+def _fresh_inventory():
+    """在临时库存中执行，结束后恢复原来的库存"""
+    path = os.path.join(tempfile.mkdtemp(), "inventory.db")
+    previous = inventory.set_inventory(StockCache(InventoryStore(path, {"item_001": 10})))
+    try:
+        yield
+    finally:
+        inventory.set_inventory(previous)
+
+
+def test_nodes_return_only_changed_keys():
+    state = new_order_state({"order_id": "o1", "product_id": "item_001", "quantity": 2})
+    snapshot = dict(state)
+    assert order_flow.receive_order(state) == {"is_valid": True, "message": "订单 o1 验证通过。"}
+    assert state == snapshot
+    state.update(is_valid=True)
+    with _fresh_inventory():
+        assert order_flow.check_inventory(state) == {"inventory_sufficient": True, "message": "库存充足。"}
+    state.update(inventory_sufficient=True)
+    assert order_flow.process_payment(state) == {"payment_success": True, "message": "支付成功。"}
+    assert order_flow.inventory_alert(state) == {"message": "已触发库存预警。"}
+
+
+def test_compact_state_readable_by_nodes():
+    order = {"order_id": "o2", "product_id": "".join(("item_", "001")), "quantity": 0}
+    state = CompactOrderState.from_order(order)
+    assert not hasattr(state, "__dict__")
+    assert state["quantity"] == 0 and state.message == ""
+    assert state.product_id is CompactOrderState.from_order(dict(order)).product_id
+    assert order_flow.receive_order(state) == {"is_valid": False, "message": "订单数量无效。"}
+
+
+def test_compact_graph_matches_typed_dict_graph():
+    orders = [{"order_id": f"o{i}", "product_id": "item_001", "quantity": q} for i, q in enumerate([2, 3, 11, 0])]
+    results = []
+    for schema in (order_flow.OrderState, CompactOrderState):
+        graph = build_graph(schema)
+        with _fresh_inventory():
+            results.append([dict(graph.invoke(new_order_state(order))) for order in orders])
+    assert results[0] == results[1]
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""
+测试工具调用计划缓存
+
+在临时数据库上验证 plan_cache.PlanCache：记录后按规范化的指令回放相同的工具调用（id 重新生成）、
+只在对话第一步使用、TTL 过期与工具集或模型变化时不再命中，以及回放的计划执行出错后被删除。
+可以直接运行，也可以用 pytest 执行。
+"""
+
+import os
+import sys
+import tempfile
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, ToolMessage
+from langchain_core.tools import tool
+
+from plan_cache import PLAN_CACHE_METADATA_KEY, PlanCache
+
+MODEL = "qwen2.5:7b"
+
+
+@tool
+def get_weekday():
+    """获取今天是星期几"""
+    return "星期一"
+
+
+@tool
+def get_number(low: int, high: int):
+    """生成随机数"""
+    return low
+
+
+@tool
+def get_number_v2(low: int, high: int, seed: int):
+    """生成随机数"""
+    return low
+
+
+TOOLS = [get_weekday, get_number]
+INSTRUCTION = [SystemMessage(content="你是一个助手"), HumanMessage(content="获取星期和 1 到 100 的随机数")]
+PLAN = AIMessage(content="", tool_calls=[
+    {'name': 'get_weekday', 'args': {}, 'id': 'call_1'},
+    {'name': 'get_number', 'args': {'low': 1, 'high': 100}, 'id': 'call_2'},
+])
+
+
+def _cache(ttl: float = 3600) -> PlanCache:
+    return PlanCache(os.path.join(tempfile.mkdtemp(), "plan_cache.db"), ttl=ttl)
+
+
+def test_replays_recorded_plan_with_new_ids():
+    cache = _cache()
+    assert cache.replay(INSTRUCTION, TOOLS, MODEL) is None
+    cache.record(INSTRUCTION, TOOLS, MODEL, PLAN)
+    # 全角字符与多余空白规范化后是同一条指令
+    variant = [SystemMessage(content="你是一个助手 "), HumanMessage(content="获取星期和　１ 到 100  的随机数")]
+    replayed = cache.replay(variant, TOOLS, MODEL)
+    assert [(c['name'], c['args']) for c in replayed.tool_calls] == [(c['name'], c['args']) for c in PLAN.tool_calls]
+    assert not {c['id'] for c in replayed.tool_calls} & {'call_1', 'call_2'}
+    assert replayed.response_metadata[PLAN_CACHE_METADATA_KEY] == cache.key(INSTRUCTION, TOOLS, MODEL)
+    assert cache.stats() == {'hits': 1, 'misses': 1, 'llm_calls_avoided': 1, 'total_llm_calls_avoided': 1}
+
+
+def test_only_first_step_is_cached():
+    cache = _cache()
+    later = INSTRUCTION + [PLAN, ToolMessage(content="星期一", tool_call_id="call_1")]
+    cache.record(later, TOOLS, MODEL, PLAN)
+    cache.record(INSTRUCTION, TOOLS, MODEL, AIMessage(content="直接回答"))
+    assert cache.replay(INSTRUCTION, TOOLS, MODEL) is None
+    cache.record(INSTRUCTION, TOOLS, MODEL, PLAN)
+    assert cache.replay(later, TOOLS, MODEL) is None
+    assert cache.replay(INSTRUCTION, TOOLS, MODEL) is not None
+
+
+def test_ttl_expiry():
+    cache = _cache(ttl=0.05)
+    cache.record(INSTRUCTION, TOOLS, MODEL, PLAN)
+    assert cache.replay(INSTRUCTION, TOOLS, MODEL) is not None
+    time.sleep(0.1)
+    assert cache.replay(INSTRUCTION, TOOLS, MODEL) is None
+
+
+def test_tool_or_model_change_misses():
+    cache = _cache()
+    cache.record(INSTRUCTION, TOOLS, MODEL, PLAN)
+    assert cache.replay(INSTRUCTION, [get_weekday, get_number_v2], MODEL) is None
+    assert cache.replay(INSTRUCTION, TOOLS, "llama3:8b") is None
+    assert cache.replay(INSTRUCTION, TOOLS, MODEL) is not None
+
+
+def test_failed_replay_invalidates_plan():
+    cache = _cache()
+    cache.record(INSTRUCTION, TOOLS, MODEL, PLAN)
+    replayed = cache.replay(INSTRUCTION, TOOLS, MODEL)
+    ok = [ToolMessage(content="星期一", tool_call_id=c['id']) for c in replayed.tool_calls]
+    cache.check_replay(INSTRUCTION + [replayed] + ok)
+    assert cache.replay(INSTRUCTION, TOOLS, MODEL) is not None
+
+    replayed = cache.replay(INSTRUCTION, TOOLS, MODEL)
+    failed = [ok[0], ToolMessage(content="Error: boom", tool_call_id=replayed.tool_calls[1]['id'], status='error')]
+    cache.check_replay(INSTRUCTION + [replayed] + failed)
+    assert cache.replay(INSTRUCTION, TOOLS, MODEL) is None
+
+
+def test_errors_after_live_llm_plan_ignored():
+    cache = _cache()
+    cache.record(INSTRUCTION, TOOLS, MODEL, PLAN)
+    # 模型实时给出的计划没有缓存键，执行出错不影响已缓存的计划
+    cache.check_replay(INSTRUCTION + [PLAN, ToolMessage(content="Error", tool_call_id="call_1", status='error')])
+    assert cache.replay(INSTRUCTION, TOOLS, MODEL) is not None
+    cache.invalidate()
+    assert cache.replay(INSTRUCTION, TOOLS, MODEL) is None
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+测试 SMTP 连接池
+
+在本地替身 SMTP 服务器上验证 smtp_pool.SMTPPool 的连接复用、NOOP 健康检查与断线重连、
+多线程并发发送时统计计数准确，以及三条发送路径都走共享连接池。可以直接运行，也可以用 pytest 执行。
+"""
+
+import os
+import smtplib
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from email.mime.text import MIMEText
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import smtp_pool
+from fake_servers import FakeSMTPServer
+from smtp_pool import SMTPPool
+
+
+def _message(to: str) -> MIMEText:
+    msg = MIMEText("测试内容", 'plain')
+    msg['From'] = "sender@example.com"
+    msg['To'] = to
+    msg['Subject'] = "测试"
+    return msg
+
+
+def test_connection_reused_across_messages():
+    with FakeSMTPServer() as server:
+        pool = SMTPPool(server.host, server.port, "sender@example.com", "secret", size=2)
+        for i in range(5):
+            pool.send_message(_message(f"user{i}@example.com"))
+        pool.close()
+    assert server.stats['messages'] == 5
+    assert server.stats['connections'] == 1
+    assert server.stats['logins'] == 1
+
+
+def test_idle_connection_health_checked_with_noop():
+    with FakeSMTPServer() as server:
+        pool = SMTPPool(server.host, server.port, "sender@example.com", "secret", health_check_interval=0)
+        pool.send_message(_message("a@example.com"))
+        pool.send_message(_message("b@example.com"))
+        pool.close()
+    assert server.stats['noops'] == 1
+    assert server.stats['connections'] == 1
+
+
+def test_reconnects_after_server_drop():
+    with FakeSMTPServer() as server:
+        # 不做健康检查，掉线只能在发送时发现
+        pool = SMTPPool(server.host, server.port, "sender@example.com", "secret")
+        pool.send_message(_message("a@example.com"))
+        server.drop_connections()
+        pool.send_message(_message("b@example.com"))
+        pool.close()
+    assert server.stats['messages'] == 2
+    assert server.stats['connections'] == 2
+    assert pool.stats['reconnects'] == 1
+
+
+def test_connection_kept_after_rejected_message():
+    with FakeSMTPServer() as server:
+        server.mail_replies = ["451 try again later"]
+        pool = SMTPPool(server.host, server.port, "sender@example.com", "secret", size=1)
+        try:
+            pool.send_message(_message("a@example.com"))
+        except smtplib.SMTPSenderRefused:
+            pass
+        pool.send_message(_message("b@example.com"))
+        pool.close()
+    assert server.stats['messages'] == 1
+    assert server.stats['connections'] == 1
+
+
+def test_stats_counted_across_threads():
+    with FakeSMTPServer() as server:
+        pool = SMTPPool(server.host, server.port, "sender@example.com", "secret", size=4)
+        with ThreadPoolExecutor(8) as executor:
+            list(executor.map(lambda i: pool.send_message(_message(f"user{i}@example.com")), range(200)))
+        pool.close()
+    assert pool.stats['sent'] == server.stats['messages'] == 200
+    assert pool.stats['connects'] + pool.stats['reuses'] == 200
+
+
+def test_send_paths_share_default_pool():
+    with FakeSMTPServer() as server:
+        env = {"SMTP_SERVER": server.host, "SMTP_PORT": str(server.port),
+               "EMAIL_SENDER": "sender@example.com", "EMAIL_PASSWORD": "secret"}
+        saved = {key: os.environ.get(key) for key in env}
+        os.environ.update(env)
+        smtp_pool.close_pool()
+        try:
+            import email_tool
+            import email_workflow
+            import mail_outbox
+            mail_outbox.send_outbox_message("a@example.com", "主题", "内容", "k" * 64)
+            email_workflow._send_welcome_email_impl("b@example.com", "B")
+            email_tool.send_email("c@example.com", "主题", "内容")
+        finally:
+            smtp_pool.close_pool()
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+    assert server.stats['messages'] == 3
+    assert server.stats['logins'] == 1
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
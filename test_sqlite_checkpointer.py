@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+"""
+测试 SQLite checkpointer
+
+验证 sqlite_checkpointer.SQLiteSaver 的状态持久化（重新打开数据库后可恢复）、
+每个线程只保留最近 keep_last 个 checkpoint、异步写入时不在事件循环线程上提交，以及空闲线程的清理。可以直接运行，也可以用 pytest 执行。
+"""
+
+import asyncio
+import operator
+import os
+import sys
+import tempfile
+import threading
+from typing import Annotated, List, TypedDict
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.messages import AIMessage, HumanMessage
+from langgraph.checkpoint.memory import InMemorySaver
+from langgraph.graph import END, StateGraph, MessagesState
+
+from sqlite_checkpointer import SQLiteSaver
+
+
+def _build_app(checkpointer):
+    workflow = StateGraph(MessagesState)
+    # 内容足够长，会被压缩存储
+    workflow.add_node("agent", lambda state: {"messages": [AIMessage(content="回复" * 1000)]})
+    workflow.set_entry_point("agent")
+    workflow.add_edge("agent", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def _run(app, thread_id, text):
+    return app.invoke({"messages": [HumanMessage(content=text)]}, {"configurable": {"thread_id": thread_id}})
+
+
+def test_state_survives_reopen():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "checkpoints.db")
+        with SQLiteSaver(path, batch_size=1000) as saver:
+            _run(_build_app(saver), 42, "第一次")
+        with SQLiteSaver(path) as saver:
+            app = _build_app(saver)
+            assert len(app.get_state({"configurable": {"thread_id": 42}}).values["messages"]) == 2
+            result = _run(app, 42, "第二次")
+    assert [m.content for m in result["messages"]][::2] == ["第一次", "第二次"]
+
+
+def test_keeps_last_checkpoints_per_thread():
+    with tempfile.TemporaryDirectory() as tmp:
+        with SQLiteSaver(os.path.join(tmp, "checkpoints.db"), keep_last=2, batch_size=1) as saver:
+            app = _build_app(saver)
+            for i in range(5):
+                _run(app, 1, f"第{i}次")
+            _run(app, 2, "其他线程")
+            history = list(saver.list({"configurable": {"thread_id": 1}}))
+            assert len(history) == 2
+            assert len(history[0].checkpoint["channel_values"]["messages"]) == 10
+            assert len(list(saver.list({"configurable": {"thread_id": 2}}))) == 2
+            # 只保留仍被引用的 channel 值
+            blobs = saver._conn.execute("SELECT count(*) FROM blobs WHERE thread_id = '1'").fetchone()[0]
+            assert blobs <= 2 * len(history[0].checkpoint["channel_versions"])
+
+
+class _ListState(TypedDict):
+    items: Annotated[List[int], operator.add]
+    other: int
+
+
+def _build_list_app(checkpointer):
+    workflow = StateGraph(_ListState)
+    workflow.add_node("append", lambda state: {"items": [len(state["items"])]})
+    workflow.add_node("count", lambda state: {"other": len(state["items"])})
+    workflow.set_entry_point("append")
+    workflow.add_edge("append", "count")
+    workflow.add_edge("count", END)
+    return workflow.compile(checkpointer=checkpointer)
+
+
+def test_matches_in_memory_saver_across_batch_sizes():
+    """批次在 put 中途达到 batch_size 时，保留策略不能删除仍被引用的 channel 值"""
+    config = {"configurable": {"thread_id": 1}}
+    expected = _build_list_app(InMemorySaver())
+    for _ in range(12):
+        expected.invoke({"items": [], "other": 0}, config)
+    expected = expected.get_state(config).values
+    for batch_size in (1, 2, 3, 5, 7, 64):
+        with tempfile.TemporaryDirectory() as tmp:
+            with SQLiteSaver(os.path.join(tmp, "checkpoints.db"), keep_last=2, batch_size=batch_size,
+                             flush_interval=3600) as saver:
+                app = _build_list_app(saver)
+                for step in range(12):
+                    app.invoke({"items": [], "other": 0}, config)
+                    saver.flush()
+                    assert len(app.get_state(config).values["items"]) == step + 1, batch_size
+                assert app.get_state(config).values == expected, batch_size
+
+
+def test_async_writes_flush_off_event_loop():
+    with tempfile.TemporaryDirectory() as tmp:
+        with SQLiteSaver(os.path.join(tmp, "checkpoints.db"), batch_size=1) as saver:
+            flush_threads = []
+            flush = saver._flush
+
+            def recording_flush():
+                flush_threads.append(threading.current_thread())
+                flush()
+
+            saver._flush = recording_flush
+            app = _build_app(saver)
+            config = {"configurable": {"thread_id": 1}}
+            result = asyncio.run(app.ainvoke({"messages": [HumanMessage(content="你好")]}, config))
+            assert flush_threads and threading.main_thread() not in flush_threads
+            assert saver.get_tuple(config).checkpoint["channel_values"]["messages"] == result["messages"]
+
+
+def test_evicts_idle_threads():
+    with tempfile.TemporaryDirectory() as tmp:
+        with SQLiteSaver(os.path.join(tmp, "checkpoints.db")) as saver:
+            app = _build_app(saver)
+            _run(app, 1, "你好")
+            assert saver.evict_idle_threads(3600) == 0
+            assert saver.evict_idle_threads(0) == 1
+            assert saver.get_tuple({"configurable": {"thread_id": 1}}) is None
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+测试按 token 流式输出
+
+用逐字输出的替身模型驱动一个小型图，验证 token_stream.stream_tokens 实时转发 agent 节点的 token、
+与其他节点的输出交错显示，并给出每个 agent 步骤的首 token 耗时与生成速度。可以直接运行，也可以用 pytest 执行。
+"""
+
+import os
+import sys
+import time
+from typing import Iterator, List
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, HumanMessage, ToolMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langgraph.graph import END, StateGraph, MessagesState
+
+from token_stream import stream_tokens
+
+
+class StreamingFakeModel(BaseChatModel):
+    """依次返回预设的回复；文本按字符流式输出，工具调用在一个分片中给出"""
+    replies: List[AIMessage]
+    delay: float = 0.01
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "streaming-fake"
+
+    def _next(self) -> AIMessage:
+        reply = self.replies[self.calls]
+        self.calls += 1
+        return reply
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        return ChatResult(generations=[ChatGeneration(message=self._next())])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        reply = self._next()
+        time.sleep(self.delay)
+        if reply.tool_calls:
+            chunks = [AIMessageChunk(content='', tool_call_chunks=[
+                {'name': c['name'], 'args': '{}', 'id': c['id'], 'index': i} for i, c in enumerate(reply.tool_calls)])]
+        else:
+            chunks = [AIMessageChunk(content=ch) for ch in reply.content]
+        chunks[-1].usage_metadata = {'input_tokens': 10, 'output_tokens': len(chunks),
+                                     'total_tokens': 10 + len(chunks)}
+        for chunk in chunks:
+            time.sleep(self.delay / 10)
+            yield ChatGenerationChunk(message=chunk)
+
+
+def _build_app(model):
+    def agent(state: MessagesState):
+        return {"messages": [model.invoke(state['messages'])]}
+
+    def tools(state: MessagesState):
+        call = state['messages'][-1].tool_calls[0]
+        return {"messages": [ToolMessage(content="星期三", name=call['name'], tool_call_id=call['id'])]}
+
+    def route(state: MessagesState):
+        return "tools" if state['messages'][-1].tool_calls else END
+
+    workflow = StateGraph(MessagesState)
+    workflow.add_node("agent", agent)
+    workflow.add_node("tools", tools)
+    workflow.set_entry_point("agent")
+    workflow.add_conditional_edges("agent", route)
+    workflow.add_edge("tools", "agent")
+    return workflow.compile()
+
+
+def test_tokens_interleaved_with_node_updates():
+    model = StreamingFakeModel(replies=[
+        AIMessage(content='', tool_calls=[{'name': 'get_current_weekday', 'args': {}, 'id': 'c1'}]),
+        AIMessage(content="今天是星期三"),
+    ])
+    output = []
+    steps = stream_tokens(_build_app(model), {"messages": [HumanMessage(content="今天星期几")]}, None,
+                          write=output.append)
+    text = "".join(output)
+    assert [o for o in output if len(o) == 1] == list("今天是星期三")
+    assert text.index("get_current_weekday") < text.index("从'tools'输出") < text.index("今天是星期三")
+    assert len(steps) == 2
+    assert all(step.streamed and step.ttft_ms >= 10 for step in steps)
+    assert steps[1].tokens == 6 and steps[1].tokens_per_sec > 0
+
+
+def test_step_without_model_call_marked_as_cached():
+    def agent(state: MessagesState):
+        return {"messages": [AIMessage(content="缓存的回复")]}
+
+    workflow = StateGraph(MessagesState)
+    workflow.add_node("agent", agent)
+    workflow.set_entry_point("agent")
+    workflow.add_edge("agent", END)
+    output = []
+    steps = stream_tokens(workflow.compile(), {"messages": [HumanMessage(content="你好")]}, None,
+                          write=output.append)
+    assert "缓存的回复" in output
+    assert len(steps) == 1 and not steps[0].streamed
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
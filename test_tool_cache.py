@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+测试工具结果缓存
+
+用计数的替身工具验证 tool_cache 的缓存策略：ConcurrentToolExecutor 命中缓存时不再执行工具、
+数据版本变化或 TTL 过期后重新执行、有副作用的工具永不缓存，并按工具统计命中率。可以直接运行，也可以用 pytest 执行。
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+from langchain_core.tools import tool
+
+from concurrent_tools import ConcurrentToolExecutor
+from tool_cache import ToolResultCache, cache_policy, side_effects
+
+calls = {'lookup': 0, 'send': 0}
+version = {'value': 1}
+
+
+@tool
+def lookup(name: str):
+    """按姓名查询"""
+    calls['lookup'] += 1
+    return f"{name}@example.com"
+
+
+@tool
+def send(mail: str):
+    """发送邮件"""
+    calls['send'] += 1
+    return f"已发送至{mail}"
+
+
+cache_policy(lookup, ttl=0.2, key=lambda args: args['name'], version=lambda: version['value'])
+side_effects(send)
+
+
+def _call(name: str, args: dict, call_id: str) -> dict:
+    return {'name': name, 'args': args, 'id': call_id}
+
+
+def _reset():
+    calls.update(lookup=0, send=0)
+    version['value'] = 1
+
+
+def test_cached_result_reused_with_new_call_id():
+    _reset()
+    executor = ConcurrentToolExecutor([lookup, send], cache=ToolResultCache())
+    first = executor.invoke([_call('lookup', {'name': 'John'}, 'c1')])[0]
+    second = executor.invoke([_call('lookup', {'name': 'John'}, 'c2')])[0]
+    other = asyncio.run(executor.ainvoke([_call('lookup', {'name': 'Tom'}, 'c3')]))[0]
+    assert calls['lookup'] == 2
+    assert second.content == first.content and second.tool_call_id == 'c2'
+    assert other.content == "Tom@example.com"
+    assert executor.cache.stats()['lookup'] == {'hits': 1, 'misses': 2, 'hit_rate': 1 / 3}
+
+
+def test_version_change_and_ttl_invalidate():
+    _reset()
+    executor = ConcurrentToolExecutor([lookup], cache=ToolResultCache())
+    executor.invoke([_call('lookup', {'name': 'John'}, 'c1')])
+    version['value'] = 2
+    executor.invoke([_call('lookup', {'name': 'John'}, 'c2')])
+    assert calls['lookup'] == 2
+    time.sleep(0.25)
+    executor.invoke([_call('lookup', {'name': 'John'}, 'c3')])
+    assert calls['lookup'] == 3
+    executor.cache.invalidate('lookup')
+    executor.invoke([_call('lookup', {'name': 'John'}, 'c4')])
+    assert calls['lookup'] == 4
+
+
+def test_side_effecting_tools_never_cached():
+    _reset()
+    executor = ConcurrentToolExecutor([send], cache=ToolResultCache())
+    for i in range(3):
+        executor.invoke([_call('send', {'mail': 'a@example.com'}, f"c{i}")])
+    assert calls['send'] == 3
+    assert executor.cache.stats() == {}
+    with pytest.raises(ValueError):
+        cache_policy(send, ttl=60)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
@@ -0,0 +1,48 @@
+#!/usr/bin/env python3
+"""
+测试工具结果的紧凑文本形式
+
+验证 tool_format.render_rows 输出列式文本、截断过长字段与超出的行，并且比 str(rows) 更短。
+可以直接运行，也可以用 pytest 执行。
+"""
+
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from tool_format import render_rows
+
+COLUMNS = ("id", "name", "mail")
+
+
+def test_columnar_rendering_is_shorter_than_repr():
+    rows = [(i, f"user{i}", f"user{i}@example.com") for i in range(20)]
+    text = render_rows(COLUMNS, rows)
+    lines = text.splitlines()
+    assert lines[0] == "id|name|mail"
+    assert lines[1] == "0|user0|user0@example.com"
+    assert len(lines) == 21
+    assert len(text) < len(str(rows))
+
+
+def test_rows_and_cells_truncated():
+    rows = [(i, "x" * 200, "a|b\nc") for i in range(10)]
+    text = render_rows(COLUMNS, rows, max_rows=3, max_cell_chars=5)
+    lines = text.splitlines()
+    assert lines[1] == "0|xxxxx…|a/b c"
+    assert len(lines) == 5
+    assert lines[-1] == "…（共10行，已省略7行）"
+
+
+def test_empty_result():
+    assert render_rows(COLUMNS, []) == "（无记录）"
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
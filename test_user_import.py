@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+测试用户数据批量导入
+
+在临时数据库上验证 db.migrate 的版本化迁移（重复执行是幂等的、user_version 随迁移递增），
+以及 user_import 按块提交、坏行中断时保留已提交的块、single_transaction 时整体回滚和冲突处理方式。
+可以直接运行，也可以用 pytest 执行。
+"""
+
+import io
+import os
+import sqlite3
+import sys
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+import pytest
+
+import db
+from user_import import detect_format, import_users, read_csv, read_jsonl
+
+
+def _db_path() -> str:
+    return os.path.join(tempfile.mkdtemp(), "user.db")
+
+
+def _users(path: str) -> list:
+    return db.pool.query(path, "SELECT id, name, mail FROM users ORDER BY id")
+
+
+def _rows(n: int, start: int = 0):
+    for i in range(start, start + n):
+        yield i, f"user{i}", f"user{i}@example.com"
+
+
+def test_migrations_idempotent_and_bump_user_version():
+    path = _db_path()
+    conn = sqlite3.connect(path)
+    assert db.migrate(conn, db.USER_DB_MIGRATIONS[:1]) == 1
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 1
+    assert db.migrate(conn, db.USER_DB_MIGRATIONS) == 2
+    assert db.migrate(conn, db.USER_DB_MIGRATIONS) == 2
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == len(db.USER_DB_MIGRATIONS)
+    indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+    assert {"idx_users_name", "idx_users_mail"} <= indexes
+    conn.close()
+
+
+def test_failed_migration_rolls_back_version():
+    conn = sqlite3.connect(_db_path())
+    with pytest.raises(sqlite3.OperationalError):
+        db.migrate(conn, ["create table a (id int);", "create table a (id int);"])
+    # 失败的迁移整体回滚，连接不会停留在未结束的事务中
+    assert not conn.in_transaction
+    assert conn.execute("PRAGMA user_version").fetchone()[0] == 1
+    conn.close()
+
+
+def test_import_commits_per_chunk():
+    path = _db_path()
+    assert import_users(_rows(25), path, chunk_size=10) == 25
+    assert len(_users(path)) == 25
+    assert db.pool.query_one(path, "PRAGMA user_version")[0] == len(db.USER_DB_MIGRATIONS)
+
+
+def test_bad_row_keeps_committed_chunks():
+    path = _db_path()
+
+    def rows():
+        yield from _rows(12)
+        raise ValueError("坏行")
+
+    with pytest.raises(ValueError):
+        import_users(rows(), path, chunk_size=5)
+    # 前两个块已提交，出错所在的块被回滚
+    assert [row[0] for row in _users(path)] == list(range(10))
+
+
+def test_single_transaction_rolls_back_everything():
+    path = _db_path()
+    rows = list(_rows(12)) + [(3, "dup", "dup@example.com")]
+    with pytest.raises(sqlite3.IntegrityError):
+        import_users(rows, path, chunk_size=5, single_transaction=True)
+    assert _users(path) == []
+
+
+def test_on_conflict_modes():
+    path = _db_path()
+    import_users(_rows(3), path)
+    import_users([(1, "changed", "changed@example.com")], path, on_conflict='ignore')
+    assert _users(path)[1] == (1, "user1", "user1@example.com")
+    import_users([(1, "changed", "changed@example.com")], path, on_conflict='replace')
+    assert _users(path)[1] == (1, "changed", "changed@example.com")
+
+
+def test_readers_and_format_detection():
+    csv_text = io.StringIO("id,name,mail\n1,张三,zhang@example.com\n")
+    assert list(read_csv(csv_text)) == [(1, "张三", "zhang@example.com")]
+    jsonl = io.StringIO('{"id": 2, "name": "李四", "mail": "li@example.com"}\n\n')
+    assert list(read_jsonl(jsonl)) == [(2, "李四", "li@example.com")]
+    assert detect_format("users.CSV") == "csv" and detect_format("users.ndjson") == "jsonl"
+    with pytest.raises(ValueError):
+        detect_format("users.txt")
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
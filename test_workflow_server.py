@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+测试工作流并发执行
+
+用只会 await 的替身工作流验证 workflow_server.WorkflowServer 按 thread_id 分别执行作业、
+遵守并发上限、隔离单个作业的失败与超时，并给出吞吐量与延迟分位数。可以直接运行，也可以用 pytest 执行。
+"""
+
+import asyncio
+import os
+import sys
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from workflow_server import RunStats, WorkflowJob, WorkflowServer, percentile, run
+
+
+class FakeApp:
+    """记录每次调用的 thread_id 与同时执行的实例数"""
+
+    def __init__(self, delay: float = 0.05, fail=(), hang=()):
+        self.delay = delay
+        self.fail = set(fail)
+        self.hang = set(hang)
+        self.thread_ids = []
+        self.active = 0
+        self.max_active = 0
+
+    async def ainvoke(self, inputs, config=None):
+        thread_id = config['configurable']['thread_id']
+        self.thread_ids.append(thread_id)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(10 if thread_id in self.hang else self.delay)
+            if thread_id in self.fail:
+                raise RuntimeError("模型调用失败")
+            return {"thread_id": thread_id, **inputs}
+        finally:
+            self.active -= 1
+
+
+def _jobs(n: int):
+    return (WorkflowJob(thread_id=f"t{i}", inputs={"n": i}) for i in range(n))
+
+
+def test_jobs_run_concurrently_with_limit():
+    app = FakeApp(delay=0.05)
+    stats = run(app, _jobs(40), concurrency=8, keep_results=True)
+    assert stats.completed == 40 and stats.failed == 0
+    assert sorted(app.thread_ids) == sorted(f"t{i}" for i in range(40))
+    assert app.max_active == 8
+    # 40 个作业、并发 8、每个 50ms，串行需要 2 秒
+    assert stats.elapsed < 1.0
+    assert stats.results["t3"] == {"thread_id": "t3", "n": 3}
+    assert stats.throughput > 40
+
+
+def test_failures_and_timeouts_are_isolated():
+    app = FakeApp(delay=0.01, fail={"t1"}, hang={"t2"})
+    stats = run(app, _jobs(5), concurrency=5, timeout=0.2)
+    assert stats.completed == 3 and stats.failed == 2
+    assert dict(stats.failures).keys() == {"t1", "t2"}
+    assert len(stats.latencies) == 5
+
+
+def test_async_job_source():
+    async def source():
+        for i in range(6):
+            await asyncio.sleep(0)
+            yield WorkflowJob(thread_id=f"a{i}", inputs={})
+
+    app = FakeApp(delay=0.01)
+    stats = asyncio.run(WorkflowServer(app, concurrency=2).run(source()))
+    assert stats.completed == 6 and app.max_active == 2
+
+
+def test_latency_percentiles():
+    assert percentile([], 50) == 0.0
+    values = [i / 1000 for i in range(1, 101)]
+    assert percentile(values, 50) == 0.05
+    assert percentile(values, 99) == 0.099
+    stats = RunStats(completed=100, elapsed=2.0, latencies=list(reversed(values)))
+    assert stats.latency_ms(95) == 95
+    assert stats.throughput == 50
+    assert "p99=99ms" in str(stats)
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+测试工作流状态字段与路由
+
+验证 email_workflow 中 tool_results 的 reducer 按工具名合并、extract_tool_fields 从工具消息（包括没有 artifact 的旧消息）
+提取星期几与随机数、图执行时各轮工具结果累积到状态中、check_weekday_and_random_number 按状态字段路由，
+以及 enqueue_email 首次入队时启动发件箱的后台发送线程。
+可以直接运行，也可以用 pytest 执行。
+"""
+
+import os
+import sys
+import tempfile
+
+# 添加项目根目录到Python路径
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from langchain_core.messages import AIMessage, HumanMessage, ToolMessage
+from langgraph.graph import END, StateGraph
+
+import email_workflow
+import smtp_pool
+from email_workflow import (WorkflowState, check_weekday_and_random_number, enqueue_email, extract_tool_fields,
+                            merge_tool_results, parse_random_number)
+from fake_servers import FakeSMTPServer
+from mail_outbox import SENT, Outbox
+
+
+def _tool_message(name: str, content: str, artifact=None) -> ToolMessage:
+    return ToolMessage(content=content, name=name, tool_call_id=f"call_{name}", artifact=artifact)
+
+
+def _state(messages: list, weekday=None, random_number=None) -> dict:
+    return {"messages": messages, "tool_results": {}, "weekday": weekday, "random_number": random_number}
+
+
+def test_merge_tool_results():
+    assert merge_tool_results(None, None) == {}
+    assert merge_tool_results({"a": "1"}, None) == {"a": "1"}
+    assert merge_tool_results({"a": "1", "b": "2"}, {"b": "3"}) == {"a": "1", "b": "3"}
+
+
+def test_extract_tool_fields():
+    messages = [AIMessage(content="中间回复"),
+                _tool_message("get_current_weekday", "星期三"),
+                _tool_message("get_random_number", "73", artifact=73)]
+    assert extract_tool_fields(messages) == {
+        "weekday": "星期三", "random_number": 73,
+        "tool_results": {"get_current_weekday": "星期三", "get_random_number": "73"},
+    }
+    # 旧检查点中的消息没有 artifact，退回到解析文本
+    assert extract_tool_fields([_tool_message("get_random_number", "随机数是 42")])["random_number"] == 42
+    assert parse_random_number("没有数字") == 0
+    assert extract_tool_fields([AIMessage(content="无工具")]) == {}
+
+
+def test_tool_results_accumulate_across_steps():
+    rounds = [[_tool_message("get_current_weekday", "星期三")],
+              [_tool_message("get_random_number", "8", artifact=8), _tool_message("query_all_users", "（无记录）")]]
+
+    def tools(messages):
+        return lambda state: {"messages": messages, **extract_tool_fields(messages)}
+
+    workflow = StateGraph(WorkflowState)
+    workflow.add_node("first", tools(rounds[0]))
+    workflow.add_node("second", tools(rounds[1]))
+    workflow.set_entry_point("first")
+    workflow.add_edge("first", "second")
+    workflow.add_edge("second", END)
+    result = workflow.compile().invoke({"messages": [HumanMessage(content="开始")]})
+    assert result["tool_results"] == {"get_current_weekday": "星期三", "get_random_number": "8",
+                                      "query_all_users": "（无记录）"}
+    assert result["weekday"] == "星期三" and result["random_number"] == 8
+
+
+def test_routing():
+    # 路由在 agent 节点之后执行，最后一条消息是模型的回复
+    call = AIMessage(content="", tool_calls=[{"name": "get_random_number", "args": {}, "id": "c1"}])
+    assert check_weekday_and_random_number(_state([call])) == "tools"
+    assert check_weekday_and_random_number(_state([call], weekday="星期三", random_number=7)) == "tools"
+    reply = AIMessage(content="已获取星期几和随机数")
+    # 状态中还缺少随机数时回到 tools 继续获取
+    assert check_weekday_and_random_number(_state([reply], weekday="星期三")) == "tools"
+    # 随机数为 0 也算已获取
+    assert check_weekday_and_random_number(_state([reply], weekday="星期三", random_number=0)) == "process_random_number"
+
+
+def test_enqueue_email_starts_outbox_worker():
+    with FakeSMTPServer() as server:
+        env = {"SMTP_SERVER": server.host, "SMTP_PORT": str(server.port),
+               "EMAIL_SENDER": "sender@example.com", "EMAIL_PASSWORD": "secret"}
+        saved = {key: os.environ.get(key) for key in env}
+        os.environ.update(env)
+        smtp_pool.close_pool()
+        email_workflow._outbox = Outbox(os.path.join(tempfile.mkdtemp(), "outbox.db"))
+        try:
+            state = _state([AIMessage(content="已获取", id="m1")])
+            result = enqueue_email(state, {"configurable": {"thread_id": 1}}, "a@example.com", "内容", "主题")
+            assert result == "邮件已加入发件箱，收件人：a@example.com"
+            worker = email_workflow._outbox_worker
+            assert worker is not None and worker._thread.is_alive()
+            # 重放同一节点时不会重复入队，也不会再启动新的线程
+            assert "跳过重复入队" in enqueue_email(state, {"configurable": {"thread_id": 1}},
+                                                   "a@example.com", "内容", "主题")
+            assert email_workflow._outbox_worker is worker
+            email_workflow.stop_outbox_worker(drain_timeout=5)
+            assert not worker._thread.is_alive()
+            assert email_workflow._outbox.status_counts() == {SENT: 1}
+        finally:
+            email_workflow.stop_outbox_worker(drain_timeout=0)
+            email_workflow._outbox = None
+            smtp_pool.close_pool()
+            for key, value in saved.items():
+                if value is None:
+                    os.environ.pop(key, None)
+                else:
+                    os.environ[key] = value
+    assert server.stats['messages'] == 1
+
+
+if __name__ == "__main__":
+    for name, func in list(globals().items()):
+        if name.startswith("test_") and callable(func):
+            func()
+            print(f"✓ {name}")
+    print("\n测试完成！")
@@ -0,0 +1,108 @@
+"""按 token 流式输出工作流
+
+默认的 app.stream(...) 使用 updates 模式，要等整个节点执行完才有输出。
+stream_tokens 同时订阅 tasks、messages、updates 三种事件：
+- messages：agent 节点中模型生成的 token 一到达就输出
+- updates：其他节点的执行结果按节点输出，与 token 交错显示
+- tasks：agent 节点开始执行的时间，用于计算首 token 耗时（TTFT）
+
+每个 agent 步骤结束时给出首 token 耗时与生成速度（tokens/sec）。
+命中计划缓存或响应缓存的步骤没有调用模型，会整条消息一次性输出并标记为缓存命中。
+"""
+
+import sys
+import time
+from dataclasses import dataclass
+from typing import Callable, List, Optional
+
+from langchain_core.messages import AIMessageChunk
+
+
+@dataclass
+class StepTiming:
+    """一个 agent 步骤的流式输出统计"""
+    step: int
+    started: float
+    first_token: Optional[float] = None
+    finished: Optional[float] = None
+    chunks: int = 0
+    output_tokens: Optional[int] = None
+    streamed: bool = True
+
+    @property
+    def tokens(self) -> int:
+        # 模型在最后一个分片中给出准确的输出 token 数，没有时按分片数估算
+        return self.output_tokens if self.output_tokens is not None else self.chunks
+
+    @property
+    def ttft_ms(self) -> Optional[float]:
+        return None if self.first_token is None else (self.first_token - self.started) * 1000
+
+    @property
+    def tokens_per_sec(self) -> Optional[float]:
+        # 生成速度只统计首 token 之后的输出，不包括 prompt 处理时间
+        if self.first_token is None or self.finished is None or self.tokens < 2 or self.finished <= self.first_token:
+            return None
+        return (self.tokens - 1) / (self.finished - self.first_token)
+
+    def __str__(self) -> str:
+        if not self.streamed:
+            return f"agent第{self.step}步：命中缓存，未调用模型"
+        if self.first_token is None:
+            return f"agent第{self.step}步：模型没有输出"
+        speed = f"{self.tokens_per_sec:.1f} tokens/s" if self.tokens_per_sec else "-"
+        return f"agent第{self.step}步：首token耗时{self.ttft_ms:.0f}ms，{self.tokens}个token，{speed}"
+
+
+def _format_tool_calls(message) -> str:
+    return "，".join(f"{call['name']}({call['args']})" for call in message.tool_calls)
+
+
+def stream_tokens(app, inputs, config, agent_node: str = "agent",
+                  write: Callable[[str], None] = sys.stdout.write) -> List[StepTiming]:
+    """执行工作流并流式输出 agent 节点的 token 与其他节点的结果，返回每个 agent 步骤的统计"""
+    steps = []
+    current = None
+    i = 0
+    for mode, chunk in app.stream(inputs, config=config, stream_mode=["tasks", "messages", "updates"]):
+        now = time.perf_counter()
+        if mode == "tasks":
+            if chunk['name'] != agent_node:
+                continue
+            if 'input' in chunk:
+                current = StepTiming(step=len(steps) + 1, started=now)
+                steps.append(current)
+                write(f"\n==========={agent_node}第{current.step}步：\n")
+            elif current is not None:
+                current.finished = current.finished or now
+                write(f"\n[{current}]\n")
+                current = None
+        elif mode == "messages":
+            message, metadata = chunk
+            if metadata.get('langgraph_node') != agent_node or current is None:
+                continue
+            if not isinstance(message, AIMessageChunk):
+                # 节点直接返回的完整消息：命中缓存，没有调用模型
+                current.streamed = False
+                if message.content:
+                    write(message.content)
+                continue
+            if current.first_token is None:
+                current.first_token = now
+            current.chunks += 1
+            current.finished = now
+            if message.usage_metadata:
+                current.output_tokens = (current.output_tokens or 0) + message.usage_metadata['output_tokens']
+            if message.content:
+                write(message.content)
+        else:
+            for key, value in chunk.items():
+                i += 1
+                if key == agent_node:
+                    # token 已经流式输出，这里只补充工具调用
+                    message = value['messages'][-1]
+                    if message.tool_calls:
+                        write(f"\n==========={i}、从'{key}'输出工具调用：{_format_tool_calls(message)}\n")
+                else:
+                    write(f"\n==========={i}、从'{key}'输出:\n{value}\n")
+    return steps
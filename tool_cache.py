@@ -0,0 +1,134 @@
+"""按工具声明的结果缓存
+
+有些工具在一段时间内的结果是确定的：get_current_weekday 当天不变，query_all_recommend 在推荐表变化前不变，
+query_user_by_name 在用户表变化前不变，但每次工具调用都会重新执行。
+- cache_policy(tool, ttl=..., key=..., version=...) 为工具声明缓存策略，策略保存在 tool.metadata 中
+  - ttl：结果的有效期（秒）
+  - key：由调用参数计算缓存键的函数，默认使用按键排序的参数
+  - version：检测数据是否变化的函数（例如 PRAGMA data_version、当天日期），返回值与缓存时不同则结果失效
+- side_effects(tool) 声明工具有副作用（如发送邮件），这类工具永远不会被缓存，也不能再声明缓存策略
+- ToolResultCache 供 ConcurrentToolExecutor 使用：命中时直接返回缓存的 ToolMessage（tool_call_id 换成本次调用的 id），
+  执行出错的结果不缓存；invalidate() 是手动失效的入口
+- stats() 按工具给出命中次数与命中率
+"""
+
+import json
+import threading
+import time
+import logging
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from langchain_core.messages import ToolMessage
+
+logger = logging.getLogger(__name__)
+
+CACHE_POLICY_KEY = 'cache_policy'
+SIDE_EFFECTS_KEY = 'side_effects'
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """一个工具的结果缓存策略"""
+    ttl: float
+    key: Optional[Callable[[dict], Hashable]] = None
+    version: Optional[Callable[[], Any]] = None
+
+    def make_key(self, args: dict) -> Hashable:
+        if self.key is not None:
+            return self.key(args)
+        return json.dumps(args, sort_keys=True, ensure_ascii=False, default=str)
+
+
+def _metadata(tool) -> dict:
+    if tool.metadata is None:
+        tool.metadata = {}
+    return tool.metadata
+
+
+def side_effects(tool):
+    """声明工具有副作用，永远不缓存其结果；返回工具本身"""
+    metadata = _metadata(tool)
+    if CACHE_POLICY_KEY in metadata:
+        raise ValueError(f"工具 {tool.name} 已声明缓存策略，不能再声明为有副作用")
+    metadata[SIDE_EFFECTS_KEY] = True
+    return tool
+
+
+def cache_policy(tool, ttl: float, key: Optional[Callable[[dict], Hashable]] = None,
+                 version: Optional[Callable[[], Any]] = None):
+    """为工具声明结果缓存策略；返回工具本身，便于在定义工具后直接包装"""
+    metadata = _metadata(tool)
+    if metadata.get(SIDE_EFFECTS_KEY):
+        raise ValueError(f"工具 {tool.name} 有副作用，不能缓存其结果")
+    metadata[CACHE_POLICY_KEY] = CachePolicy(ttl=ttl, key=key, version=version)
+    return tool
+
+
+def get_policy(tool) -> Optional[CachePolicy]:
+    """返回工具声明的缓存策略，没有声明或有副作用的工具返回 None"""
+    metadata = tool.metadata or {}
+    if metadata.get(SIDE_EFFECTS_KEY):
+        return None
+    return metadata.get(CACHE_POLICY_KEY)
+
+
+class ToolResultCache:
+    """按工具策略缓存工具调用结果"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # (工具名, 缓存键) -> (ToolMessage, 过期时间, 数据版本)
+        self._entries: Dict[Tuple[str, Hashable], Tuple[ToolMessage, float, Any]] = {}
+        self._stats: Dict[str, Dict[str, int]] = {}
+
+    def _count(self, name: str, field: str):
+        with self._lock:
+            counts = self._stats.setdefault(name, {'hits': 0, 'misses': 0})
+            counts[field] += 1
+
+    def lookup(self, tool, call: dict) -> Tuple[Optional[ToolMessage], Optional[Callable[[ToolMessage], None]]]:
+        """查找缓存结果
+
+        返回 (命中的 ToolMessage, 保存结果的回调)：命中时回调为 None；未命中时执行工具后调用回调保存结果；
+        工具没有缓存策略时两者都为 None。
+        """
+        policy = get_policy(tool)
+        if policy is None:
+            return None, None
+        entry_key = (tool.name, policy.make_key(call['args']))
+        # 在执行工具之前读取数据版本，执行期间发生的变化会让这次结果在下次查找时失效
+        version = policy.version() if policy.version is not None else None
+        with self._lock:
+            entry = self._entries.get(entry_key)
+            if entry is not None and (entry[1] <= time.monotonic() or entry[2] != version):
+                del self._entries[entry_key]
+                entry = None
+        if entry is not None:
+            self._count(tool.name, 'hits')
+            logger.info(f"命中工具结果缓存：{tool.name}")
+            return entry[0].model_copy(update={'id': None, 'tool_call_id': call['id']}), None
+        self._count(tool.name, 'misses')
+
+        def store(message: ToolMessage):
+            if message.status == 'error':
+                return
+            with self._lock:
+                self._entries[entry_key] = (message, time.monotonic() + policy.ttl, version)
+
+        return None, store
+
+    def invalidate(self, tool_name: Optional[str] = None):
+        """丢弃指定工具的缓存结果；不传工具名时清空所有结果"""
+        with self._lock:
+            if tool_name is None:
+                self._entries.clear()
+            else:
+                for entry_key in [k for k in self._entries if k[0] == tool_name]:
+                    del self._entries[entry_key]
+
+    def stats(self) -> Dict[str, dict]:
+        """按工具返回命中统计"""
+        with self._lock:
+            return {name: {**counts, 'hit_rate': counts['hits'] / (counts['hits'] + counts['misses'])}
+                    for name, counts in self._stats.items()}
@@ -0,0 +1,32 @@
+"""工具结果的紧凑文本形式
+
+查询类工具原来返回 str(rows)，即 Python 元组列表的 repr，括号、引号与重复的逗号都会占用 prompt token，
+下游节点还要再从字符串中解析数据。工具改为 response_format="content_and_artifact"：
+- content：交给模型的紧凑文本，首行为列名，之后每行一条记录，字段之间用 | 分隔
+- artifact：原始的行数据或数值，保存在 ToolMessage.artifact 中，下游节点直接读取，不发送给模型
+超过 max_rows 的结果只渲染前 max_rows 行，过长的字段截断，并注明省略的行数。
+"""
+
+from typing import Sequence
+
+# 交给模型的最大行数
+MAX_RENDERED_ROWS = 50
+# 单个字段的最大字符数
+MAX_CELL_CHARS = 80
+
+
+def _cell(value, max_chars: int) -> str:
+    text = "" if value is None else str(value).replace("\n", " ").replace("|", "/")
+    return text if len(text) <= max_chars else f"{text[:max_chars]}…"
+
+
+def render_rows(columns: Sequence[str], rows: Sequence[Sequence], max_rows: int = MAX_RENDERED_ROWS,
+                max_cell_chars: int = MAX_CELL_CHARS) -> str:
+    """把查询结果渲染为列式文本"""
+    if not rows:
+        return "（无记录）"
+    lines = ["|".join(columns)]
+    lines.extend("|".join(_cell(value, max_cell_chars) for value in row) for row in rows[:max_rows])
+    if len(rows) > max_rows:
+        lines.append(f"…（共{len(rows)}行，已省略{len(rows) - max_rows}行）")
+    return "\n".join(lines)
@@ -0,0 +1,128 @@
+"""用户数据批量导入
+
+以流式方式从 CSV 或 JSONL 文件读取用户（字段：id、name、mail），
+按块使用 ``executemany`` 写入 user.db，内存占用与文件大小无关。
+
+用法：
+    python user_import.py users.csv
+    python user_import.py users.jsonl --chunk-size 50000 --on-conflict replace
+    cat users.jsonl | python user_import.py - --format jsonl
+"""
+
+import argparse
+import csv
+import itertools
+import json
+import logging
+import os
+import sys
+import time
+from typing import Iterable, Iterator, Tuple
+
+import db
+from db import USER_DB
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 10000
+
+INSERT_SQL = {
+    'abort': "INSERT INTO users (id, name, mail) VALUES (?, ?, ?)",
+    'ignore': "INSERT OR IGNORE INTO users (id, name, mail) VALUES (?, ?, ?)",
+    'replace': "INSERT OR REPLACE INTO users (id, name, mail) VALUES (?, ?, ?)",
+}
+
+
+def read_csv(f) -> Iterator[Tuple[int, str, str]]:
+    """逐行读取带表头的 CSV 用户数据"""
+    for row in csv.DictReader(f):
+        yield int(row['id']), row['name'], row['mail']
+
+
+def read_jsonl(f) -> Iterator[Tuple[int, str, str]]:
+    """逐行读取 JSONL 用户数据，跳过空行"""
+    for line in f:
+        if line.strip():
+            row = json.loads(line)
+            yield int(row['id']), row['name'], row['mail']
+
+
+READERS = {'csv': read_csv, 'jsonl': read_jsonl}
+
+
+def detect_format(path: str) -> str:
+    """根据文件扩展名判断输入格式"""
+    ext = os.path.splitext(path)[1].lower()
+    if ext in ('.jsonl', '.ndjson'):
+        return 'jsonl'
+    if ext == '.csv':
+        return 'csv'
+    raise ValueError(f"无法根据扩展名判断文件格式：{path}，请使用 --format 指定")
+
+
+def import_users(rows: Iterable[Tuple[int, str, str]], path: str = USER_DB,
+                 chunk_size: int = DEFAULT_CHUNK_SIZE, on_conflict: str = 'abort',
+                 single_transaction: bool = False) -> int:
+    """将用户数据批量写入数据库，返回处理的行数
+
+    默认每个块单独提交，中途失败时已提交的块会保留；
+    ``single_transaction=True`` 时所有块在同一个事务中写入，失败则整体回滚。
+    """
+    db.migrate_user_db(path)
+    conn = db.pool.connection(path)
+    sql = INSERT_SQL[on_conflict]
+    total = 0
+    rows = iter(rows)
+    try:
+        conn.execute("BEGIN")
+        while True:
+            chunk = list(itertools.islice(rows, chunk_size))
+            if not chunk:
+                break
+            conn.executemany(sql, chunk)
+            total += len(chunk)
+            if not single_transaction:
+                conn.execute("COMMIT")
+                conn.execute("BEGIN")
+            logger.info(f"已导入{total}个用户")
+        conn.execute("COMMIT")
+    except Exception:
+        conn.execute("ROLLBACK")
+        raise
+    return total
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="从 CSV/JSONL 文件批量导入用户到 user.db")
+    parser.add_argument("input", help="输入文件路径，'-' 表示从标准输入读取")
+    parser.add_argument("--format", choices=sorted(READERS), help="输入格式，默认根据扩展名判断")
+    parser.add_argument("--db", default=USER_DB, help="目标数据库路径")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE, help="每次 executemany 写入的行数")
+    parser.add_argument("--on-conflict", choices=sorted(INSERT_SQL), default='abort', help="id 冲突时的处理方式")
+    parser.add_argument("--single-transaction", action="store_true", help="所有数据在一个事务中提交")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.input == '-':
+        if not args.format:
+            parser.error("从标准输入读取时必须指定 --format")
+        fmt = args.format
+        f = sys.stdin
+    else:
+        try:
+            fmt = args.format or detect_format(args.input)
+        except ValueError as e:
+            parser.error(str(e))
+        f = open(args.input, newline='', encoding='utf-8')
+
+    start = time.perf_counter()
+    with f:
+        total = import_users(READERS[fmt](f), args.db, args.chunk_size,
+                             args.on_conflict, args.single_transaction)
+    elapsed = time.perf_counter() - start
+    logger.info(f"导入完成：共{total}个用户，耗时{elapsed:.2f}秒（{total / max(elapsed, 1e-9):,.0f} 行/秒）")
+
+
+if __name__ == "__main__":
+    main()
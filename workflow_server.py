@@ -0,0 +1,139 @@
+"""并发执行多个工作流实例
+
+入口脚本一次只执行一个 thread_id 固定为 42 的会话。WorkflowServer 在一个事件循环中同时执行大量工作流实例：
+- 每个作业有自己的 thread_id，检查点按 thread_id 隔离，互不影响
+- 通过 app.ainvoke 执行，agent 节点用 ainvoke 调用模型，工具在共享线程池中 await，等待期间不占用事件循环
+- 生产者与执行协程之间是有界队列，并发数由 concurrency 控制，作业可以来自普通可迭代对象或异步迭代器
+- 单个作业出错或超时只记为失败，不影响其他作业
+- 结束时给出吞吐量与 p50/p95/p99 延迟
+
+用法：
+    jobs = (WorkflowJob(thread_id=f"run-{i}", inputs={"messages": [HumanMessage(content=task)]}) for i in range(500))
+    stats = asyncio.run(WorkflowServer(init_workflow(), concurrency=32).run(jobs))
+"""
+
+import asyncio
+import math
+import time
+import logging
+from dataclasses import dataclass, field
+from typing import Any, AsyncIterable, Dict, Iterable, List, Optional, Tuple, Union
+
+logger = logging.getLogger(__name__)
+
+# 默认同时执行的工作流实例数
+WORKFLOW_CONCURRENCY = 16
+# 单个工作流实例的默认超时时间（秒）
+WORKFLOW_TIMEOUT = 300.0
+
+
+@dataclass
+class WorkflowJob:
+    """一次工作流执行：thread_id 决定检查点归属，inputs 为图的输入"""
+    thread_id: str
+    inputs: Dict[str, Any]
+    # 附加到 configurable 中的其他配置
+    configurable: Dict[str, Any] = field(default_factory=dict)
+
+
+def percentile(values: List[float], p: float) -> float:
+    """最近秩法计算百分位数，values 需已排序"""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(p / 100 * len(values)))
+    return values[rank - 1]
+
+
+@dataclass
+class RunStats:
+    """一批工作流执行的统计结果"""
+    completed: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    # 每个作业的端到端耗时（秒），包括失败的作业
+    latencies: List[float] = field(default_factory=list)
+    # 失败的作业：[(thread_id, 错误信息)]
+    failures: List[Tuple[str, str]] = field(default_factory=list)
+    # 成功作业的最终状态，按 thread_id 索引
+    results: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def throughput(self) -> float:
+        return self.completed / self.elapsed if self.elapsed else 0.0
+
+    def latency_ms(self, p: float) -> float:
+        return percentile(sorted(self.latencies), p) * 1000
+
+    def __str__(self) -> str:
+        return (f"成功{self.completed}个，失败{self.failed}个，耗时{self.elapsed:.2f}秒"
+                f"（{self.throughput:.1f}个/秒），延迟p50={self.latency_ms(50):.0f}ms，"
+                f"p95={self.latency_ms(95):.0f}ms，p99={self.latency_ms(99):.0f}ms")
+
+
+class WorkflowServer:
+    """以有界并发执行工作流作业队列"""
+
+    def __init__(self, app, concurrency: int = WORKFLOW_CONCURRENCY, queue_size: Optional[int] = None,
+                 timeout: Optional[float] = WORKFLOW_TIMEOUT, keep_results: bool = False):
+        self.app = app
+        self.concurrency = concurrency
+        self.queue_size = queue_size or concurrency * 2
+        self.timeout = timeout
+        self.keep_results = keep_results
+
+    async def _run_one(self, job: WorkflowJob, stats: RunStats):
+        config = {"configurable": {**job.configurable, "thread_id": job.thread_id}}
+        start = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self.app.ainvoke(job.inputs, config=config), self.timeout)
+            stats.completed += 1
+            if self.keep_results:
+                stats.results[job.thread_id] = result
+        except asyncio.TimeoutError:
+            stats.failed += 1
+            stats.failures.append((job.thread_id, f"执行超时（超过{self.timeout}秒）"))
+            logger.error(f"工作流 {job.thread_id} 执行超时（{self.timeout}秒）")
+        except Exception as e:
+            stats.failed += 1
+            stats.failures.append((job.thread_id, repr(e)))
+            logger.error(f"工作流 {job.thread_id} 执行出错：{e!r}")
+        finally:
+            stats.latencies.append(time.perf_counter() - start)
+
+    async def _worker(self, queue: asyncio.Queue, stats: RunStats):
+        while True:
+            job = await queue.get()
+            try:
+                if job is None:
+                    return
+                await self._run_one(job, stats)
+            finally:
+                queue.task_done()
+
+    async def run(self, jobs: Union[Iterable[WorkflowJob], AsyncIterable[WorkflowJob]]) -> RunStats:
+        """执行所有作业并返回统计结果"""
+        stats = RunStats()
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        start = time.perf_counter()
+        workers = [asyncio.create_task(self._worker(queue, stats)) for _ in range(self.concurrency)]
+        try:
+            if hasattr(jobs, '__aiter__'):
+                async for job in jobs:
+                    await queue.put(job)
+            else:
+                for job in jobs:
+                    await queue.put(job)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+        stats.elapsed = time.perf_counter() - start
+        logger.info(f"工作流批量执行完成：{stats}")
+        return stats
+
+
+def run(app, jobs: Iterable[WorkflowJob], **kwargs) -> RunStats:
+    """同步调用入口：创建 WorkflowServer 并在新的事件循环中执行所有作业"""
+    return asyncio.run(WorkflowServer(app, **kwargs).run(jobs))